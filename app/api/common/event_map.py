@@ -0,0 +1,40 @@
+import asyncio
+from logging import getLogger
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.api.dependencies import get_tracey_event_maps, validate_admin_user
+from app.services.carrier.event_map import TraceyEventMaps
+
+logger = getLogger(__name__)
+
+router = APIRouter(
+    prefix='/event-map',
+    tags=['Event Map']
+)
+
+
+@router.post(path='/reload', response_model=dict[str, str | bool])
+async def reload_event_map(
+        admin: Annotated[str, Depends(validate_admin_user)],
+        tracey_event_maps: Annotated[TraceyEventMaps, Depends(get_tracey_event_maps)]
+):
+    """
+    Reloads the Tracey events file, restricted to the administrators.
+
+    Only the worker serving the request reloads it: the other workers (and pods) reload it once they
+    notice the file has changed, within `TRACEY_EVENT_MAP_RELOAD_INTERVAL` seconds, as reported by `scope`.
+    """
+    try:
+        # Reading and compiling the events file would block the event loop
+        reloaded = await asyncio.to_thread(tracey_event_maps.load)
+    except Exception as ex:
+        logger.error(f'Reloading the Tracey event maps failed: {ex!r}')
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f'The events file is invalid, keeping version {tracey_event_maps.version}!'
+        )
+
+    logger.info(f'{admin} reloaded the Tracey event maps of this worker, version {tracey_event_maps.version}')
+    return {'version': tracey_event_maps.version, 'reloaded': reloaded, 'scope': 'worker'}
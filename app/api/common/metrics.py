@@ -0,0 +1,63 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from app.api.dependencies import (
+    get_carrier_circuit_breakers,
+    get_carrier_http_clients,
+    get_carrier_rate_limiters,
+    get_database_handler,
+    get_shipment_subscriptions,
+    get_token_claims_cache,
+    get_tracey_event_maps,
+    get_watchlist_refresher,
+    validate_admin_user
+)
+from app.auth.hashing import password_hasher
+from app.auth.tokens import TokenClaimsCache
+from app.db.database import DatabaseHandler
+from app.services.carrier.cache_policy import shipment_cache_stats
+from app.services.carrier.circuit_breaker import CarrierCircuitBreakers
+from app.services.carrier.event_map import TraceyEventMaps
+from app.services.carrier.http_client import CarrierHTTPClients
+from app.services.carrier.rate_limit import CarrierRateLimiters
+from app.services.carrier.store import shipment_store
+from app.services.carrier.subscriptions import ShipmentSubscriptions
+from app.services.carrier.watchlist import WatchlistRefresher
+from app.utils.cache import cache
+from app.utils.singleflight import single_flight
+
+router = APIRouter(
+    prefix='/metrics',
+    tags=['Metrics']
+)
+
+
+@router.get(path='', response_model=dict[str, dict])
+async def get_metrics(
+        admin: Annotated[str, Depends(validate_admin_user)],
+        http_clients: Annotated[CarrierHTTPClients, Depends(get_carrier_http_clients)],
+        rate_limiters: Annotated[CarrierRateLimiters, Depends(get_carrier_rate_limiters)],
+        circuit_breakers: Annotated[CarrierCircuitBreakers, Depends(get_carrier_circuit_breakers)],
+        tracey_event_maps: Annotated[TraceyEventMaps, Depends(get_tracey_event_maps)],
+        subscriptions: Annotated[ShipmentSubscriptions, Depends(get_shipment_subscriptions)],
+        watchlist_refresher: Annotated[WatchlistRefresher, Depends(get_watchlist_refresher)],
+        db_handler: Annotated[DatabaseHandler, Depends(get_database_handler)],
+        token_claims_cache: Annotated[TokenClaimsCache, Depends(get_token_claims_cache)]
+):
+    return {
+        'http_pools': http_clients.stats(),
+        'rate_limits': rate_limiters.stats(),
+        'circuit_breakers': circuit_breakers.stats(),
+        'single_flight': single_flight.stats(),
+        'shipment_cache': shipment_cache_stats.stats(),
+        'cache': cache.stats(),
+        'shipment_store': shipment_store.stats(),
+        'event_map': tracey_event_maps.stats(),
+        'subscriptions': subscriptions.stats(),
+        'watchlist': watchlist_refresher.stats(),
+        'database_pool': db_handler.pool_stats(),
+        'database_async_pool': db_handler.async_pool_stats(),
+        'password_hashing': password_hasher.stats(),
+        'token_claims_cache': token_claims_cache.stats()
+    }
@@ -1,15 +1,16 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_db_session, get_settings
-from app.auth.exceptions import InvalidCredentialsError
+from app.api.dependencies import get_async_db_session, get_settings, get_token_claims_cache
+from app.auth.exceptions import InvalidCredentialsError, PasswordHasherBusyError
+from app.auth.tokens import TokenClaimsCache
 from app.config.base import Settings
 from app.db.exceptions import DatabaseIntegrityError
-from app.auth.users import UserServices, UserAuthServices
-from app.schemas.schema_users import Token, UserInDB, User
+from app.auth.users import AsyncUserServices, RefreshTokenServices, UserAuthServices
+from app.schemas.schema_users import RefreshTokenRequest, Token, UserInDB, User
 
 router = APIRouter(
     prefix='/user',
@@ -17,23 +18,24 @@ router = APIRouter(
 )
 
 
-# Adding a JWT refresh token is feasible, depending on our security requirements
-# and our strategy for managing user authentication and authorization.
+# Along with the (short-lived) access token, a refresh token is issued, which renews the access token
+# without the password, i.e. without a bcrypt verification, and is rotated on every use.
 
 @router.post(path='/token')
 async def login_for_access_token(
         settings: Annotated[Settings, Depends(get_settings)],
-        db: Annotated[Session, Depends(get_db_session)],
+        db: Annotated[AsyncSession, Depends(get_async_db_session)],
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     try:
-        token = UserAuthServices.authenticate_user_and_create_token(
+        token = await UserAuthServices.authenticate_user_and_create_token_async(
             db=db,
             username=form_data.username,
             password=form_data.password,
             access_token_expire_time=int(settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES),
             secret_key=settings.JWT_SECRET_KEY,
-            algorithm=settings.JWT_ALGORITHM
+            algorithm=settings.JWT_ALGORITHM,
+            refresh_token_expire_time=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS
         )
 
         return token
@@ -42,15 +44,59 @@ async def login_for_access_token(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Invalid authentication credentials'
         )
+    except PasswordHasherBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Too many passwords are being checked, please try again later!',
+            headers={'Retry-After': '1'}
+        )
+
+
+@router.post(path='/token/refresh')
+async def refresh_access_token(
+        settings: Annotated[Settings, Depends(get_settings)],
+        db: Annotated[AsyncSession, Depends(get_async_db_session)],
+        claims_cache: Annotated[TokenClaimsCache, Depends(get_token_claims_cache)],
+        refresh_token_request: RefreshTokenRequest
+) -> Token:
+    try:
+        token = await UserAuthServices.refresh_access_token(
+            db=db,
+            refresh_token=refresh_token_request.refresh_token,
+            access_token_expire_time=int(settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES),
+            refresh_token_expire_time=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS,
+            secret_key=settings.JWT_SECRET_KEY,
+            algorithm=settings.JWT_ALGORITHM,
+            claims_cache=claims_cache,
+            refresh_token_reuse_grace=settings.JWT_REFRESH_TOKEN_REUSE_GRACE
+        )
+
+        return token
+    except InvalidCredentialsError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid refresh token'
+        )
+
+
+@router.post(path='/token/revoke', status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_refresh_token(
+        db: Annotated[AsyncSession, Depends(get_async_db_session)],
+        refresh_token_request: RefreshTokenRequest
+) -> Response:
+    # Revoking an unknown (or already revoked) token succeeds as well, so it doesn't tell which tokens exist
+    await RefreshTokenServices.revoke_refresh_token(db=db, refresh_token=refresh_token_request.refresh_token)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.post(path='/register', response_model=User)
 async def create_user(
         user: UserInDB,
-        db: Annotated[Session, Depends(get_db_session)]
+        db: Annotated[AsyncSession, Depends(get_async_db_session)]
 ):
     try:
-        created_user = UserServices.create_user(
+        created_user = await AsyncUserServices.create_user(
             db=db,
             email=user.email,
             username=user.username,
@@ -63,3 +109,9 @@ async def create_user(
             status_code=status.HTTP_409_CONFLICT,
             detail='Could not create user!'
         )
+    except PasswordHasherBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Too many passwords are being checked, please try again later!',
+            headers={'Retry-After': '1'}
+        )
@@ -1,19 +1,28 @@
-import json
 from functools import lru_cache
-from typing import Annotated, Generator
+from typing import Annotated, AsyncGenerator, Callable, Generator
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.api.responses import ResponseFormat
 from app.api.v1.schemas.schema_parcels import CarrierType
+from app.auth.tokens import TokenClaimsCache
 from app.config.base import Settings
 
 from app.db.database import DatabaseHandler
 from app.services.carrier.base import Carrier
 from app.services.carrier.bpost import BPostCarrier
-from app.services.carrier.dhl import DHLCarrier
+from app.services.carrier.cache_policy import CacheTTLPolicy
+from app.services.carrier.circuit_breaker import CarrierCircuitBreakers, carrier_circuit_breakers
+from app.services.carrier.dhl import DHL_EVENT_PREFIXES, DHLCarrier
+from app.services.carrier.event_map import TraceyEventMap, TraceyEventMaps
+from app.services.carrier.http_client import CarrierHTTPClients, carrier_http_clients
+from app.services.carrier.rate_limit import CarrierRateLimiters, carrier_rate_limiters
+from app.services.carrier.subscriptions import ShipmentSubscriptions, shipment_subscriptions
+from app.services.carrier.watchlist import WatchlistRefresher, watchlist_refresher
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='api/user/token')
 
@@ -35,9 +44,30 @@ def get_settings() -> Settings:
     return Settings()
 
 
-def validate_user_token(
+@lru_cache
+def get_token_claims_cache() -> TokenClaimsCache:
+    """
+    Retrieves the cache of the verified access tokens' claims.
+
+    Returns:
+        TokenClaimsCache: The cache of the tokens' claims.
+
+    Notes:
+        This function is decorated with `lru_cache`, so the cache is shared by all the requests.
+    """
+    settings = get_settings()
+    return TokenClaimsCache(
+        max_entries=settings.JWT_CLAIMS_CACHE_MAX_ENTRIES,
+        max_ttl=settings.JWT_CLAIMS_CACHE_MAX_TTL,
+        # A revocation is kept for as long as the access tokens issued before it are valid
+        revocation_ttl=int(settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES or 24 * 60) * 60
+    )
+
+
+async def validate_user_token(
         token: Annotated[str, Depends(oauth2_scheme)],
-        settings: Annotated[Settings, Depends(get_settings)]
+        settings: Annotated[Settings, Depends(get_settings)],
+        claims_cache: Annotated[TokenClaimsCache, Depends(get_token_claims_cache)]
 ) -> str:
     """
     Validates the user token.
@@ -45,9 +75,15 @@ def validate_user_token(
     Args:
         token (str): The user token to validate.
         settings (Settings): The application settings.
+        claims_cache (TokenClaimsCache): The cache of the verified tokens' claims.
 
     Returns:
         str: The validated user's username.
+
+    Notes:
+        The clients reuse their token for many requests, so its claims are cached (until it expires)
+        once its signature has been verified. This function is a coroutine, so it's run on the event
+        loop instead of in a worker thread, which would cost more than a cached validation.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,57 +91,146 @@ def validate_user_token(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(
-            token=token,
-            key=settings.JWT_SECRET_KEY,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
+    payload = claims_cache.get(token)
 
-        username: str = payload.get("sub")
+    if payload is None:
+        try:
+            payload = jwt.decode(
+                token=token,
+                key=settings.JWT_SECRET_KEY,
+                algorithms=[settings.JWT_ALGORITHM]
+            )
+        except JWTError:
+            raise credentials_exception
 
-        if username is None:
+        # The token may have been revoked, e.g. once its user's refresh token has been stolen
+        if claims_cache.is_revoked(payload):
             raise credentials_exception
 
-        return username
+        claims_cache.set(token, payload)
 
-    except JWTError:
+    username: str = payload.get("sub")
+
+    if username is None:
         raise credentials_exception
 
+    return username
+
 
-def get_db_session(settings: Annotated[Settings, Depends(get_settings)]) -> Generator[Session, None, None]:
+async def validate_admin_user(
+        username: Annotated[str, Depends(validate_user_token)],
+        settings: Annotated[Settings, Depends(get_settings)]
+) -> str:
     """
-    Creates a new database session.
+    Validates that the user is allowed to operate the application, i.e. is one of the `ADMIN_USERNAMES`.
 
     Args:
+        username (str): The validated user's username.
         settings (Settings): The application settings.
 
     Returns:
-        Session: The database session.
+        str: The validated admin's username.
+    """
+    if username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='This operation is restricted to the administrators!'
+        )
+
+    return username
+
+
+@lru_cache
+def get_database_handler() -> DatabaseHandler:
+    """
+    Retrieves the database handler, whose engine and connection pool are shared by the whole application.
+
+    Returns:
+        DatabaseHandler: The database handler.
+
+    Notes:
+        This function is decorated with `lru_cache`, so the engine is created only once (on startup),
+        instead of a new engine, with a new connection pool, on every request.
     """
-    session = DatabaseHandler(
+    settings = get_settings()
+    return DatabaseHandler(
         database=settings.POSTGRES_DATABASE,
         db_username=settings.POSTGRES_USERNAME,
         db_password=settings.POSTGRES_PASSWORD,
         db_host=settings.POSTGRES_HOST,
-        db_port=int(settings.POSTGRES_PORT)
-    ).create_session()
+        db_port=int(settings.POSTGRES_PORT),
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING
+    )
+
+
+def get_db_session(
+        db_handler: Annotated[DatabaseHandler, Depends(get_database_handler)]
+) -> Generator[Session, None, None]:
+    """
+    Creates a new database session, from the application's connection pool.
+
+    Args:
+        db_handler (DatabaseHandler): The database handler.
+
+    Returns:
+        Session: The database session, closed (i.e. its connection returned to the pool) after the request.
+    """
+    with db_handler.create_session() as session:
+        yield session
+
+
+async def get_async_db_session(
+        db_handler: Annotated[DatabaseHandler, Depends(get_database_handler)]
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Creates a new asynchronous database session, from the application's asynchronous connection pool.
+
+    Args:
+        db_handler (DatabaseHandler): The database handler.
+
+    Returns:
+        AsyncSession: The database session, closed (i.e. its connection returned to the pool) after the request.
+
+    Notes:
+        The queries of this session are awaited instead of blocking the event loop, so the endpoints
+        using it (e.g. the login) don't hold up the other requests served by the same worker.
+    """
+    async with db_handler.create_async_session() as session:
+        yield session
+
+
+async def get_response_format(accept: Annotated[str | None, Header()] = None) -> ResponseFormat:
+    """
+    Negotiates the format of the response, e.g. MessagePack for the internal services asking for it.
+
+    Args:
+        accept (str | None): The `Accept` header of the request.
+
+    Returns:
+        ResponseFormat: The format of the response, JSON by default.
 
-    yield session
+    Notes:
+        This function is a coroutine, so it's run on the event loop instead of in a worker thread,
+        which would cost more than the negotiation itself.
+    """
+    return ResponseFormat.negotiate(accept)
 
 
 @lru_cache
-def get_tracey_event_map() -> dict:
+def get_tracey_event_maps() -> TraceyEventMaps:
     """
-    Retrieves the mapping of Tracey events.
+    Retrieves the registry of the compiled Tracey event maps, which are reloaded whenever the events file changes.
 
     Returns:
-        dict: A dictionary containing the mapping of Tracey events.
+        TraceyEventMaps: The registry of the carriers' Tracey event maps.
 
     Notes:
-        This function is decorated with `lru_cache` to cache the result of
-        the function call. Subsequent calls will return the cached result
-        instead of reading it from file again, which can improve performance.
+        This function is decorated with `lru_cache`, so the events file is loaded only once
+        on startup, then reloaded by the registry itself (see `TraceyEventMaps.watch`).
     """
 
     # Another approach could involve creating a dataclass for events.
@@ -113,15 +238,108 @@ def get_tracey_event_map() -> dict:
     # Alternatively, we could fetch them from a third-party API.
     # For simplicity, we're currently loading them from a provided file.
 
-    with open('filtered_events.json', 'r') as event_map:
-        return json.load(event_map)  # type: ignore[no-any-return]
+    return TraceyEventMaps(
+        path=get_settings().TRACEY_EVENT_MAP_PATH,
+        prefixes={CarrierType.DHL.value: DHL_EVENT_PREFIXES}
+    )
+
+
+def get_tracey_event_map(
+        tracey_event_maps: Annotated[TraceyEventMaps, Depends(get_tracey_event_maps)]
+) -> dict[str, TraceyEventMap]:
+    """
+    Retrieves the mapping of Tracey events.
+
+    Returns:
+        dict[str, TraceyEventMap]: The compiled mapping of each carrier's events to Tracey events,
+        keyed by carrier name.
+
+    Notes:
+        The current version of the maps is used for the whole request, even if they're reloaded meanwhile.
+    """
+    return tracey_event_maps.snapshot()
+
+
+@lru_cache
+def get_cache_ttl_policies() -> dict[str, CacheTTLPolicy]:
+    """
+    Retrieves the cache TTL policy of each carrier.
+
+    Returns:
+        dict[str, CacheTTLPolicy]: The cache TTL policies, keyed by carrier name.
+
+    Notes:
+        This function is decorated with `lru_cache`, so the policies are built only once.
+    """
+    settings = get_settings()
+    return {
+        carrier.value: CacheTTLPolicy(
+            ttls=settings.CACHE_TTL_POLICIES.get(carrier.value, {}),
+            stale_ttl=settings.CACHE_STALE_TTL
+        )
+        for carrier in CarrierType
+    }
+
+
+def get_carrier_http_clients() -> CarrierHTTPClients:
+    """
+    Retrieves the registry of app-scoped, pooled HTTP clients of the carriers.
+
+    Returns:
+        CarrierHTTPClients: The registry of the carriers' HTTP clients.
+    """
+    return carrier_http_clients
+
+
+def get_carrier_rate_limiters() -> CarrierRateLimiters:
+    """
+    Retrieves the registry of the carriers' rate limit schedulers.
+
+    Returns:
+        CarrierRateLimiters: The registry of the carriers' rate limit schedulers.
+    """
+    return carrier_rate_limiters
+
+
+def get_carrier_circuit_breakers() -> CarrierCircuitBreakers:
+    """
+    Retrieves the registry of the carriers' circuit breakers.
+
+    Returns:
+        CarrierCircuitBreakers: The registry of the carriers' circuit breakers.
+    """
+    return carrier_circuit_breakers
+
+
+def get_shipment_subscriptions() -> ShipmentSubscriptions:
+    """
+    Retrieves the registry of the subscriptions to the shipments' new events.
+
+    Returns:
+        ShipmentSubscriptions: The registry of the shipments' subscriptions.
+    """
+    return shipment_subscriptions
+
+
+def get_watchlist_refresher() -> WatchlistRefresher:
+    """
+    Retrieves the background refresher of the watchlist's shipments.
+
+    Returns:
+        WatchlistRefresher: The watchlist refresher.
+    """
+    return watchlist_refresher
 
 
 def get_carrier_handler(
         carrier_type: CarrierType,
         tracking_number: str,
         settings: Annotated[Settings, Depends(get_settings)],
-        tracey_event_map: Annotated[dict, Depends(get_tracey_event_map)]
+        tracey_event_map: Annotated[dict[str, TraceyEventMap], Depends(get_tracey_event_map)],
+        http_clients: Annotated[CarrierHTTPClients, Depends(get_carrier_http_clients)],
+        cache_ttl_policies: Annotated[dict[str, CacheTTLPolicy], Depends(get_cache_ttl_policies)],
+        rate_limiters: Annotated[CarrierRateLimiters, Depends(get_carrier_rate_limiters)],
+        circuit_breakers: Annotated[CarrierCircuitBreakers, Depends(get_carrier_circuit_breakers)]
 ) -> Carrier:
     """
     Instantiate a carrier handler based on the carrier type.
@@ -130,7 +348,11 @@ def get_carrier_handler(
         carrier_type (CarrierType): The type of carrier.
         tracking_number (str): The tracking number associated with the shipment.
         settings (Settings): The application settings.
-        tracey_event_map (dict): The mapping of Tracey events.
+        tracey_event_map (dict[str, TraceyEventMap]): The compiled mapping of Tracey events of each carrier.
+        http_clients (CarrierHTTPClients): The registry of the carriers' HTTP clients.
+        cache_ttl_policies (dict[str, CacheTTLPolicy]): The cache TTL policy of each carrier.
+        rate_limiters (CarrierRateLimiters): The registry of the carriers' rate limit schedulers.
+        circuit_breakers (CarrierCircuitBreakers): The registry of the carriers' circuit breakers.
 
     Returns:
         Carrier: The carrier handler object.
@@ -142,7 +364,17 @@ def get_carrier_handler(
         return DHLCarrier(
             tracking_number=tracking_number,
             api_key=settings.DHL_API_KEY,
-            trace_event_map=tracey_event_map.get(carrier_type.DHL.value)  # type: ignore
+            trace_event_map=tracey_event_map.get(carrier_type.DHL.value),  # type: ignore
+            http_client=http_clients.get_client(carrier_type.DHL.value, settings),
+            cache_ttl_policy=cache_ttl_policies[carrier_type.DHL.value],
+            # Each process gets its share of the API key's rate limit
+            rate_limiter=rate_limiters.get_scheduler(
+                carrier=carrier_type.DHL.value,
+                rate=settings.DHL_RATE_LIMIT_PER_SECOND / settings.CARRIER_RATE_LIMIT_PROCESSES,
+                burst=max(1, settings.DHL_RATE_LIMIT_BURST // settings.CARRIER_RATE_LIMIT_PROCESSES),
+                max_wait=settings.CARRIER_RATE_LIMIT_MAX_WAIT
+            ),
+            circuit_breaker=circuit_breakers.get_breaker(carrier_type.DHL.value, settings)
         )
 
     if carrier_type is CarrierType.BPOST:
@@ -152,3 +384,90 @@ def get_carrier_handler(
         )
 
     raise ValueError('Invalid carrier type has been selected!')
+
+
+def build_carrier_handler(carrier_type: str, tracking_number: str) -> Carrier:
+    """
+    Instantiate a carrier handler outside of a request, e.g. to refresh a shipment in the background.
+
+    Args:
+        carrier_type (str): The type of carrier, e.g. `dhl`.
+        tracking_number (str): The tracking number associated with the shipment.
+
+    Returns:
+        Carrier: The carrier handler object, using the current Tracey event maps.
+
+    Raises:
+        ValueError: If an invalid carrier type has been selected.
+    """
+    return get_carrier_handler(
+        carrier_type=CarrierType(carrier_type),
+        tracking_number=tracking_number,
+        settings=get_settings(),
+        tracey_event_map=get_tracey_event_maps().snapshot(),
+        http_clients=get_carrier_http_clients(),
+        cache_ttl_policies=get_cache_ttl_policies(),
+        rate_limiters=get_carrier_rate_limiters(),
+        circuit_breakers=get_carrier_circuit_breakers()
+    )
+
+
+def get_carrier_handler_factory(
+        settings: Annotated[Settings, Depends(get_settings)],
+        tracey_event_map: Annotated[dict[str, TraceyEventMap], Depends(get_tracey_event_map)],
+        http_clients: Annotated[CarrierHTTPClients, Depends(get_carrier_http_clients)],
+        cache_ttl_policies: Annotated[dict[str, CacheTTLPolicy], Depends(get_cache_ttl_policies)],
+        rate_limiters: Annotated[CarrierRateLimiters, Depends(get_carrier_rate_limiters)],
+        circuit_breakers: Annotated[CarrierCircuitBreakers, Depends(get_carrier_circuit_breakers)]
+) -> Callable[[str, str], Carrier]:
+    """
+    Retrieves a factory instantiating the carrier handlers of a request's shipments, e.g. to track a batch of them.
+
+    Returns:
+        Callable[[str, str], Carrier]: Instantiates the carrier handler of a carrier type (e.g. `dhl`) and
+        tracking number, with the Tracey event maps of the request.
+    """
+    def carrier_handler_factory(carrier_type: str, tracking_number: str) -> Carrier:
+        return get_carrier_handler(
+            carrier_type=CarrierType(carrier_type),
+            tracking_number=tracking_number,
+            settings=settings,
+            tracey_event_map=tracey_event_map,
+            http_clients=http_clients,
+            cache_ttl_policies=cache_ttl_policies,
+            rate_limiters=rate_limiters,
+            circuit_breakers=circuit_breakers
+        )
+
+    return carrier_handler_factory
+
+
+def get_polling_carrier_handler_factory(
+        settings: Annotated[Settings, Depends(get_settings)],
+        tracey_event_maps: Annotated[TraceyEventMaps, Depends(get_tracey_event_maps)],
+        http_clients: Annotated[CarrierHTTPClients, Depends(get_carrier_http_clients)],
+        cache_ttl_policies: Annotated[dict[str, CacheTTLPolicy], Depends(get_cache_ttl_policies)],
+        rate_limiters: Annotated[CarrierRateLimiters, Depends(get_carrier_rate_limiters)],
+        circuit_breakers: Annotated[CarrierCircuitBreakers, Depends(get_carrier_circuit_breakers)]
+) -> Callable[[str, str], Carrier]:
+    """
+    Retrieves a factory instantiating the carrier handlers of shipments polled for longer than a request,
+    e.g. the subscribed ones.
+
+    Returns:
+        Callable[[str, str], Carrier]: Instantiates the carrier handler of a carrier type (e.g. `dhl`) and
+        tracking number, with the current Tracey event maps, instead of the ones of the request.
+    """
+    def carrier_handler_factory(carrier_type: str, tracking_number: str) -> Carrier:
+        return get_carrier_handler(
+            carrier_type=CarrierType(carrier_type),
+            tracking_number=tracking_number,
+            settings=settings,
+            tracey_event_map=tracey_event_maps.snapshot(),
+            http_clients=http_clients,
+            cache_ttl_policies=cache_ttl_policies,
+            rate_limiters=rate_limiters,
+            circuit_breakers=circuit_breakers
+        )
+
+    return carrier_handler_factory
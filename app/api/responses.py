@@ -0,0 +1,153 @@
+from enum import Enum
+from typing import Any, Mapping
+
+import ormsgpack
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import from_json, to_json
+
+# The media types MessagePack is known by, the first one being the one it's sent as
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+# Serializes the models natively, with their times formatted like in JSON (note that ormsgpack
+# ignores the models' aliases and custom serializers, which the response models don't have)
+MSGPACK_OPTIONS = ormsgpack.OPT_SERIALIZE_PYDANTIC | ormsgpack.OPT_UTC_Z
+
+# Documents the binary format of the endpoints negotiating their response's format
+NEGOTIATED_RESPONSES: dict[int | str, dict[str, Any]] = {
+    200: {'content': {MSGPACK_MEDIA_TYPES[0]: {}}}
+}
+
+
+class ResponseFormat(Enum):
+    JSON = 'application/json'
+    MSGPACK = MSGPACK_MEDIA_TYPES[0]
+
+    @classmethod
+    def negotiate(cls, accept: str | None) -> 'ResponseFormat':
+        """
+        Picks the format of a response based on the `Accept` header of its request.
+
+        MessagePack is picked only when it's preferred over JSON, e.g. `application/msgpack` or
+        `application/msgpack, application/json;q=0.5`, so JSON stays the default of any other client.
+
+        Args:
+            accept (str | None): The value of the header, e.g. `application/msgpack, */*;q=0.1`.
+
+        Returns:
+            ResponseFormat: The format of the response.
+        """
+        if not accept:
+            return cls.JSON
+
+        # The quality and the specificity (2 for an exact match, 1 for `application/*`, 0 for `*/*`) of each format
+        preferences = {cls.JSON: (0.0, -1), cls.MSGPACK: (0.0, -1)}
+
+        for media_range in accept.split(','):
+            media_type, *parameters = (part.strip() for part in media_range.split(';'))
+            media_type = media_type.lower()
+            quality = 1.0
+
+            for parameter in parameters:
+                name, _, value = parameter.partition('=')
+
+                if name.strip().lower() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+
+            for response_format in cls:
+                media_types = MSGPACK_MEDIA_TYPES if response_format is cls.MSGPACK else (response_format.value,)
+
+                if media_type in media_types:
+                    specificity = 2
+                elif media_type == 'application/*':
+                    specificity = 1
+                elif media_type == '*/*':
+                    specificity = 0
+                else:
+                    continue
+
+                # The most specific media range matching a format gives its quality
+                if specificity > preferences[response_format][1]:
+                    preferences[response_format] = (quality, specificity)
+
+        return cls.MSGPACK if preferences[cls.MSGPACK] > preferences[cls.JSON] else cls.JSON
+
+    def etag(self, etag: str) -> str:
+        """
+        Derives the ETag of a representation in this format from the ETag of its JSON representation.
+
+        Args:
+            etag (str): The (quoted) ETag of the JSON representation.
+
+        Returns:
+            str: The (quoted) ETag of the representation in this format.
+        """
+        return etag if self is ResponseFormat.JSON else f'{etag[:-1]}.{self.name.lower()}"'
+
+
+def json_response(
+        content: bytes,
+        response_format: ResponseFormat,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None
+) -> Response:
+    """
+    Sends already serialized JSON, as-is or transcoded into the negotiated format.
+
+    Args:
+        content (bytes): The JSON content.
+        response_format (ResponseFormat): The negotiated format of the response.
+        status_code (int, optional): The status code of the response.
+        headers (Mapping[str, str], optional): The headers of the response.
+
+    Returns:
+        Response: The response, varying with the `Accept` header.
+    """
+    if response_format is ResponseFormat.MSGPACK:
+        content = ormsgpack.packb(from_json(content))
+
+    return Response(
+        content=content,
+        status_code=status_code,
+        media_type=response_format.value,
+        headers={**(headers or {}), 'Vary': 'Accept'}
+    )
+
+
+def model_response(
+        model: BaseModel,
+        response_format: ResponseFormat,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None
+) -> Response:
+    """
+    Serializes a model in the negotiated format, in a single pass.
+
+    Returning a model from an endpoint makes FastAPI dump it, validate it again against the endpoint's
+    `response_model`, then encode it with `jsonable_encoder` before serializing it. The models built by
+    the application are already valid, so they're serialized right away instead, by pydantic's serializer
+    (or by ormsgpack, which serializes them natively as well).
+
+    Args:
+        model (BaseModel): The model to send, already validated.
+        response_format (ResponseFormat): The negotiated format of the response.
+        status_code (int, optional): The status code of the response.
+        headers (Mapping[str, str], optional): The headers of the response.
+
+    Returns:
+        Response: The response, varying with the `Accept` header.
+    """
+    if response_format is ResponseFormat.MSGPACK:
+        content = ormsgpack.packb(model, option=MSGPACK_OPTIONS)
+    else:
+        content = to_json(model)
+
+    return Response(
+        content=content,
+        status_code=status_code,
+        media_type=response_format.value,
+        headers={**(headers or {}), 'Vary': 'Accept'}
+    )
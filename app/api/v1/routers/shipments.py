@@ -1,31 +1,282 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, AsyncIterator, Callable
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
 
-from app.api.dependencies import get_carrier_handler, validate_user_token
-from app.api.v1.schemas.schema_parcels import CarrierType
+from app.api.dependencies import (
+    get_carrier_handler,
+    get_carrier_handler_factory,
+    get_polling_carrier_handler_factory,
+    get_response_format,
+    get_settings,
+    get_shipment_subscriptions,
+    validate_user_token
+)
+from app.api.responses import NEGOTIATED_RESPONSES, ResponseFormat, json_response
+from app.api.v1.schemas.schema_parcels import (
+    CarrierType,
+    ShipmentBatchError,
+    ShipmentBatchRequest,
+    ShipmentBatchResponse,
+    ShipmentQuery
+)
+from app.config.base import Settings
 from app.schemas.schema_tracey import ShipmentStatus
-from app.services.carrier.base import Carrier
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.batch import track_shipments
+from app.services.carrier.bulk import BulkFormat, track_bulk_shipments
 
 from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.subscriptions import ShipmentKey, ShipmentSubscriptions
 
 router = APIRouter(
     prefix='/track',
     tags=['Track']
 )
 
+# The formats of the bulk uploads, keyed by their media type
+BULK_MEDIA_TYPES: dict[str, BulkFormat] = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv'
+}
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    A streaming response whose content is produced while the request's body is still being received.
+
+    A `StreamingResponse` listens for the client's disconnection by receiving the request's messages meanwhile,
+    which would drop the chunks of the body before the content reads them. Here, only the content receives them,
+    and the client's disconnection fails either reading the body or sending the response.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+        if self.background is not None:
+            await self.background()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Checks whether an `If-None-Match` header matches an ETag, using the weak comparison.
+
+    Args:
+        if_none_match (str): The value of the header, e.g. `"abc", W/"def"` or `*`.
+        etag (str): The (quoted) ETag of the current response.
+
+    Returns:
+        bool: True if any of the header's ETags matches, False otherwise.
+    """
+    return any(
+        candidate == '*' or candidate.removeprefix('W/') == etag
+        for candidate in (candidate.strip() for candidate in if_none_match.split(','))
+    )
+
+
+def _batch_item(query: ShipmentQuery, result: CachedShipment | CarrierException) -> bytes:
+    """
+    Serializes the result of a shipment of a batch, the same way as a `ShipmentBatchItem`.
+
+    Args:
+        query (ShipmentQuery): The carrier type and tracking number of the shipment.
+        result (CachedShipment | CarrierException): The shipment, or the exception describing why it failed.
 
-@router.get(path='/shipments', response_model=ShipmentStatus)
+    Returns:
+        bytes: The JSON of the result.
+    """
+    if isinstance(result, CarrierException):
+        shipment = b'null'
+        error = to_json(ShipmentBatchError(status_code=result.status_code, detail=result.message))
+    else:
+        shipment = result.render()
+        error = b'null'
+
+    return b'{"carrier_type":%s,"tracking_number":%s,"shipment":%s,"error":%s}' % (
+        to_json(query.carrier_type), to_json(query.tracking_number), shipment, error
+    )
+
+
+@router.get(path='/shipments', response_model=ShipmentStatus, responses=NEGOTIATED_RESPONSES)
 async def get_shipment(
         user: Annotated[str, Depends(validate_user_token)],
         carrier_type: CarrierType,
         tracking_number: str,
-        carrier_handler: Annotated[Carrier, Depends(get_carrier_handler)]
+        carrier_handler: Annotated[Carrier, Depends(get_carrier_handler)],
+        response_format: Annotated[ResponseFormat, Depends(get_response_format)],
+        limit: Annotated[int | None, Query(ge=0, description='The maximum number of (most recent) events')] = None,
+        since: Annotated[datetime | None, Query(description='Only the events after this time')] = None,
+        fields: Annotated[str | None, Query(description='The comma-separated fields to return, e.g. `status`')] = None,
+        if_none_match: Annotated[str | None, Header()] = None
 ):
+    selected_fields = None
+
+    if fields is not None:
+        selected_fields = {field.strip() for field in fields.split(',') if field.strip()}
+
+        if not selected_fields or not selected_fields <= set(CachedShipment.FIELDS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f'The fields must be among: {", ".join(CachedShipment.FIELDS)}!'
+            )
+
     try:
-        return await carrier_handler.get_shipment_and_transform_into_tracey()
+        cached_shipment = await carrier_handler.get_cached_shipment()
     except CarrierException as ex:
         raise HTTPException(
             status_code=ex.status_code,
             detail=ex.message
         )
+
+    # Clients (and proxies) can reuse the response for as long as the shipment is cached,
+    # then revalidate it with its ETag, which is answered without rendering the shipment again
+    etag = response_format.etag(cached_shipment.etag(limit=limit, since=since, fields=selected_fields))
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'max-age={cached_shipment.max_age()}',
+        'Vary': 'Accept'
+    }
+
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # The shipment is already serialized, so it's sent as-is (or only the requested parts of it)
+    # instead of being validated and encoded again
+    return json_response(
+        content=cached_shipment.render(limit=limit, since=since, fields=selected_fields),
+        response_format=response_format,
+        headers=headers
+    )
+
+
+@router.post(path='/shipments/batch', response_model=ShipmentBatchResponse, responses=NEGOTIATED_RESPONSES)
+async def get_shipments_in_batch(
+        user: Annotated[str, Depends(validate_user_token)],
+        batch: ShipmentBatchRequest,
+        settings: Annotated[Settings, Depends(get_settings)],
+        carrier_handler_factory: Annotated[Callable[[str, str], Carrier], Depends(get_carrier_handler_factory)],
+        response_format: Annotated[ResponseFormat, Depends(get_response_format)]
+):
+    # Duplicated shipments are tracked (and returned) only once
+    queries = list({
+        (query.carrier_type, query.tracking_number): query for query in batch.shipments
+    }.values())
+
+    if len(queries) > settings.TRACKING_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'A batch can contain at most {settings.TRACKING_BATCH_MAX_SIZE} shipments!'
+        )
+
+    results = await track_shipments(
+        carrier_handlers=[
+            carrier_handler_factory(query.carrier_type.value, query.tracking_number) for query in queries
+        ],
+        concurrency=settings.TRACKING_BATCH_CONCURRENCY
+    )
+
+    # The shipments are already serialized, so they're embedded as-is instead of being validated and encoded again
+    content = b'{"results":[%s]}' % b','.join(
+        _batch_item(query, result) for query, result in zip(queries, results)
+    )
+
+    return json_response(content=content, response_format=response_format)
+
+
+@router.post(path='/shipments/bulk', response_class=UploadStreamingResponse)
+async def get_shipments_in_bulk(
+        user: Annotated[str, Depends(validate_user_token)],
+        request: Request,
+        settings: Annotated[Settings, Depends(get_settings)],
+        carrier_handler_factory: Annotated[Callable[[str, str], Carrier], Depends(get_carrier_handler_factory)],
+        carrier_type: Annotated[
+            CarrierType | None, Query(description='The carrier type of the shipments which don\'t have one')
+        ] = None,
+        content_type: Annotated[str | None, Header()] = None
+):
+    """
+    Tracks an uploaded NDJSON or CSV file of shipments, streaming back their results as NDJSON while they're tracked.
+
+    The upload is read as it's received, and tracked with bounded concurrency, so files of any size can be
+    tracked. Each result line has the `line` number of the shipment in the upload, and either its `shipment`
+    status or an `error`. The last line is a `summary` of the results.
+    """
+    bulk_format = BULK_MEDIA_TYPES.get((content_type or '').split(';')[0].strip().lower())
+
+    if bulk_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f'The upload must be one of: {", ".join(BULK_MEDIA_TYPES)}!'
+        )
+
+    return UploadStreamingResponse(
+        content=track_bulk_shipments(
+            chunks=request.stream(),
+            bulk_format=bulk_format,
+            carrier_handler_factory=carrier_handler_factory,
+            concurrency=settings.TRACKING_BULK_CONCURRENCY,
+            default_carrier_type=carrier_type.value if carrier_type else None
+        ),
+        media_type='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@router.get(path='/subscriptions', response_class=StreamingResponse)
+async def subscribe_to_shipments(
+        user: Annotated[str, Depends(validate_user_token)],
+        carrier_type: CarrierType,
+        tracking_number: Annotated[list[str], Query(min_length=1, description='The tracking numbers to subscribe to')],
+        settings: Annotated[Settings, Depends(get_settings)],
+        subscriptions: Annotated[ShipmentSubscriptions, Depends(get_shipment_subscriptions)],
+        polling_carrier_handler_factory: Annotated[
+            Callable[[str, str], Carrier], Depends(get_polling_carrier_handler_factory)
+        ]
+):
+    """
+    Streams the new events of the given shipments as Server-Sent Events, as soon as they're found.
+
+    Each message is either a `shipment` event, with the new events of a shipment, or an `error` event,
+    when a shipment can't be retrieved. Every shipment is polled once for all its subscribers.
+    """
+    tracking_numbers = list(dict.fromkeys(tracking_number))
+
+    if len(tracking_numbers) > settings.TRACKING_SUBSCRIPTION_MAX_SHIPMENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'A subscription can contain at most {settings.TRACKING_SUBSCRIPTION_MAX_SHIPMENTS} shipments!'
+        )
+
+    def carrier_handler_factory(tracking_number: str) -> Callable[[], Carrier]:
+        # The shipments are polled for as long as they're subscribed to, so every poll
+        # uses the current event maps, instead of the ones of the subscribing request
+        return lambda: polling_carrier_handler_factory(carrier_type.value, tracking_number)
+
+    carrier_handler_factories: dict[ShipmentKey, Callable[[], Carrier]] = {
+        (carrier_type.value, tracking_number): carrier_handler_factory(tracking_number)
+        for tracking_number in tracking_numbers
+    }
+
+    async def stream() -> AsyncIterator[bytes]:
+        # The subscription starts along with the response, and ends whenever it does (e.g. the client disconnects)
+        subscription = subscriptions.subscribe(carrier_handler_factories, settings)
+
+        try:
+            async for message in subscription.stream(settings.TRACKING_SUBSCRIPTION_KEEP_ALIVE_INTERVAL):
+                yield message
+        finally:
+            subscriptions.unsubscribe(subscription)
+
+    return StreamingResponse(
+        content=stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,110 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import (
+    get_async_db_session,
+    get_response_format,
+    get_settings,
+    get_watchlist_refresher,
+    validate_user_token
+)
+from app.api.responses import NEGOTIATED_RESPONSES, ResponseFormat, model_response
+from app.api.v1.schemas.schema_parcels import CarrierType, WatchlistEntry, WatchlistRequest, WatchlistResponse
+from app.config.base import Settings
+from app.services.carrier.watchlist import AsyncWatchlistServices, WatchlistRefresher, WatchlistServices
+
+router = APIRouter(
+    prefix='/track/watchlist',
+    tags=['Watchlist']
+)
+
+
+@router.post(path='', response_model=WatchlistResponse, responses=NEGOTIATED_RESPONSES)
+async def add_to_watchlist(
+        user: Annotated[str, Depends(validate_user_token)],
+        watchlist: WatchlistRequest,
+        settings: Annotated[Settings, Depends(get_settings)],
+        db: Annotated[AsyncSession, Depends(get_async_db_session)],
+        refresher: Annotated[WatchlistRefresher, Depends(get_watchlist_refresher)],
+        response_format: Annotated[ResponseFormat, Depends(get_response_format)]
+):
+    shipments = list(dict.fromkeys(
+        (query.carrier_type.value, query.tracking_number) for query in watchlist.shipments
+    ))
+
+    if len(shipments) > settings.TRACKING_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'At most {settings.TRACKING_BATCH_MAX_SIZE} shipments can be added at once!'
+        )
+
+    added_at = await AsyncWatchlistServices.add_shipments(db=db, shipments=shipments)
+
+    # The shipments are refreshed right away, so they're cached before they're looked at
+    refresher.watch(
+        (carrier_type, tracking_number, added_at.timestamp()) for carrier_type, tracking_number in shipments
+    )
+
+    watchlist_response = WatchlistResponse(
+        entries=[
+            WatchlistEntry(
+                carrier_type=carrier_type,
+                tracking_number=tracking_number,
+                added_at=added_at,
+                is_active=True
+            )
+            for carrier_type, tracking_number in shipments
+        ]
+    )
+
+    return model_response(model=watchlist_response, response_format=response_format)
+
+
+@router.get(path='', response_model=WatchlistResponse, responses=NEGOTIATED_RESPONSES)
+async def get_watchlist(
+        user: Annotated[str, Depends(validate_user_token)],
+        settings: Annotated[Settings, Depends(get_settings)],
+        db: Annotated[AsyncSession, Depends(get_async_db_session)],
+        response_format: Annotated[ResponseFormat, Depends(get_response_format)]
+):
+    entries = await AsyncWatchlistServices.get_active_shipments(
+        db=db,
+        added_since=WatchlistServices.retention_start(settings.WATCHLIST_RETENTION_DAYS)
+    )
+
+    watchlist_response = WatchlistResponse(
+        entries=[
+            WatchlistEntry(
+                carrier_type=entry.carrier_type,
+                tracking_number=entry.tracking_number,
+                added_at=entry.added_at,
+                is_active=entry.is_active
+            )
+            for entry in entries
+        ]
+    )
+
+    return model_response(model=watchlist_response, response_format=response_format)
+
+
+@router.delete(path='', status_code=status.HTTP_204_NO_CONTENT)
+async def remove_from_watchlist(
+        user: Annotated[str, Depends(validate_user_token)],
+        carrier_type: CarrierType,
+        tracking_number: str,
+        db: Annotated[AsyncSession, Depends(get_async_db_session)],
+        refresher: Annotated[WatchlistRefresher, Depends(get_watchlist_refresher)]
+):
+    shipment = (carrier_type.value, tracking_number)
+
+    if not await AsyncWatchlistServices.remove_shipment(db=db, shipment=shipment):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Shipment with given tracking number is not in the watchlist!'
+        )
+
+    refresher.unwatch(shipment)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,51 @@
+from datetime import datetime
 from enum import Enum
 
+from pydantic import BaseModel, Field
+
+from app.config.base import Settings
+from app.schemas.schema_tracey import ShipmentStatus
+
+# The oversized batches are rejected while they're validated, before any of their shipments is
+BATCH_MAX_SIZE = Settings().TRACKING_BATCH_MAX_SIZE
+
 
 class CarrierType(Enum):
     DHL = 'dhl'
     BPOST = 'bpost'
+
+
+class ShipmentQuery(BaseModel):
+    carrier_type: CarrierType
+    tracking_number: str = Field(min_length=1)
+
+
+class ShipmentBatchRequest(BaseModel):
+    shipments: list[ShipmentQuery] = Field(min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class ShipmentBatchError(BaseModel):
+    status_code: int
+    detail: str
+
+
+class ShipmentBatchItem(ShipmentQuery):
+    shipment: ShipmentStatus | None = None
+    error: ShipmentBatchError | None = None
+
+
+class ShipmentBatchResponse(BaseModel):
+    results: list[ShipmentBatchItem]
+
+
+class WatchlistRequest(BaseModel):
+    shipments: list[ShipmentQuery] = Field(min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class WatchlistEntry(ShipmentQuery):
+    added_at: datetime
+    is_active: bool
+
+
+class WatchlistResponse(BaseModel):
+    entries: list[WatchlistEntry]
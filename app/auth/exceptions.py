@@ -1,2 +1,6 @@
 class InvalidCredentialsError(Exception):
     pass
+
+
+class PasswordHasherBusyError(Exception):
+    pass
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from passlib.context import CryptContext
+from sqlalchemy import Column
+
+from app.auth.exceptions import PasswordHasherBusyError
+
+# Building a context parses its schemes and settings, so it's built once and shared (it's thread-safe)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies the passwords in a bounded pool of worker threads, instead of on the event loop.
+
+    A bcrypt hash costs a few hundred milliseconds of CPU, during which a worker would serve no other request
+    if it was computed on the event loop. bcrypt releases the GIL while hashing, so threads are enough for the
+    hashes to run in parallel with the event loop (and with each other, up to the number of cores).
+
+    At most `workers` passwords are hashed at once, and at most `max_queue` more wait for a thread. Beyond that,
+    the passwords are rejected right away with a `PasswordHasherBusyError`, rather than queued for longer than
+    the clients would wait for them.
+
+    Note:
+        The pool is created on first use, with the default sizes unless it's configured on startup.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 16):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats: Counter[str] = Counter()
+        self._total_wait_time = 0.0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def configure(self, workers: int, max_queue: int):
+        """
+        Sizes the pool, replacing the current one (whose pending passwords are still hashed).
+
+        Args:
+            workers (int): The number of passwords hashed at once.
+            max_queue (int): The number of passwords waiting for a thread, beyond which they're rejected.
+        """
+        self.shutdown()
+        self.workers = workers
+        self.max_queue = max_queue
+
+    def shutdown(self):
+        """
+        Shuts the pool down, without waiting for its pending passwords.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def hash(self, password: str) -> str:
+        """
+        Hashes a password.
+
+        Args:
+            password (str): The password to be hashed.
+
+        Returns:
+            str: The hashed password.
+
+        Raises:
+            PasswordHasherBusyError: If too many passwords are already waiting to be hashed.
+        """
+        return await self._run(pwd_context.hash, password)  # type: ignore[no-any-return]
+
+    async def verify(self, plain_password: str, hashed_password: str | Column[str]) -> bool:
+        """
+        Verifies if the plain password matches the hashed password.
+
+        Args:
+            plain_password (str): The plain text password to be verified.
+            hashed_password (str): The hashed password stored in the database.
+
+        Returns:
+            bool: True if the plain password matches the hashed password, False otherwise.
+
+        Raises:
+            PasswordHasherBusyError: If too many passwords are already waiting to be verified.
+        """
+        return await self._run(pwd_context.verify, plain_password, hashed_password)  # type: ignore[no-any-return]
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._stats['rejected'] += 1
+                raise PasswordHasherBusyError
+
+            self._pending += 1
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+
+        submitted = time.perf_counter()
+
+        def _timed() -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._total_wait_time += started - submitted
+
+        future = self._executor.submit(_timed)
+        # Also called when the password is dropped from the queue, e.g. if the request is cancelled meanwhile
+        future.add_done_callback(lambda _: self._done(submitted))
+
+        return await asyncio.wrap_future(future)
+
+    def _done(self, submitted: float):
+        latency = time.perf_counter() - submitted
+
+        with self._lock:
+            self._pending -= 1
+            self._stats['hashes'] += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hashes = self._stats['hashes']
+
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'running': min(self._pending, self.workers),
+                'queued': max(0, self._pending - self.workers),
+                'hashes': hashes,
+                'rejected': self._stats['rejected'],
+                'average_wait_time': round(self._total_wait_time / hashes, 4) if hashes else 0.0,
+                'average_latency': round(self._total_latency / hashes, 4) if hashes else 0.0,
+                'max_latency': round(self._max_latency, 4)
+            }
+
+
+password_hasher = PasswordHasher()
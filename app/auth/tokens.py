@@ -0,0 +1,175 @@
+import hashlib
+import time
+from collections import Counter, OrderedDict
+from typing import Any, NamedTuple
+
+
+class _Claims(NamedTuple):
+    claims: dict[str, Any]
+    expires_at: float
+
+
+class TokenClaimsCache:
+    """
+    Caches the claims of the verified access tokens, so a token reused for many requests is decoded
+    (and its signature verified) once, instead of on every request.
+
+    The entries are keyed by a hash of the token, so the tokens themselves aren't kept in memory, and
+    are kept in least-recently-used order, bounded by a maximum number of entries. An entry never outlives
+    the `exp` claim of its token, nor `max_ttl` seconds, and the tokens without an `exp` claim aren't cached.
+
+    It's also where the access tokens are revoked: once a subject is revoked (e.g. when the theft of one of its
+    refresh tokens is detected), all its tokens issued until then (per their `iat` claim) are rejected, whether
+    they're cached or not, until they would have expired anyway, i.e. for `revocation_ttl` seconds.
+
+    Note:
+        The cache, and so the revocations, are per process: the other workers keep accepting the revoked tokens
+        they've verified (for `max_ttl` seconds at most), as well as the ones they verify, until they expire.
+        None of the operations await, so they are atomic from the event loop's point of view.
+    """
+
+    def __init__(self, max_entries: int = 10_000, max_ttl: float = 300.0, revocation_ttl: float = 24 * 3600.0):
+        """
+        Initializes a TokenClaimsCache instance.
+
+        Args:
+            max_entries (int, optional): The maximum number of cached tokens, 0 for disabling the cache.
+            max_ttl (float, optional): How long (in seconds) the claims of a token are cached at most.
+            revocation_ttl (float, optional): How long (in seconds) a revocation is kept, i.e. the lifetime
+                of the access tokens.
+        """
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.revocation_ttl = revocation_ttl
+
+        self._entries: OrderedDict[bytes, _Claims] = OrderedDict()
+        self._revoked_before: dict[str, float] = {}
+        self._stats: Counter[str] = Counter()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        """
+        Retrieves the claims of a token verified earlier.
+
+        Args:
+            token (str): The encoded token.
+
+        Returns:
+            dict[str, Any] | None: The claims of the token, or None if it's not cached (or has expired).
+        """
+        key = self._key(token)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self._stats['misses'] += 1
+            return None
+
+        if entry.expires_at <= time.time():
+            del self._entries[key]
+            self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return None
+
+        if self.is_revoked(entry.claims):
+            del self._entries[key]
+            self._stats['misses'] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._stats['hits'] += 1
+
+        return entry.claims
+
+    def set(self, token: str, claims: dict[str, Any]):
+        """
+        Caches the claims of a verified token, until it expires.
+
+        Args:
+            token (str): The encoded token.
+            claims (dict[str, Any]): The claims of the token, as decoded after verifying its signature.
+        """
+        expiration = claims.get('exp')
+
+        if self.max_entries <= 0 or not isinstance(expiration, (int, float)) or self.is_revoked(claims):
+            return
+
+        expires_at = min(float(expiration), time.time() + self.max_ttl)
+        key = self._key(token)
+
+        self._entries.pop(key, None)
+
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+        self._entries[key] = _Claims(claims=claims, expires_at=expires_at)
+
+    def revoke_subject(self, subject: str) -> int:
+        """
+        Revokes all the tokens of a subject issued until now, e.g. when the theft of one of its tokens is detected.
+
+        Args:
+            subject (str): The subject of the tokens (their `sub` claim), i.e. the username.
+
+        Returns:
+            int: The number of cached tokens removed.
+        """
+        now = time.time()
+
+        # The revocations of the tokens which have expired since then are of no use anymore
+        for revoked_subject, revoked_before in list(self._revoked_before.items()):
+            if revoked_before + self.revocation_ttl <= now:
+                del self._revoked_before[revoked_subject]
+
+        # The `iat` claim is in seconds, so the tokens issued during the current second are revoked as well
+        self._revoked_before[subject] = float(int(now))
+
+        keys = [key for key, entry in self._entries.items() if entry.claims.get('sub') == subject]
+
+        for key in keys:
+            del self._entries[key]
+
+        self._stats['revocations'] += 1
+        self._stats['invalidations'] += len(keys)
+        return len(keys)
+
+    def is_revoked(self, claims: dict[str, Any]) -> bool:
+        """
+        Checks whether a token has been revoked, i.e. issued before its subject has been revoked.
+
+        Args:
+            claims (dict[str, Any]): The claims of the token.
+
+        Returns:
+            bool: True if the token has been revoked, False otherwise.
+        """
+        revoked_before = self._revoked_before.get(claims.get('sub'))  # type: ignore[arg-type]
+
+        if revoked_before is None or revoked_before + self.revocation_ttl <= time.time():
+            return False
+
+        issued_at = claims.get('iat')
+
+        # The tokens which don't tell when they've been issued may have been issued before
+        return not isinstance(issued_at, (int, float)) or issued_at <= revoked_before
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['misses']
+
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self._stats['hits'],
+            'misses': self._stats['misses'],
+            'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+            'evictions': self._stats['evictions'],
+            'expirations': self._stats['expirations'],
+            'revocations': self._stats['revocations'],
+            'invalidations': self._stats['invalidations']
+        }
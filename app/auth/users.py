@@ -1,15 +1,20 @@
+import hashlib
+import secrets
 from datetime import timedelta, datetime, timezone
 from logging import getLogger
 
 from jose import jwt
 from passlib.context import CryptContext
-from sqlalchemy import Column
+from sqlalchemy import Column, select, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.auth.exceptions import InvalidCredentialsError
+from app.auth.hashing import password_hasher, pwd_context
+from app.auth.tokens import TokenClaimsCache
 from app.db.exceptions import DatabaseIntegrityError
-from app.db.models import UserModel
+from app.db.models import RefreshTokenModel, UserModel
 from app.schemas.schema_users import Token, User
 
 logger = getLogger(__name__)
@@ -24,10 +29,12 @@ class UserServices:
     @staticmethod
     def get_pwd_context() -> CryptContext:
         """
-        Returns a CryptContext instance initialized with bcrypt scheme and auto-deprecation handling.
+        Returns the CryptContext instance initialized with bcrypt scheme and auto-deprecation handling.
 
+        Notes:
+            The context is built once and shared, instead of being built for every password.
         """
-        return CryptContext(schemes=["bcrypt"], deprecated="auto")
+        return pwd_context
 
     @staticmethod
     def hashed_password(password: str) -> str:
@@ -157,6 +164,315 @@ class UserServices:
         return user
 
 
+class AsyncUserServices:
+    """
+    A class responsible for managing user-related operations, through an asynchronous database session,
+    so the queries don't block the event loop.
+
+    """
+
+    @staticmethod
+    async def create_user(
+            db: AsyncSession,
+            email: str,
+            username: str,
+            password: str
+    ) -> User:
+        """
+        Creates a new user in the database with the provided email, username, and password.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            email (str): The email address of the user.
+            username (str): The username of the user.
+            password (str): The plain text password of the user.
+
+        Returns:
+            User: The newly created user object.
+
+        Raises:
+            DatabaseIntegrityError: If there is a conflict in uniqueness constraints,
+            such as duplicate email or username.
+            PasswordHasherBusyError: If too many passwords are already being hashed.
+        """
+        try:
+            db.add(
+                UserModel(
+                    email=email,
+                    username=username,
+                    password=await password_hasher.hash(password)
+                )
+            )
+
+            await db.commit()
+
+            return User(
+                username=username,
+                email=email
+            )
+        except IntegrityError as e:
+            logger.error(e)
+            await db.rollback()
+            raise DatabaseIntegrityError(message=str(e))
+
+    @staticmethod
+    async def get_user(
+            db: AsyncSession,
+            username: str
+    ) -> UserModel:
+        """
+        Retrieves a user from the database based on the provided username.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            username (str): The username of the user to retrieve.
+
+        Returns:
+            UserModel: The user object corresponding to the provided username.
+
+        Raises:
+            InvalidCredentialsError: If the user with the provided username does not exist.
+        """
+        user: UserModel | None = await db.scalar(select(UserModel).where(UserModel.username == username))
+
+        if not user:
+            raise InvalidCredentialsError
+
+        return user
+
+    @staticmethod
+    async def authenticate_user(
+            db: AsyncSession,
+            username: str,
+            password: str
+    ) -> UserModel:
+        """
+        Authenticates a user based on the provided username and password.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            username (str): The username of the user to authenticate.
+            password (str): The password of the user to authenticate.
+
+        Returns:
+            UserModel: The authenticated user object.
+
+        Raises:
+            InvalidCredentialsError: If the provided username or password is incorrect.
+            PasswordHasherBusyError: If too many passwords are already being verified.
+        """
+        user = await AsyncUserServices.get_user(db=db, username=username)
+
+        if not await password_hasher.verify(password, user.password):
+            raise InvalidCredentialsError
+
+        return user
+
+
+class RefreshTokenServices:
+    """
+    A class responsible for managing the refresh tokens, which renew the access tokens without the users' passwords.
+
+    The refresh tokens are random (rather than JWTs), and only their SHA-256 is stored, so renewing an access
+    token is an indexed lookup instead of a password verification. They're rotated on every use: using a
+    refresh token revokes it and issues a new one, and using a revoked refresh token again (i.e. a stolen one,
+    or the one it was rotated into) revokes all the refresh tokens of its user.
+
+    """
+
+    @staticmethod
+    def hash_token(refresh_token: str) -> str:
+        """
+        Hashes a refresh token, to store it or look it up.
+
+        Args:
+            refresh_token (str): The refresh token.
+
+        Returns:
+            str: The SHA-256 of the refresh token, in hexadecimal.
+
+        Notes:
+            The refresh tokens have 256 bits of entropy, so they don't need a slow hash like the passwords do.
+        """
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+    @staticmethod
+    def _add_refresh_token(db: AsyncSession, user_id: int, expire_time: int) -> str:
+        refresh_token = secrets.token_urlsafe(32)
+
+        db.add(
+            RefreshTokenModel(
+                user_id=user_id,
+                token_hash=RefreshTokenServices.hash_token(refresh_token),
+                expires_at=datetime.now(timezone.utc) + timedelta(days=expire_time)
+            )
+        )
+
+        return refresh_token
+
+    @staticmethod
+    async def issue_refresh_token(
+            db: AsyncSession,
+            user_id: int,
+            expire_time: int
+    ) -> str:
+        """
+        Issues a new refresh token to a user.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            user_id (int): The ID of the user.
+            expire_time (int): The expiration time for the refresh token in days.
+
+        Returns:
+            str: The refresh token.
+        """
+        refresh_token = RefreshTokenServices._add_refresh_token(db=db, user_id=user_id, expire_time=expire_time)
+        await db.commit()
+
+        return refresh_token
+
+    @staticmethod
+    async def rotate_refresh_token(
+            db: AsyncSession,
+            refresh_token: str,
+            expire_time: int,
+            claims_cache: TokenClaimsCache | None = None,
+            reuse_grace: float = 0.0
+    ) -> tuple[UserModel, str]:
+        """
+        Revokes a refresh token, and issues a new one to its user.
+
+        A revoked refresh token which is used again is taken as stolen, so all the tokens of its user are revoked.
+        Concurrent rotations of the same token (e.g. a client refreshing from several tabs) rotate it only once,
+        and the other ones find it revoked as well, so the token is only rejected when it's used within
+        `reuse_grace` seconds of being revoked, instead of revoking the new token of the rotation which won.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            refresh_token (str): The refresh token to rotate.
+            expire_time (int): The expiration time for the new refresh token in days.
+            claims_cache (TokenClaimsCache, optional): Where the user's access tokens are revoked,
+                if a revoked refresh token is reused.
+            reuse_grace (float, optional): The seconds after its revocation within which a refresh token
+                is rejected without revoking the other tokens of its user. Defaults to 0.
+
+        Returns:
+            tuple[UserModel, str]: The user of the refresh token, and their new refresh token.
+
+        Raises:
+            InvalidCredentialsError: If the refresh token doesn't exist, has expired or has been revoked.
+        """
+        token_hash = RefreshTokenServices.hash_token(refresh_token)
+        now = datetime.now(timezone.utc)
+
+        # Revoking the token only if it's still valid makes concurrent rotations of the same token rotate it once
+        user_id = await db.scalar(
+            update(RefreshTokenModel)
+            .where(
+                RefreshTokenModel.token_hash == token_hash,
+                RefreshTokenModel.revoked_at.is_(None),
+                RefreshTokenModel.expires_at > now
+            )
+            .values(revoked_at=now)
+            .returning(RefreshTokenModel.user_id)
+        )
+
+        if user_id is None:
+            await db.rollback()
+            # A token revoked within the grace period has most likely been rotated by a concurrent request
+            revoked_user_id = await db.scalar(
+                select(RefreshTokenModel.user_id).where(
+                    RefreshTokenModel.token_hash == token_hash,
+                    RefreshTokenModel.revoked_at <= now - timedelta(seconds=reuse_grace)
+                )
+            )
+
+            if revoked_user_id is not None:
+                logger.warning(f'A revoked refresh token of the user {revoked_user_id} has been reused')
+                await RefreshTokenServices.revoke_user_refresh_tokens(
+                    db=db,
+                    user_id=revoked_user_id,
+                    claims_cache=claims_cache
+                )
+
+            raise InvalidCredentialsError
+
+        user = await db.get(UserModel, user_id)
+
+        if user is None:
+            await db.rollback()
+            raise InvalidCredentialsError
+
+        new_refresh_token = RefreshTokenServices._add_refresh_token(db=db, user_id=user_id, expire_time=expire_time)
+        await db.commit()
+
+        return user, new_refresh_token
+
+    @staticmethod
+    async def revoke_refresh_token(
+            db: AsyncSession,
+            refresh_token: str
+    ) -> bool:
+        """
+        Revokes a refresh token, e.g. when its user logs out.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            refresh_token (str): The refresh token to revoke.
+
+        Returns:
+            bool: True if the refresh token has been revoked, False if it doesn't exist or was already revoked.
+        """
+        result = await db.execute(
+            update(RefreshTokenModel)
+            .where(
+                RefreshTokenModel.token_hash == RefreshTokenServices.hash_token(refresh_token),
+                RefreshTokenModel.revoked_at.is_(None)
+            )
+            .values(revoked_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
+
+        return bool(result.rowcount)  # type: ignore[attr-defined]
+
+    @staticmethod
+    async def revoke_user_refresh_tokens(
+            db: AsyncSession,
+            user_id: int,
+            claims_cache: TokenClaimsCache | None = None
+    ) -> int:
+        """
+        Revokes all the refresh tokens of a user, e.g. when one of them is reused after being rotated,
+        along with their access tokens if the cache of the tokens' claims is given.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            user_id (int): The ID of the user.
+            claims_cache (TokenClaimsCache, optional): Where the user's access tokens are revoked.
+
+        Returns:
+            int: The number of refresh tokens revoked.
+        """
+        result = await db.execute(
+            update(RefreshTokenModel)
+            .where(
+                RefreshTokenModel.user_id == user_id,
+                RefreshTokenModel.revoked_at.is_(None)
+            )
+            .values(revoked_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
+
+        if claims_cache is not None:
+            username = await db.scalar(select(UserModel.username).where(UserModel.id == user_id))
+
+            if username is not None:
+                claims_cache.revoke_subject(username)
+
+        return result.rowcount  # type: ignore[attr-defined,no-any-return]
+
+
 class UserAuthServices:
     """
     A class responsible for managing users authentication and authorization.
@@ -183,8 +499,10 @@ class UserAuthServices:
             str: The encoded access token.
         """
         to_encode = data.copy()
-        expire = datetime.now(timezone.utc) + expires_delta
-        to_encode.update({"exp": expire})
+        now = datetime.now(timezone.utc)
+        expire = now + expires_delta
+        # The issue time tells whether the token has been revoked since then (see `TokenClaimsCache`)
+        to_encode.update({"exp": expire, "iat": now})
         encoded_jwt: str = jwt.encode(to_encode, secret_key, algorithm=algorithm)
         return encoded_jwt
 
@@ -231,3 +549,103 @@ class UserAuthServices:
         )
 
         return Token(access_token=access_token, token_type="bearer")
+
+    @staticmethod
+    async def authenticate_user_and_create_token_async(
+            db: AsyncSession,
+            username: str,
+            password: str,
+            access_token_expire_time: int,
+            secret_key: str,
+            algorithm: str,
+            refresh_token_expire_time: int | None = None
+    ) -> Token:
+        """
+        Authenticates a user through an asynchronous database session, and creates an access token for them.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            username (str): The username of the user to authenticate.
+            password (str): The password of the user to authenticate.
+            access_token_expire_time (int): The expiration time for the access token in minutes.
+            secret_key (str): The secret key used for encoding the access token.
+            algorithm (str): The algorithm used for encoding the access token.
+            refresh_token_expire_time (int, optional): The expiration time for the refresh token in days,
+                if one is issued along with the access token.
+
+        Returns:
+            Token: The access token (and refresh token) and token type for the authenticated user.
+
+        Raises:
+            InvalidCredentialsError: If the provided username or password is incorrect.
+            PasswordHasherBusyError: If too many passwords are already being verified.
+        """
+        user = await AsyncUserServices.authenticate_user(
+            db=db,
+            username=username,
+            password=password
+        )
+
+        access_token = UserAuthServices.create_access_token(
+            data={"sub": user.username},
+            expires_delta=timedelta(minutes=access_token_expire_time),
+            secret_key=secret_key,
+            algorithm=algorithm
+        )
+
+        refresh_token = await RefreshTokenServices.issue_refresh_token(
+            db=db,
+            user_id=user.id,  # type: ignore[arg-type]
+            expire_time=refresh_token_expire_time
+        ) if refresh_token_expire_time is not None else None
+
+        return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
+
+    @staticmethod
+    async def refresh_access_token(
+            db: AsyncSession,
+            refresh_token: str,
+            access_token_expire_time: int,
+            refresh_token_expire_time: int,
+            secret_key: str,
+            algorithm: str,
+            claims_cache: TokenClaimsCache | None = None,
+            refresh_token_reuse_grace: float = 0.0
+    ) -> Token:
+        """
+        Creates a new access token from a refresh token, which is rotated, without the user's password.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            refresh_token (str): The refresh token of the user.
+            access_token_expire_time (int): The expiration time for the access token in minutes.
+            refresh_token_expire_time (int): The expiration time for the new refresh token in days.
+            secret_key (str): The secret key used for encoding the access token.
+            algorithm (str): The algorithm used for encoding the access token.
+            claims_cache (TokenClaimsCache, optional): Where the user's access tokens are revoked,
+                if a revoked refresh token is reused.
+            refresh_token_reuse_grace (float, optional): The seconds after its rotation within which the refresh
+                token is rejected without revoking the other tokens of its user. Defaults to 0.
+
+        Returns:
+            Token: The new access token and refresh token, and the token type, for the user.
+
+        Raises:
+            InvalidCredentialsError: If the refresh token doesn't exist, has expired or has been revoked.
+        """
+        user, new_refresh_token = await RefreshTokenServices.rotate_refresh_token(
+            db=db,
+            refresh_token=refresh_token,
+            expire_time=refresh_token_expire_time,
+            claims_cache=claims_cache,
+            reuse_grace=refresh_token_reuse_grace
+        )
+
+        access_token = UserAuthServices.create_access_token(
+            data={"sub": user.username},
+            expires_delta=timedelta(minutes=access_token_expire_time),
+            secret_key=secret_key,
+            algorithm=algorithm
+        )
+
+        return Token(access_token=access_token, token_type="bearer", refresh_token=new_refresh_token)
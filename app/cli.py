@@ -0,0 +1,128 @@
+"""
+Command-line entry points of the application, for the tasks run by hand rather than through the API.
+
+Usage:
+    poetry run python -m app.cli track-bulk shipments.csv > results.ndjson
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, get_args
+
+from app.api.dependencies import build_carrier_handler, get_settings
+from app.api.v1.schemas.schema_parcels import CarrierType
+from app.services.carrier.bulk import BulkFormat, track_bulk_shipments
+from app.services.carrier.dhl import DHL_API_BASE_URL
+from app.services.carrier.http_client import carrier_http_clients
+from app.utils.cache import cache, create_cache_backend
+
+# The size of the chunks the files are read in
+CHUNK_SIZE = 64 * 1024
+
+# The formats of the files, keyed by their extension
+BULK_EXTENSIONS: dict[str, BulkFormat] = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv'
+}
+
+
+async def _read_chunks(file: BinaryIO) -> AsyncIterator[bytes]:
+    """
+    Reads a file in chunks, without blocking the event loop.
+
+    Args:
+        file (BinaryIO): The file to read.
+
+    Yields:
+        bytes: The chunks of the file.
+    """
+    while chunk := await asyncio.to_thread(file.read, CHUNK_SIZE):
+        yield chunk
+
+
+async def track_bulk(path: str, bulk_format: BulkFormat, carrier_type: str | None, concurrency: int):
+    """
+    Tracks an NDJSON or CSV file of shipments, writing their results to the standard output as NDJSON.
+
+    Args:
+        path (str): The path of the file, or `-` for the standard input.
+        bulk_format (BulkFormat): The format of the file, either `ndjson` or `csv`.
+        carrier_type (str | None): The carrier type of the shipments which don't have one.
+        concurrency (int): The maximum number of shipments tracked at once.
+    """
+    settings = get_settings()
+
+    cache.configure(backend=create_cache_backend(settings))
+    await carrier_http_clients.startup(
+        settings=settings,
+        base_urls={CarrierType.DHL.value: DHL_API_BASE_URL}
+    )
+
+    file = sys.stdin.buffer if path == '-' else open(path, 'rb')
+
+    try:
+        results = track_bulk_shipments(
+            chunks=_read_chunks(file),
+            bulk_format=bulk_format,
+            carrier_handler_factory=build_carrier_handler,
+            concurrency=concurrency,
+            default_carrier_type=carrier_type
+        )
+
+        # Every result is flushed as soon as it's available, so the progress can be followed (e.g. with `tail -f`)
+        async for line in results:
+            sys.stdout.buffer.write(line)
+            sys.stdout.buffer.flush()
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+
+        await carrier_http_clients.shutdown()
+        await cache.close()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog='python -m app.cli', description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    track_bulk_parser = commands.add_parser(
+        'track-bulk',
+        help='Track an NDJSON or CSV file of shipments, writing their results to the standard output as NDJSON.'
+    )
+    track_bulk_parser.add_argument('path', help='The path of the file, or `-` for the standard input.')
+    track_bulk_parser.add_argument(
+        '--format',
+        choices=get_args(BulkFormat),
+        help='The format of the file, guessed from its extension by default.'
+    )
+    track_bulk_parser.add_argument(
+        '--carrier-type',
+        choices=[carrier_type.value for carrier_type in CarrierType],
+        help='The carrier type of the shipments which don\'t have one.'
+    )
+    track_bulk_parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=get_settings().TRACKING_BULK_CONCURRENCY,
+        help='The maximum number of shipments tracked at once.'
+    )
+
+    args = parser.parse_args(argv)
+
+    bulk_format = args.format or BULK_EXTENSIONS.get(Path(args.path).suffix.lower())
+
+    if bulk_format is None:
+        parser.error(f'The format of {args.path} can\'t be guessed, please use --format!')
+
+    asyncio.run(track_bulk(
+        path=args.path,
+        bulk_format=bulk_format,
+        carrier_type=args.carrier_type,
+        concurrency=args.concurrency
+    ))
+
+
+if __name__ == '__main__':
+    main()
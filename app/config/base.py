@@ -1,20 +1,138 @@
 import os
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     DHL_API_KEY: str | None = None
+    # The rate limit of the DHL API key: calls per second, and calls allowed at once. It's enforced by each process
+    # on its own, so it's divided between the `CARRIER_RATE_LIMIT_PROCESSES` sharing the key (all the workers of
+    # all the pods), and the calls waiting longer than `CARRIER_RATE_LIMIT_MAX_WAIT` seconds are rejected with a 503
+    DHL_RATE_LIMIT_PER_SECOND: float = 0.2
+    DHL_RATE_LIMIT_BURST: int = 1
+    CARRIER_RATE_LIMIT_PROCESSES: int = 1
+    CARRIER_RATE_LIMIT_MAX_WAIT: float = 30.0
 
     POSTGRES_DATABASE: str | None = None
     POSTGRES_USERNAME: str | None = None
     POSTGRES_PASSWORD: str | None = None
     POSTGRES_PORT: str | None = None
     POSTGRES_HOST: str | None = None
+    # The connection pool shared by all the requests of a worker: the connections kept open, the ones opened
+    # beyond them under load, how long (in seconds) to wait for one, how long one is reused for (-1 for no limit),
+    # and whether they're tested before being used (e.g. after a restart of the database). The same settings apply
+    # to the asynchronous pool (used by the user endpoints), so a worker may open up to twice as many connections
+    POSTGRES_POOL_SIZE: int = 5
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: float = 30.0
+    POSTGRES_POOL_RECYCLE: int = 1800
+    POSTGRES_POOL_PRE_PING: bool = True
 
     JWT_SECRET_KEY: str | None = None
     JWT_ALGORITHM: str | None = None
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: str | None = None
+    # The refresh tokens are rotated on every use, and expire after this many days unless they're used
+    JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # A rotated refresh token used again is taken as stolen, and all the tokens of its user are revoked, unless
+    # it's used within this many seconds of its rotation, e.g. by concurrent requests of the same client
+    JWT_REFRESH_TOKEN_REUSE_GRACE: float = 10.0
+    # The claims of the verified tokens are cached (never beyond their expiration), so the tokens reused
+    # for many requests are decoded once: the number of tokens cached (0 for none), and for how long at most
+    JWT_CLAIMS_CACHE_MAX_ENTRIES: int = 10_000
+    JWT_CLAIMS_CACHE_MAX_TTL: float = 300.0
+    # The users allowed to operate the application, e.g. to read the metrics or reload the Tracey events file
+    ADMIN_USERNAMES: list[str] = []
+
+    # The threads hashing (and verifying) the passwords with bcrypt, off the event loop, and how many passwords
+    # may wait for them, beyond which the logins are rejected with a 503 instead of waiting
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 16
+
+    # Pooled HTTP clients used for calling the carriers' APIs (one client per carrier)
+    CARRIER_HTTP2: bool = True
+    CARRIER_HTTP_MAX_CONNECTIONS: int = 100
+    CARRIER_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    CARRIER_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    CARRIER_HTTP_CONNECT_TIMEOUT: float = 5.0
+    CARRIER_HTTP_READ_TIMEOUT: float = 30.0
+    CARRIER_HTTP_WRITE_TIMEOUT: float = 10.0
+    CARRIER_HTTP_POOL_TIMEOUT: float = 5.0
+    CARRIER_HTTP_PREWARM_CONNECTIONS: int = 0
+
+    # Circuit breaker of the carriers' APIs: the circuit opens once the rate of failed (or slow) calls
+    # in the last `CARRIER_CIRCUIT_WINDOW_SIZE` calls reaches its threshold, and lets probe calls through
+    # after `CARRIER_CIRCUIT_OPEN_DURATION` seconds
+    CARRIER_CIRCUIT_FAILURE_RATE: float = 0.5
+    CARRIER_CIRCUIT_SLOW_CALL_DURATION: float = 10.0
+    CARRIER_CIRCUIT_SLOW_CALL_RATE: float = 0.5
+    CARRIER_CIRCUIT_WINDOW_SIZE: int = 20
+    CARRIER_CIRCUIT_MINIMUM_CALLS: int = 10
+    CARRIER_CIRCUIT_OPEN_DURATION: float = 30.0
+    CARRIER_CIRCUIT_HALF_OPEN_PROBES: int = 1
+
+    # Adaptive timeout of the calls to the carriers' APIs (until their response is read): a multiple of the given
+    # percentile of the recent successful calls' latency, between `CARRIER_TIMEOUT_MIN` and `CARRIER_HTTP_READ_TIMEOUT`
+    CARRIER_TIMEOUT_PERCENTILE: float = 0.99
+    CARRIER_TIMEOUT_MULTIPLIER: float = 2.0
+    CARRIER_TIMEOUT_MIN: float = 2.0
+
+    # Cache TTLs (in seconds) of the shipments per carrier, based on their current status
+    # (see `CacheTTLPolicy` for the supported keys)
+    CACHE_TTL_POLICIES: dict[str, dict[str, int]] = {
+        'dhl': {
+            'default': 3600,
+            'returned': 7 * 24 * 3600,
+            'delivered': 7 * 24 * 3600,
+            'out for delivery': 300
+        }
+    }
+
+    # The cache backend: `memory` for a per-process cache, or `redis` for a cache shared by all the
+    # workers (with a per-process cache in front of it, keeping entries for up to `CACHE_L1_TTL` seconds)
+    CACHE_BACKEND: Literal['memory', 'redis'] = 'memory'
+    CACHE_REDIS_URL: str = 'redis://localhost:6379/0'
+    CACHE_L1_TTL: float = 5.0
+
+    # Limits of the per-process cache, and its eviction policy (`lru` or `tinylfu`)
+    CACHE_MAX_ENTRIES: int = 100_000
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    CACHE_EVICTION_POLICY: Literal['lru', 'tinylfu'] = 'lru'
+
+    # How long (in seconds) a shipment can be served stale after its TTL, while it's being refreshed
+    CACHE_STALE_TTL: int = 3600
+
+    # The events file mapping the carriers' events to Tracey events, and how often (in seconds)
+    # it's checked for changes, to reload it without restarting the application (0 disables it)
+    TRACEY_EVENT_MAP_PATH: str = 'filtered_events.json'
+    TRACEY_EVENT_MAP_RELOAD_INTERVAL: float = 5.0
+
+    # Batch tracking
+    TRACKING_BATCH_MAX_SIZE: int = 500
+    TRACKING_BATCH_CONCURRENCY: int = 10
+
+    # Bulk tracking of uploaded files: how many shipments are tracked at once
+    TRACKING_BULK_CONCURRENCY: int = 10
+
+    # Subscriptions to the shipments' new events: how many shipments a client can subscribe to at once,
+    # how often (in seconds) a shipment is polled (following its cache TTL, within these bounds),
+    # how often a comment is sent to idle clients, and how many messages can wait for a slow client
+    TRACKING_SUBSCRIPTION_MAX_SHIPMENTS: int = 100
+    TRACKING_SUBSCRIPTION_MIN_POLL_INTERVAL: float = 60.0
+    TRACKING_SUBSCRIPTION_MAX_POLL_INTERVAL: float = 3600.0
+    TRACKING_SUBSCRIPTION_KEEP_ALIVE_INTERVAL: float = 15.0
+    TRACKING_SUBSCRIPTION_MAX_PENDING: int = 100
+
+    # Watchlist of shipments refreshed in the background before they expire from the cache: how many are
+    # refreshed per second at most (0 disables it), how long before expiry (as a fraction of their TTL),
+    # how long (in days) they're watched for, and the phases they're no longer refreshed in
+    WATCHLIST_REFRESH_RATE: float = 0.1
+    WATCHLIST_REFRESH_LEAD: float = 0.1
+    WATCHLIST_MIN_REFRESH_INTERVAL: float = 60.0
+    WATCHLIST_RETRY_INTERVAL: float = 600.0
+    WATCHLIST_STARTUP_SPREAD: float = 600.0
+    WATCHLIST_RETENTION_DAYS: int = 14
+    WATCHLIST_FINAL_PHASES: list[str] = ['delivered']
 
     # Check if running in Docker and choose the appropriate .env file
     env_file: str = './secrets/.env.docker' if os.getenv("DOCKER_ENV") else './secrets/.env'
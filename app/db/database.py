@@ -1,14 +1,61 @@
 import logging
+import time
+from typing import Any
 
 from sqlalchemy import create_engine, text, URL
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, close_all_sessions
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, PoolProxiedConnection, QueuePool
 
 from app.db.models import BaseSQL
 
 logger = logging.getLogger(__name__)
 
 
+class _TimedPool(Pool):
+    """
+    A pool measuring how long checking out a connection takes, i.e. waiting for a connection
+    to be returned to the pool (or connecting a new one), so the pool can be sized against the workers.
+
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def connect(self) -> PoolProxiedConnection:
+        started = time.perf_counter()
+
+        try:
+            return super().connect()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait_time = time.perf_counter() - started
+            self.checkouts += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    """
+    The timed pool of the synchronous engines.
+
+    """
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    """
+    The timed pool of the asynchronous engines.
+
+    """
+
+
 class DatabaseHandler:
     """
     A class to handle postgres database using SQLAlchemy.
@@ -21,7 +68,12 @@ class DatabaseHandler:
             db_username: str,
             db_password: str,
             db_host: str,
-            db_port: int
+            db_port: int,
+            pool_size: int = 5,
+            max_overflow: int = 10,
+            pool_timeout: float = 30.0,
+            pool_recycle: int = -1,
+            pool_pre_ping: bool = False
     ):
         """
         Initializes the connection to the PostgreSQL database.
@@ -32,6 +84,16 @@ class DatabaseHandler:
             db_password (str): The password for database authentication.
             db_host (str): The host address of the database server.
             db_port (int): The port number of the database server.
+            pool_size (int, optional): The number of connections kept open in the pool.
+            max_overflow (int, optional): The number of connections opened beyond `pool_size` under load.
+            pool_timeout (float, optional): How long (in seconds) to wait for a connection before giving up.
+            pool_recycle (int, optional): How long (in seconds) a connection is reused for, -1 for no limit.
+            pool_pre_ping (bool, optional): Whether the connections are tested before being checked out.
+
+        Notes:
+            The engines, and their pools, are meant to be shared by the whole application,
+            instead of being created for every request. The asynchronous engine is created
+            only when it's first used, so the synchronous one can be used on its own.
         """
         self.base = BaseSQL
         self.database = database
@@ -42,17 +104,32 @@ class DatabaseHandler:
 
         self.db_url = self._build_db_url()
 
-        self.engine = create_engine(self.db_url)
+        self._pool_options: dict[str, Any] = {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            'pool_recycle': pool_recycle,
+            'pool_pre_ping': pool_pre_ping
+        }
+
+        self.engine = create_engine(self.db_url, poolclass=TimedQueuePool, **self._pool_options)
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
 
-    def _build_db_url(self) -> URL:
+        self._async_engine: AsyncEngine | None = None
+        self._async_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+    def _build_db_url(self, drivername: str = "postgresql") -> URL:
         """
         Builds the database URL.
 
+        Args:
+            drivername (str, optional): The dialect and driver, e.g. `postgresql+asyncpg`.
+
         Returns:
             str: The constructed database URL.
         """
         return URL.create(
-            drivername="postgresql",
+            drivername=drivername,
             username=self.db_username,
             password=self.db_password,
             host=self.db_host,
@@ -67,7 +144,41 @@ class DatabaseHandler:
         Returns:
             Session: A database session.
         """
-        return sessionmaker(autocommit=False, autoflush=False, bind=self.engine)()
+        return self._session_factory()
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        """
+        The asynchronous engine, using the asyncpg driver, created on first use.
+
+        Returns:
+            AsyncEngine: The asynchronous engine.
+        """
+        if self._async_engine is None:
+            self._async_engine = create_async_engine(
+                self._build_db_url("postgresql+asyncpg"),
+                poolclass=TimedAsyncQueuePool,
+                **self._pool_options
+            )
+
+        return self._async_engine
+
+    def create_async_session(self) -> AsyncSession:
+        """
+        Establishes a new asynchronous session with the database, which doesn't block the event loop.
+
+        Returns:
+            AsyncSession: An asynchronous database session.
+        """
+        if self._async_session_factory is None:
+            # The attributes of the models are kept after a commit, since they can't be lazily loaded again
+            self._async_session_factory = async_sessionmaker(
+                bind=self.async_engine,
+                autoflush=False,
+                expire_on_commit=False
+            )
+
+        return self._async_session_factory()
 
     def initialize(self):
         """
@@ -99,3 +210,51 @@ class DatabaseHandler:
         """
         close_all_sessions()
         self.base.metadata.drop_all(bind=self.engine)
+
+    def pool_stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the synchronous engine's connection pool.
+
+        Returns:
+            dict[str, Any]: The size of the pool, the number of idle, checked out and overflow connections,
+            and the number of checkouts, along with their wait times (in seconds) and timeouts.
+        """
+        return self._pool_stats(self.engine.pool)
+
+    def async_pool_stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the asynchronous engine's connection pool, if it has been created.
+
+        Returns:
+            dict[str, Any]: The same statistics as `pool_stats`.
+        """
+        return self._pool_stats(self._async_engine.pool) if self._async_engine is not None else {}
+
+    @staticmethod
+    def _pool_stats(pool: Pool) -> dict[str, Any]:
+        if not isinstance(pool, _TimedPool):
+            return {}
+
+        return {
+            'size': pool.size(),
+            'idle': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(0, pool.overflow()),
+            'checkouts': pool.checkouts,
+            'timeouts': pool.timeouts,
+            'average_wait_time': round(pool.total_wait_time / pool.checkouts, 4) if pool.checkouts else 0.0,
+            'max_wait_time': round(pool.max_wait_time, 4)
+        }
+
+    def dispose(self):
+        """
+        Closes all the connections of the synchronous engine's pool, e.g. on shutdown.
+        """
+        self.engine.dispose()
+
+    async def dispose_async(self):
+        """
+        Closes all the connections of the asynchronous engine's pool, if it has been created.
+        """
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, String
+from sqlalchemy import Boolean, DateTime, ForeignKey, JSON, String, UniqueConstraint
 
 from sqlalchemy import Column, Integer
 from sqlalchemy.orm import DeclarativeBase
@@ -17,3 +17,50 @@ class UserModel(BaseSQL):
     username = Column(String, unique=True, index=True)
     password = Column(String)
     is_active = Column(Boolean, default=True)
+
+
+class RefreshTokenModel(BaseSQL):
+    __tablename__ = "refresh_tokens"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # The tokens are looked up by their SHA-256 (hex), the tokens themselves aren't stored
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True))
+
+
+class WatchlistModel(BaseSQL):
+    __tablename__ = "watchlist"
+    __table_args__ = (UniqueConstraint("carrier_type", "tracking_number"),)
+
+    carrier_type = Column(String, nullable=False)
+    tracking_number = Column(String, nullable=False)
+    added_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    is_active = Column(Boolean, default=True, index=True)
+
+
+class ShipmentModel(BaseSQL):
+    __tablename__ = "shipments"
+    __table_args__ = (UniqueConstraint("carrier_type", "tracking_number"),)
+
+    carrier_type = Column(String, nullable=False)
+    tracking_number = Column(String, nullable=False)
+    status = Column(JSON)
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+    event_map_version = Column(String, nullable=False, default='')
+    event_descriptions = Column(JSON, nullable=False, default=list)
+
+
+class ShipmentEventModel(BaseSQL):
+    __tablename__ = "shipment_events"
+    # Also the index of a shipment's events by time
+    __table_args__ = (UniqueConstraint("shipment_id", "event_datetime", "tracey_event"),)
+
+    shipment_id = Column(Integer, ForeignKey("shipments.id", ondelete="CASCADE"), nullable=False)
+    event_datetime = Column(DateTime(timezone=True), nullable=False)
+    carrier_exception = Column(String)
+    exception_type = Column(String, nullable=False)
+    is_returned = Column(Boolean, nullable=False)
+    phase = Column(String, nullable=False)
+    sub_phase = Column(String, nullable=False)
+    tracey_event = Column(String, nullable=False)
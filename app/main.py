@@ -1,14 +1,26 @@
+import asyncio
 from contextlib import asynccontextmanager
 from logging import getLogger
 
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 
+from app.api.dependencies import build_carrier_handler, get_database_handler, get_tracey_event_maps
 from app.api.v1.routers.shipments import router as v1_shipments_routers
+from app.api.v1.routers.watchlist import router as v1_watchlist_routers
+from app.api.v1.schemas.schema_parcels import CarrierType
+from app.api.common.event_map import router as event_map_routers
 from app.api.common.health import router as health_check_routers
+from app.api.common.metrics import router as metrics_routers
 from app.api.common.users import router as user_routers
+from app.auth.hashing import password_hasher
 from app.config.base import Settings
-from app.db.database import DatabaseHandler as Database
+from app.services.carrier.dhl import DHL_API_BASE_URL
+from app.services.carrier.http_client import carrier_http_clients
+from app.services.carrier.store import shipment_store
+from app.services.carrier.subscriptions import shipment_subscriptions
+from app.services.carrier.watchlist import watchlist_refresher
+from app.utils.cache import cache, create_cache_backend
 
 logger = getLogger(__name__)
 
@@ -19,25 +31,60 @@ async def lifespan(app: FastAPI):
 
     settings = Settings()
 
-    db_handler = Database(
-        database=settings.POSTGRES_DATABASE,
-        db_username=settings.POSTGRES_USERNAME,
-        db_password=settings.POSTGRES_PASSWORD,
-        db_host=settings.POSTGRES_HOST,
-        db_port=int(settings.POSTGRES_PORT)
-    )
+    # A single engine (and connection pool) is shared by all the requests and background tasks
+    db_handler = get_database_handler()
     db_handler.initialize()
     logger.info(f'Database Health-Check: {db_handler.health_check()}')
 
+    cache.configure(backend=create_cache_backend(settings))
+
+    # The passwords are hashed in a bounded pool of threads, so the logins don't block the event loop
+    password_hasher.configure(workers=settings.PASSWORD_HASH_WORKERS, max_queue=settings.PASSWORD_HASH_MAX_QUEUE)
+
+    # The shipments are persisted behind the cache, so it's warmed up from the database after a restart
+    shipment_store.configure(session_factory=db_handler.create_session)
+
+    await carrier_http_clients.startup(
+        settings=settings,
+        base_urls={CarrierType.DHL.value: DHL_API_BASE_URL}
+    )
+
+    # The events file is reloaded whenever it changes, without restarting the workers
+    event_map_watcher = asyncio.create_task(
+        get_tracey_event_maps().watch(interval=settings.TRACEY_EVENT_MAP_RELOAD_INTERVAL)
+    ) if settings.TRACEY_EVENT_MAP_RELOAD_INTERVAL > 0 else None
+
+    # The watchlist's shipments are refreshed before they expire, so they're served from the cache
+    if settings.WATCHLIST_REFRESH_RATE > 0:
+        await watchlist_refresher.start(
+            carrier_handler_factory=build_carrier_handler,
+            session_factory=db_handler.create_session,
+            settings=settings
+        )
+
     yield
 
     # shutdown-event
 
+    if event_map_watcher is not None:
+        event_map_watcher.cancel()
+
+    await watchlist_refresher.stop()
+    await shipment_subscriptions.close()
+    await carrier_http_clients.shutdown()
+    await cache.close()
+    password_hasher.shutdown()
+    db_handler.dispose()
+    await db_handler.dispose_async()
+
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(health_check_routers, prefix="/api")
+app.include_router(event_map_routers, prefix="/api")
+app.include_router(metrics_routers, prefix="/api")
 app.include_router(user_routers, prefix="/api")
 app.include_router(v1_shipments_routers, prefix="/api/v1")
+app.include_router(v1_watchlist_routers, prefix="/api/v1")
 
 
 @app.get("/", response_class=RedirectResponse, include_in_schema=False)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class CarrierExceptionType(Enum):
@@ -11,6 +11,9 @@ class CarrierExceptionType(Enum):
 
 
 class TraceyEvent(BaseModel):
+    # Instances are shared by all the shipment events mapped to them (see `TraceyEventMap`)
+    model_config = ConfigDict(frozen=True)
+
     carrier_exception: str | None = None
     exception_type: CarrierExceptionType
     is_returned: bool
@@ -4,6 +4,11 @@ from pydantic import BaseModel, EmailStr, Field
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str = Field(min_length=1, max_length=128)
 
 
 class User(BaseModel):
@@ -1,6 +1,250 @@
 import abc
+import hashlib
+import itertools
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, ClassVar, Collection, Iterable
+
+from pydantic_core import to_json
 
 from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.rate_limit import RequestPriority
+from app.utils.cache_backends import cache_codec
+
+
+@dataclass(frozen=True, slots=True)
+class CachedShipment:
+    """
+    A shipment status in Tracey format, as it's kept in the cache.
+
+    Attributes:
+        content: The shipment status serialized as JSON, ready to be sent as a response body.
+        fetched_at: The time (in seconds since the epoch) the shipment was fetched from the carrier.
+        phase: The phase of the shipment's current status, used for the cache statistics.
+        ttl: The time-to-live (in seconds) of the cache entry.
+        event_map_version: The version of the Tracey event map the shipment has been transformed with.
+        event_descriptions: The carrier's event descriptions which have been matched against the event map,
+            to check whether the shipment is still valid once the event map has changed.
+        field_spans: The start and end of each field's value (`shipment_id` and `status`) in the content.
+        event_offsets: The start of each event in the content, followed by the end of the last event plus one.
+        event_times: The time (in seconds since the epoch) of each event.
+        event_order: The indexes of the events, from the most recent to the oldest one.
+        content_hash: A hash of the content, from which the ETags of the (partial) renderings are derived.
+    """
+    content: bytes
+    fetched_at: float
+    phase: str
+    ttl: int
+    event_map_version: str = ''
+    event_descriptions: frozenset[str] = frozenset()
+    field_spans: dict[str, tuple[int, int]] = field(default_factory=dict)
+    event_offsets: array = field(default_factory=lambda: array('I', [0]))
+    event_times: array = field(default_factory=lambda: array('d'))
+    event_order: array = field(default_factory=lambda: array('I'))
+    content_hash: str = ''
+
+    FIELDS: ClassVar[tuple[str, ...]] = ('shipment_id', 'status', 'events')
+
+    @classmethod
+    def from_shipment(cls, shipment: ShipmentStatus, **kwargs: Any) -> 'CachedShipment':
+        """
+        Serializes a shipment status, keeping track of where each field and event is found in the content.
+
+        Args:
+            shipment (ShipmentStatus): The shipment status in Tracey format.
+            **kwargs: The other attributes of the cached shipment, e.g. `fetched_at`.
+
+        Returns:
+            CachedShipment: The cached shipment status.
+        """
+        # The content is the same as `shipment.model_dump_json()`, serialized piece by piece
+        content = bytearray(b'{"shipment_id":')
+        shipment_id = to_json(shipment.shipment_id)
+        field_spans = {'shipment_id': (len(content), len(content) + len(shipment_id))}
+        content += shipment_id
+
+        content += b',"status":'
+        status = shipment.status.model_dump_json().encode() if shipment.status else b'null'
+        field_spans['status'] = (len(content), len(content) + len(status))
+        content += status
+
+        content += b',"events":['
+        event_offsets = array('I')
+        for index, event in enumerate(shipment.events):
+            if index:
+                content += b','
+
+            event_offsets.append(len(content))
+            content += event.model_dump_json().encode()
+
+        event_offsets.append(len(content) + 1)
+        content += b']}'
+
+        event_times = array('d', (event.event_datetime.timestamp() for event in shipment.events))
+
+        return cls(
+            content=bytes(content),
+            field_spans=field_spans,
+            event_offsets=event_offsets,
+            event_times=event_times,
+            event_order=array('I', sorted(range(len(event_times)), key=event_times.__getitem__, reverse=True)),
+            content_hash=hashlib.blake2b(content, digest_size=16).hexdigest(),
+            **kwargs
+        )
+
+    def __sizeof__(self) -> int:
+        # The memory used is mostly the content and the arrays, so the smaller attributes aren't walked through
+        return object.__sizeof__(self) + sum(
+            sys.getsizeof(payload)
+            for payload in (self.content, self.event_offsets, self.event_times, self.event_order)
+        )
+
+    def etag(
+            self,
+            limit: int | None = None,
+            since: datetime | None = None,
+            fields: Collection[str] | None = None
+    ) -> str:
+        """
+        Computes the ETag of (a part of) the shipment status, without rendering it.
+
+        The same content rendered with the same parameters always has the same ETag, while each
+        partial rendering has its own one, so a cached partial response is never mistaken for another.
+
+        Args:
+            limit (int, optional): The maximum number of events, the most recent ones are kept.
+            since (datetime, optional): Only the events after this time are kept.
+            fields (Collection[str], optional): The fields to render, all of them by default.
+
+        Returns:
+            str: The (quoted) strong ETag.
+        """
+        if limit is None and since is None and fields is None:
+            return f'"{self.content_hash}"'
+
+        parameters = repr((
+            limit,
+            _timestamp(since) if since is not None else None,
+            sorted(self.FIELDS if fields is None else fields)
+        )).encode()
+
+        return f'"{self.content_hash}-{hashlib.blake2b(parameters, digest_size=4).hexdigest()}"'
+
+    def max_age(self, now: float | None = None) -> int:
+        """
+        Computes how long (in seconds) the shipment status can still be reused before it's fetched again.
+
+        Args:
+            now (float, optional): The current time (in seconds since the epoch), `time.time()` by default.
+
+        Returns:
+            int: The remaining time-to-live of the cache entry, 0 once it's stale.
+        """
+        now = time.time() if now is None else now
+        return max(0, int(self.fetched_at + self.ttl - now))
+
+    def serialized_events(self) -> list[bytes]:
+        """
+        Retrieves each event of the shipment status, serialized as JSON, in their original order.
+
+        Returns:
+            list[bytes]: The serialized events.
+        """
+        content = self.content
+        offsets = self.event_offsets
+
+        return [content[offsets[index]:offsets[index + 1] - 1] for index in range(len(offsets) - 1)]
+
+    def render(
+            self,
+            limit: int | None = None,
+            since: datetime | None = None,
+            fields: Collection[str] | None = None
+    ) -> bytes:
+        """
+        Renders (a part of) the shipment status as JSON, straight from the serialized content.
+
+        Args:
+            limit (int, optional): The maximum number of events, the most recent ones are kept.
+            since (datetime, optional): Only the events after this time are kept.
+            fields (Collection[str], optional): The fields to render, all of them by default.
+
+        Returns:
+            bytes: The shipment status serialized as JSON.
+        """
+        if limit is None and since is None and fields is None:
+            return self.content
+
+        fields = self.FIELDS if fields is None else fields
+        content = memoryview(self.content)
+        parts = []
+
+        for name in self.FIELDS[:2]:
+            if name in fields:
+                start, end = self.field_spans[name]
+                parts.append(b'"%s":%s' % (name.encode(), content[start:end]))
+
+        if 'events' in fields:
+            indexes: Iterable[int] = range(len(self.event_times))
+
+            if limit is not None or since is not None:
+                since_timestamp = _timestamp(since) if since is not None else float('-inf')
+                # Only the selected events are visited, from the most recent one,
+                # then they're kept in their original order, whichever it is
+                selected = list(itertools.takewhile(
+                    lambda index: self.event_times[index] > since_timestamp,
+                    itertools.islice(self.event_order, limit)
+                ))
+                indexes = sorted(selected)
+
+            events = b','.join(
+                content[self.event_offsets[index]:self.event_offsets[index + 1] - 1] for index in indexes
+            )
+            parts.append(b'"events":[%s]' % events)
+
+        return b'{%s}' % b','.join(parts)
+
+
+# Shared through the Redis cache, so the arrays are kept as their raw bytes (they hold plain numbers)
+cache_codec.register(
+    CachedShipment,
+    tag=1,
+    to_fields=lambda shipment: [
+        shipment.content,
+        shipment.fetched_at,
+        shipment.phase,
+        shipment.ttl,
+        shipment.event_map_version,
+        sorted(shipment.event_descriptions),
+        {name: list(span) for name, span in shipment.field_spans.items()},
+        shipment.event_offsets.tobytes(),
+        shipment.event_times.tobytes(),
+        shipment.event_order.tobytes(),
+        shipment.content_hash
+    ],
+    from_fields=lambda fields: CachedShipment(
+        content=fields[0],
+        fetched_at=fields[1],
+        phase=fields[2],
+        ttl=fields[3],
+        event_map_version=fields[4],
+        event_descriptions=frozenset(fields[5]),
+        field_spans={name: (span[0], span[1]) for name, span in fields[6].items()},
+        event_offsets=array('I', fields[7]),
+        event_times=array('d', fields[8]),
+        event_order=array('I', fields[9]),
+        content_hash=fields[10]
+    )
+)
+
+
+def _timestamp(moment: datetime) -> float:
+    # Times without a timezone are in UTC, like the events' ones
+    return (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp()
 
 
 class Carrier(abc.ABC):
@@ -8,15 +252,53 @@ class Carrier(abc.ABC):
     This is the base class for carriers.
 
     All carriers should extend this class and implement all abstract methods.
+
+    Attributes:
+        priority: The priority of the calls made to the carrier's API on behalf of this shipment,
+            INTERACTIVE by default (e.g. BATCH when it's tracked as part of a batch).
     """
 
     def __init__(
             self,
             tracking_number: str,
-            trace_event_map: dict
+            trace_event_map: TraceyEventMap
     ):
         self.tracking_number = tracking_number
         self.trace_event_map = trace_event_map
+        self.priority = RequestPriority.INTERACTIVE
+
+    async def is_cached(self) -> bool:
+        """
+        Checks whether the shipment is already cached, so it can be served without calling the carrier.
+
+        Returns:
+            bool: True if the shipment is cached, False otherwise.
+        """
+        return False
+
+    async def get_cached_shipment(self) -> CachedShipment:
+        """
+        Retrieves the shipment in Tracey format from the cache, fetching and caching it on a miss.
+
+        Returns:
+            CachedShipment: The cached shipment status in Tracey format.
+
+        Raises:
+            CarrierException: If there are errors in retrieving or transforming shipment information.
+        """
+        raise NotImplementedError
+
+    async def refresh_cached_shipment(self) -> CachedShipment:
+        """
+        Fetches the shipment from the carrier in the background, and caches it, even if it's still cached.
+
+        Returns:
+            CachedShipment: The refreshed shipment status in Tracey format.
+
+        Raises:
+            CarrierException: If there are errors in retrieving or transforming shipment information.
+        """
+        raise NotImplementedError
 
     @abc.abstractmethod
     async def get_shipment_and_transform_into_tracey(self) -> ShipmentStatus:
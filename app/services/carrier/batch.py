@@ -0,0 +1,159 @@
+import asyncio
+from logging import getLogger
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, TypeVar
+
+import httpx
+from fastapi import status
+
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.rate_limit import RequestPriority
+
+logger = getLogger(__name__)
+
+K = TypeVar('K')
+T = TypeVar('T')
+
+
+async def _retrieve(carrier_handler: Carrier, retrieve: Callable[[], Awaitable[T]]) -> T | CarrierException:
+    """
+    Retrieves a shipment with the given method of its carrier handler, returning the failure instead of raising it.
+
+    Args:
+        carrier_handler (Carrier): The carrier handler of the shipment.
+        retrieve (Callable[[], Awaitable[T]]): The method of the carrier handler retrieving the shipment.
+
+    Returns:
+        T | CarrierException: The shipment, or the exception describing why it couldn't be retrieved.
+    """
+    try:
+        return await retrieve()
+    except CarrierException as ex:
+        return ex
+    except NotImplementedError:
+        return CarrierException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            message='Tracking is not supported for this carrier yet!'
+        )
+    except httpx.HTTPError as ex:
+        logger.error(f'Calling the carrier API failed for {carrier_handler.tracking_number}: {ex!r}')
+        return CarrierException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            message='The carrier API is not available, please try again later!'
+        )
+    except Exception:
+        # A single shipment must not fail the whole batch, whatever went wrong with it
+        logger.exception(f'Retrieving the shipment {carrier_handler.tracking_number} failed unexpectedly')
+        return CarrierException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            message='The shipment could not be retrieved, please try again later!'
+        )
+
+
+async def track_cached_shipment(carrier_handler: Carrier) -> CachedShipment | CarrierException:
+    """
+    Retrieves a shipment as it's cached (i.e. already serialized), returning the failure instead of raising it.
+
+    Args:
+        carrier_handler (Carrier): The carrier handler of the shipment.
+
+    Returns:
+        CachedShipment | CarrierException: The cached shipment status,
+        or the exception describing why it couldn't be retrieved.
+    """
+    return await _retrieve(carrier_handler, carrier_handler.get_cached_shipment)
+
+
+async def track_shipments(
+        carrier_handlers: list[Carrier],
+        concurrency: int,
+        priority: RequestPriority = RequestPriority.BATCH
+) -> list[CachedShipment | CarrierException]:
+    """
+    Retrieves multiple cached shipments concurrently.
+
+    Shipments which are already cached are served right away, while the rest are
+    fetched from the carriers with at most `concurrency` calls in flight at once.
+    The shipments are kept serialized, so they can be sent without being validated again.
+
+    Args:
+        carrier_handlers (list[Carrier]): The carrier handlers of the shipments.
+        concurrency (int): The maximum number of concurrent calls to the carriers.
+        priority (RequestPriority, optional): The priority of the calls to the carriers' APIs,
+            so interactive requests are served first. Defaults to BATCH.
+
+    Returns:
+        list[CachedShipment | CarrierException]: The result of each shipment,
+        in the same order as the given carrier handlers.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _track(carrier_handler: Carrier) -> CachedShipment | CarrierException:
+        carrier_handler.priority = priority
+
+        if await carrier_handler.is_cached():
+            return await track_cached_shipment(carrier_handler)
+
+        async with semaphore:
+            return await track_cached_shipment(carrier_handler)
+
+    return await asyncio.gather(*(_track(carrier_handler) for carrier_handler in carrier_handlers))
+
+
+async def track_cached_shipments_as_completed(
+        carrier_handlers: AsyncIterable[tuple[K, Carrier | CarrierException]],
+        concurrency: int,
+        priority: RequestPriority = RequestPriority.BATCH
+) -> AsyncIterator[tuple[K, CachedShipment | CarrierException]]:
+    """
+    Retrieves a stream of cached shipments concurrently, yielding each one as soon as it's retrieved.
+
+    Unlike `track_shipments`, the carrier handlers are consumed only as fast as the shipments are
+    retrieved, with at most `concurrency` of them in flight at once, so the memory used doesn't depend
+    on how many shipments are tracked, and the first results are available before the last handlers.
+
+    Args:
+        carrier_handlers (AsyncIterable[tuple[K, Carrier | CarrierException]]): The carrier handlers of the
+            shipments, each along with a key identifying it in the results. A handler which couldn't be
+            created can be given as the exception describing why, which is yielded back right away.
+        concurrency (int): The maximum number of shipments retrieved at once.
+        priority (RequestPriority, optional): The priority of the calls to the carriers' APIs,
+            so interactive requests are served first. Defaults to BATCH.
+
+    Yields:
+        tuple[K, CachedShipment | CarrierException]: The key and result of each shipment, in the order
+        they're retrieved in.
+    """
+    async def _track(key: K, carrier_handler: Carrier) -> tuple[K, CachedShipment | CarrierException]:
+        carrier_handler.priority = priority
+        return key, await track_cached_shipment(carrier_handler)
+
+    carrier_handlers = aiter(carrier_handlers)
+    pending: set[asyncio.Task[tuple[K, CachedShipment | CarrierException]]] = set()
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    key, carrier_handler = await anext(carrier_handlers)
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+
+                if isinstance(carrier_handler, CarrierException):
+                    yield key, carrier_handler
+                else:
+                    pending.add(asyncio.create_task(_track(key, carrier_handler)))
+
+            if not pending:
+                return
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                yield task.result()
+    finally:
+        # The consumer stopped early (e.g. the client disconnected), so the shipments in flight are dropped
+        for task in pending:
+            task.cancel()
@@ -1,5 +1,6 @@
 from app.schemas.schema_tracey import ShipmentStatus
 from app.services.carrier.base import Carrier
+from app.services.carrier.event_map import TraceyEventMap
 
 
 class BPostCarrier(Carrier):
@@ -11,7 +12,7 @@ class BPostCarrier(Carrier):
     def __init__(
             self,
             tracking_number: str,
-            trace_event_map: dict
+            trace_event_map: TraceyEventMap
     ):
         super().__init__(
             tracking_number=tracking_number,
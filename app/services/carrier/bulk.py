@@ -0,0 +1,226 @@
+import csv
+import json
+from collections import Counter
+from logging import getLogger
+from typing import AsyncIterable, AsyncIterator, Callable, Literal
+
+from fastapi import status
+from pydantic_core import to_json
+
+from app.services.carrier.base import Carrier
+from app.services.carrier.batch import track_cached_shipments_as_completed
+from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.subscriptions import ShipmentKey
+
+logger = getLogger(__name__)
+
+BulkFormat = Literal['ndjson', 'csv']
+
+# The longest line accepted in an upload, so a malformed file can't make a single line fill the memory
+MAX_LINE_LENGTH = 4096
+
+
+async def read_lines(
+        chunks: AsyncIterable[bytes],
+        max_line_length: int = MAX_LINE_LENGTH
+) -> AsyncIterator[bytes | None]:
+    """
+    Splits a stream of chunks (e.g. an upload) into lines, as they're received.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The chunks of the stream, split anywhere.
+        max_line_length (int, optional): The length of the longest line accepted.
+
+    Yields:
+        bytes | None: Each line, without its line break, or None for a line longer than `max_line_length`,
+        which is skipped instead of being buffered.
+    """
+    buffer = b''
+    skipping = False
+
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b'\n')
+
+        for line in lines:
+            if skipping:
+                # The end of the line being skipped
+                skipping = False
+                yield None
+            else:
+                yield line.removesuffix(b'\r') if len(line) <= max_line_length else None
+
+        if len(buffer) > max_line_length:
+            buffer = b''
+            skipping = True
+
+    if skipping:
+        yield None
+    elif buffer:
+        yield buffer.removesuffix(b'\r')
+
+
+async def parse_shipments(
+        chunks: AsyncIterable[bytes],
+        bulk_format: BulkFormat,
+        default_carrier_type: str | None = None
+) -> AsyncIterator[tuple[int, ShipmentKey | str]]:
+    """
+    Parses a stream of shipments, either as NDJSON or as CSV, as it's received.
+
+    Each NDJSON line is an object with a `tracking_number` and a `carrier_type`, while the CSV must have a
+    header row with a `tracking_number` column and, optionally, a `carrier_type` one. Empty lines are skipped.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The chunks of the stream, split anywhere.
+        bulk_format (BulkFormat): The format of the stream, either `ndjson` or `csv`.
+        default_carrier_type (str, optional): The carrier type of the shipments which don't have one.
+
+    Yields:
+        tuple[int, ShipmentKey | str]: The line number (starting at 1) of each shipment, along with either
+        its carrier type and tracking number, or the reason why it's invalid.
+    """
+    columns: dict[str, int] | None = None
+    delimiter = ','
+    line_number = 0
+
+    async for line in read_lines(chunks):
+        line_number += 1
+
+        if line is None:
+            yield line_number, f'The line is longer than {MAX_LINE_LENGTH} bytes!'
+            continue
+
+        if not line.strip():
+            continue
+
+        try:
+            text = line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            yield line_number, 'The line is not valid UTF-8!'
+            continue
+
+        if bulk_format == 'ndjson':
+            try:
+                row = json.loads(text)
+            except ValueError:
+                yield line_number, 'The line is not valid JSON!'
+                continue
+
+            if not isinstance(row, dict):
+                yield line_number, 'The line must be a JSON object!'
+                continue
+        else:
+            if columns is None:
+                # Spreadsheets exported with some locales are separated by semicolons
+                delimiter = ';' if ';' in text and ',' not in text else ','
+                header = [name.strip().lower() for name in next(csv.reader([text], delimiter=delimiter))]
+
+                if 'tracking_number' not in header:
+                    yield line_number, 'The CSV header must contain a `tracking_number` column!'
+                    return
+
+                columns = {name: index for index, name in enumerate(header)}
+                continue
+
+            values = next(csv.reader([text], delimiter=delimiter), [])
+            row = {name: values[index] for name, index in columns.items() if index < len(values)}
+
+        carrier_type = row.get('carrier_type') or default_carrier_type
+        tracking_number = row.get('tracking_number')
+
+        if not isinstance(tracking_number, str) or not tracking_number.strip():
+            yield line_number, 'The tracking number is missing!'
+        elif not isinstance(carrier_type, str):
+            yield line_number, 'The carrier type is missing!'
+        else:
+            yield line_number, (carrier_type.strip().lower(), tracking_number.strip())
+
+
+def _result_line(line_number: int, shipment: ShipmentKey | None, field: str, value: bytes) -> bytes:
+    """
+    Formats the result of a shipment as an NDJSON line.
+
+    Args:
+        line_number (int): The line number of the shipment in the upload.
+        shipment (ShipmentKey | None): The carrier type and tracking number of the shipment, if it's valid.
+        field (str): The field of the result, either `shipment` or `error`.
+        value (bytes): The JSON value of the result.
+
+    Returns:
+        bytes: The NDJSON line.
+    """
+    if shipment is None:
+        return b'{"line":%d,"%s":%s}\n' % (line_number, field.encode(), value)
+
+    carrier_type, tracking_number = shipment
+    return b'{"line":%d,"carrier_type":%s,"tracking_number":%s,"%s":%s}\n' % (
+        line_number, to_json(carrier_type), to_json(tracking_number), field.encode(), value
+    )
+
+
+async def track_bulk_shipments(
+        chunks: AsyncIterable[bytes],
+        bulk_format: BulkFormat,
+        carrier_handler_factory: Callable[[str, str], Carrier],
+        concurrency: int,
+        default_carrier_type: str | None = None
+) -> AsyncIterator[bytes]:
+    """
+    Tracks a stream of shipments (e.g. an upload of thousands of them), streaming back their results as NDJSON.
+
+    The shipments are read only as fast as they're tracked, with at most `concurrency` of them at once, and
+    each result is streamed back as soon as it's available, so the memory used doesn't depend on how many
+    shipments there are, and the client can follow the progress while they're tracked.
+
+    Each result is a line with the `line` number of the shipment in the upload, its `carrier_type` and
+    `tracking_number`, and either its `shipment` status or an `error` (with a `status_code` and a `detail`).
+    The results are in the order they're available in, followed by a final line with a `summary` of them.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The chunks of the upload, split anywhere.
+        bulk_format (BulkFormat): The format of the upload, either `ndjson` or `csv`.
+        carrier_handler_factory (Callable[[str, str], Carrier]): Creates the carrier handler of a shipment,
+            given its carrier type and tracking number, or raises a ValueError for an invalid carrier type.
+        concurrency (int): The maximum number of shipments tracked at once.
+        default_carrier_type (str, optional): The carrier type of the shipments which don't have one.
+
+    Yields:
+        bytes: The NDJSON lines of the results.
+
+    Notes:
+        Duplicated shipments are not skipped, since that would require remembering all of them,
+        but they're served from the cache after the first one.
+    """
+    summary: Counter[str] = Counter()
+
+    async def _carrier_handlers() -> AsyncIterator[tuple[tuple[int, ShipmentKey | None], Carrier | CarrierException]]:
+        async for line_number, shipment in parse_shipments(chunks, bulk_format, default_carrier_type):
+            if isinstance(shipment, str):
+                yield (line_number, None), CarrierException(status_code=status.HTTP_400_BAD_REQUEST, message=shipment)
+                continue
+
+            try:
+                yield (line_number, shipment), carrier_handler_factory(*shipment)
+            except ValueError:
+                yield (line_number, shipment), CarrierException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    message='Invalid carrier type has been selected!'
+                )
+
+    results = track_cached_shipments_as_completed(carrier_handlers=_carrier_handlers(), concurrency=concurrency)
+
+    async for (line_number, shipment), result in results:
+        summary['total'] += 1
+
+        if isinstance(result, CarrierException):
+            summary['failed'] += 1
+            yield _result_line(
+                line_number, shipment, 'error', to_json({'status_code': result.status_code, 'detail': result.message})
+            )
+        else:
+            summary['succeeded'] += 1
+            # The shipment is already serialized, so it's embedded as-is
+            yield _result_line(line_number, shipment, 'shipment', result.render())
+
+    logger.info(f'Tracked {summary["total"]} shipments in bulk, {summary["failed"]} of which failed')
+    yield b'{"summary":%s}\n' % to_json({name: summary[name] for name in ('total', 'succeeded', 'failed')})
@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+from app.schemas.schema_tracey import ShipmentEvent
+
+DEFAULT_CACHE_TTL = 3600  # one hour
+
+
+class CacheTTLPolicy:
+    """
+    Decides how long a shipment is cached based on its current Tracey status.
+
+    The TTLs (in seconds) are looked up by the following keys, from the most to the least
+    specific, all of them case-insensitive:
+        - `returned`: if the shipment is being returned.
+        - `<phase>/<sub_phase>`: e.g. `Out for delivery/With courier`.
+        - `<phase>`: e.g. `Delivered`.
+        - `default`: for any other shipment, including the ones without a status.
+
+    Example:
+        {"default": 3600, "returned": 604800, "delivered": 604800, "out for delivery": 300}
+    """
+
+    RETURNED = 'returned'
+    DEFAULT = 'default'
+    UNKNOWN = 'unknown'
+
+    def __init__(self, ttls: dict[str, int], stale_ttl: int = 0):
+        """
+        Initializes a CacheTTLPolicy instance with the provided TTLs.
+
+        Args:
+            ttls (dict[str, int]): The TTLs (in seconds), keyed by returned, phase/sub_phase, phase or default.
+            stale_ttl (int, optional): How long (in seconds) a shipment can be served stale after its TTL,
+                while it's being refreshed. Defaults to 0 (never served stale).
+        """
+        self.stale_ttl = stale_ttl
+        self._ttls = {key.lower(): ttl for key, ttl in ttls.items()}
+        self._default_ttl = self._ttls.get(self.DEFAULT, DEFAULT_CACHE_TTL)
+
+    def get_ttl(self, status: ShipmentEvent | None) -> int:
+        """
+        Retrieves the TTL of a shipment based on its current status.
+
+        Args:
+            status (ShipmentEvent | None): The current status of the shipment.
+
+        Returns:
+            int: The TTL (in seconds) the shipment should be cached for.
+        """
+        if status is None:
+            return self._default_ttl
+
+        event = status.event
+        phase = event.phase.lower()
+
+        for key in (
+                self.RETURNED if event.is_returned else None,
+                f'{phase}/{event.sub_phase.lower()}',
+                phase
+        ):
+            if key in self._ttls:
+                return self._ttls[key]
+
+        return self._default_ttl
+
+    @classmethod
+    def get_phase(cls, status: ShipmentEvent | None) -> str:
+        """
+        Retrieves the phase a shipment is accounted under in the cache statistics.
+
+        Args:
+            status (ShipmentEvent | None): The current status of the shipment.
+
+        Returns:
+            str: `returned` if the shipment is being returned, otherwise its phase (or `unknown`).
+        """
+        if status is None:
+            return cls.UNKNOWN
+
+        return cls.RETURNED if status.event.is_returned else status.event.phase.lower()
+
+
+class ShipmentCacheStats:
+    """
+    Collects the hits and misses of the shipment cache per Tracey phase, to help tune the TTL policies.
+
+    """
+
+    def __init__(self):
+        self._hits: defaultdict[str, int] = defaultdict(int)
+        self._misses: defaultdict[str, int] = defaultdict(int)
+
+    def record_hit(self, phase: str):
+        self._hits[phase] += 1
+
+    def record_miss(self, phase: str):
+        self._misses[phase] += 1
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Retrieves the hits, misses and hit rate of each phase.
+
+        Returns:
+            dict[str, dict[str, float]]: The statistics, keyed by phase.
+        """
+        stats = {}
+
+        for phase in sorted(self._hits.keys() | self._misses.keys()):
+            hits, misses = self._hits[phase], self._misses[phase]
+            stats[phase] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4)
+            }
+
+        return stats
+
+
+shipment_cache_stats = ShipmentCacheStats()
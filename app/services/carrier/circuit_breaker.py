@@ -0,0 +1,296 @@
+import asyncio
+import time
+from collections import Counter, deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, TypeVar
+
+from app.config.base import Settings
+from app.services.carrier.exceptions import CircuitOpenError
+
+T = TypeVar('T')
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker protecting the application from a degraded carrier's API.
+
+    While closed, the outcome of the recent calls is tracked in a sliding window. Once enough of
+    them have failed, or have been slower than `slow_call_duration`, the circuit opens and calls
+    fail fast for `open_duration` seconds, instead of holding a worker slot until they time out.
+    Then a few probe calls are let through (half-open): if they all succeed the circuit closes
+    again, otherwise it opens for another `open_duration` seconds.
+
+    The timeout of the calls is adaptive as well: it's derived from a percentile of the latency of
+    the recent successful calls (times a multiplier), within `min_timeout` and `max_timeout`. It bounds
+    the whole call, from sending the request to reading the last byte of the response. Only the calls
+    which succeeded are sampled, since the errors (e.g. a fast 404 of an unknown shipment) would
+    lower the timeout below the latency of the actual responses.
+    """
+
+    def __init__(
+            self,
+            failure_rate_threshold: float = 0.5,
+            slow_call_duration: float = 10.0,
+            slow_call_rate_threshold: float = 0.5,
+            window_size: int = 20,
+            minimum_calls: int = 10,
+            open_duration: float = 30.0,
+            half_open_probes: int = 1,
+            timeout_percentile: float = 0.99,
+            timeout_multiplier: float = 2.0,
+            min_timeout: float = 2.0,
+            max_timeout: float = 30.0
+    ):
+        """
+        Initializes a CircuitBreaker instance.
+
+        Args:
+            failure_rate_threshold (float, optional): The rate of failed calls opening the circuit.
+            slow_call_duration (float, optional): The duration (in seconds) above which a call is slow.
+            slow_call_rate_threshold (float, optional): The rate of slow calls opening the circuit.
+            window_size (int, optional): The number of recent calls the rates are computed from.
+            minimum_calls (int, optional): The number of calls needed before the circuit can open.
+            open_duration (float, optional): How long (in seconds) the circuit stays open.
+            half_open_probes (int, optional): The number of probe calls let through while half-open.
+            timeout_percentile (float, optional): The latency percentile the timeout is derived from.
+            timeout_multiplier (float, optional): The multiplier applied to the latency percentile.
+            min_timeout (float, optional): The lower bound (in seconds) of the timeout.
+            max_timeout (float, optional): The upper bound (in seconds) of the timeout, also used
+                until enough calls have been made.
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._outcomes: deque[tuple[bool, bool]] = deque(maxlen=window_size)
+        self._latencies: deque[float] = deque(maxlen=max(window_size, 100))
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._stats: Counter[str] = Counter()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'CircuitBreaker':
+        return cls(
+            failure_rate_threshold=settings.CARRIER_CIRCUIT_FAILURE_RATE,
+            slow_call_duration=settings.CARRIER_CIRCUIT_SLOW_CALL_DURATION,
+            slow_call_rate_threshold=settings.CARRIER_CIRCUIT_SLOW_CALL_RATE,
+            window_size=settings.CARRIER_CIRCUIT_WINDOW_SIZE,
+            minimum_calls=settings.CARRIER_CIRCUIT_MINIMUM_CALLS,
+            open_duration=settings.CARRIER_CIRCUIT_OPEN_DURATION,
+            half_open_probes=settings.CARRIER_CIRCUIT_HALF_OPEN_PROBES,
+            timeout_percentile=settings.CARRIER_TIMEOUT_PERCENTILE,
+            timeout_multiplier=settings.CARRIER_TIMEOUT_MULTIPLIER,
+            min_timeout=settings.CARRIER_TIMEOUT_MIN,
+            max_timeout=settings.CARRIER_HTTP_READ_TIMEOUT
+        )
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and time.monotonic() >= self._opened_at + self.open_duration:
+            self._state = CircuitState.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+        return self._state
+
+    def timeout(self) -> float:
+        """
+        Retrieves the timeout (in seconds) of the next call, based on the latency of the recent calls.
+
+        Returns:
+            float: The timeout of the next call.
+        """
+        if len(self._latencies) < self.minimum_calls:
+            return self.max_timeout
+
+        latencies = sorted(self._latencies)
+        percentile = latencies[min(int(len(latencies) * self.timeout_percentile), len(latencies) - 1)]
+
+        return min(max(percentile * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+
+    def check(self):
+        """
+        Fails fast if the circuit is open, e.g. before waiting for the rate limit to make a call.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        if self.state is CircuitState.OPEN:
+            self._stats['rejected'] += 1
+            raise CircuitOpenError
+
+    async def call(
+            self,
+            func: Callable[[float], Awaitable[T]],
+            is_failure: Callable[[T], bool] = lambda result: False,
+            is_failure_exception: Callable[[Exception], bool] = lambda ex: True
+    ) -> T:
+        """
+        Calls the given function through the circuit breaker.
+
+        Args:
+            func (Callable[[float], Awaitable[T]]): The function to call, given the timeout (in seconds) of the call,
+                e.g. to bound the reads of its response as well.
+            is_failure (Callable[[T], bool], optional): Checks whether a result is a failure (e.g. a 5xx response),
+                in addition to the function raising an exception.
+            is_failure_exception (Callable[[Exception], bool], optional): Checks whether an exception raised by
+                the function is a failure, e.g. not a client error. All of them are by default.
+
+        Returns:
+            T: The result of the function.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, so the function has not been called.
+            TimeoutError: If the call has taken longer than the timeout, which is a failure.
+        """
+        self._before_call()
+        timeout = self.timeout()
+        started = time.monotonic()
+
+        try:
+            async with asyncio.timeout(timeout):
+                result = await func(timeout)
+        except asyncio.CancelledError:
+            self._release_probe()
+            raise
+        except Exception as ex:
+            self._record(failed=is_failure_exception(ex), latency=time.monotonic() - started, succeeded=False)
+            raise
+
+        failed = is_failure(result)
+        self._record(failed=failed, latency=time.monotonic() - started, succeeded=not failed)
+        return result
+
+    def _before_call(self):
+        state = self.state
+
+        if state is CircuitState.CLOSED:
+            return
+
+        if state is CircuitState.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            return
+
+        self._stats['rejected'] += 1
+        raise CircuitOpenError
+
+    def _release_probe(self):
+        if self._state is CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def _record(self, failed: bool, latency: float, succeeded: bool):
+        slow = latency >= self.slow_call_duration
+        self._stats['failed' if failed else 'succeeded'] += 1
+
+        # The errors which aren't failures of the API (e.g. a 404) don't tell how long its responses take
+        if succeeded:
+            self._latencies.append(latency)
+
+        if self._state is CircuitState.HALF_OPEN:
+            self._release_probe()
+
+            if failed or slow:
+                self._open()
+                return
+
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._close()
+
+            return
+
+        if self._state is CircuitState.OPEN:
+            # The call was already in flight when the circuit opened
+            return
+
+        self._outcomes.append((failed, slow))
+
+        if len(self._outcomes) >= self.minimum_calls and (
+                self._rate(failed=True) >= self.failure_rate_threshold
+                or self._rate(slow=True) >= self.slow_call_rate_threshold
+        ):
+            self._open()
+
+    def _rate(self, failed: bool = False, slow: bool = False) -> float:
+        if not self._outcomes:
+            return 0.0
+
+        matches = sum(1 for outcome in self._outcomes if (failed and outcome[0]) or (slow and outcome[1]))
+        return matches / len(self._outcomes)
+
+    def _open(self):
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._stats['opened'] += 1
+
+    def _close(self):
+        self._state = CircuitState.CLOSED
+        self._outcomes.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the circuit breaker.
+
+        Returns:
+            dict[str, Any]: The state of the circuit, the failure and slow call rates,
+            the current timeout and the number of succeeded, failed and rejected calls.
+        """
+        return {
+            'state': self.state.value,
+            'failure_rate': round(self._rate(failed=True), 4),
+            'slow_call_rate': round(self._rate(slow=True), 4),
+            'timeout': round(self.timeout(), 3),
+            'succeeded': self._stats['succeeded'],
+            'failed': self._stats['failed'],
+            'rejected': self._stats['rejected'],
+            'opened': self._stats['opened']
+        }
+
+
+class CarrierCircuitBreakers:
+    """
+    A registry of the circuit breakers, one per carrier.
+
+    """
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get_breaker(self, carrier: str, settings: Settings) -> CircuitBreaker:
+        """
+        Retrieves the circuit breaker of the given carrier, creating it if needed.
+
+        Args:
+            carrier (str): The name of the carrier, e.g. `dhl`.
+            settings (Settings): The application settings.
+
+        Returns:
+            CircuitBreaker: The circuit breaker of the carrier.
+        """
+        breaker = self._breakers.get(carrier)
+
+        if breaker is None:
+            breaker = self._breakers[carrier] = CircuitBreaker.from_settings(settings)
+
+        return breaker
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {carrier: breaker.stats() for carrier, breaker in self._breakers.items()}
+
+
+carrier_circuit_breakers = CarrierCircuitBreakers()
@@ -1,17 +1,45 @@
+import time
+from dataclasses import replace
+from functools import partial
 from logging import getLogger
+from typing import AsyncIterator
 
 import httpx
-
-from httpx import Response
+import ijson
+from httpx import AsyncClient, Response
 from fastapi import status
 
-from app.schemas.schema_tracey import ShipmentStatus, ShipmentEvent, TraceyEvent
-from app.services.carrier.base import Carrier
+from app.schemas.schema_tracey import ShipmentStatus, ShipmentEvent
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.cache_policy import CacheTTLPolicy, shipment_cache_stats
+from app.services.carrier.circuit_breaker import CircuitBreaker
+from app.services.carrier.event_map import TraceyEventMap
 from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.rate_limit import RateLimitScheduler, RequestPriority
+from app.services.carrier.store import StoredShipment, shipment_store
 from app.utils.cache import cache
+from app.utils.json_stream import stream_json_objects
+from app.utils.singleflight import single_flight
 
 logger = getLogger(__name__)
 
+DHL_API_BASE_URL = 'https://api-eu.dhl.com'
+DHL_CARRIER_TYPE = 'dhl'
+
+# The keys of the event map matched as prefixes of the event descriptions,
+# e.g. Tracey considers all the `Processed at <facility>` events as a single event
+DHL_EVENT_PREFIXES = ('Processed at',)
+
+# The size (in bytes) above which the responses of the DHL API are parsed as they're received,
+# e.g. for long-lived freight shipments with thousands of events
+STREAMING_PARSE_THRESHOLD = 256 * 1024
+
+# Where the transformed parts of the shipment are found in the DHL API response, see `stream_json_objects`
+_SHIPMENT = 'shipments.item'
+_SHIPMENT_STATUS = 'shipments.item.status'
+_SHIPMENT_EVENT = 'shipments.item.events.item'
+_SHIPMENT_EVENT_FIELDS = ('timestamp', 'statusCode', 'description')
+
 
 class DHLCarrier(Carrier):
     """
@@ -24,7 +52,11 @@ class DHLCarrier(Carrier):
             self,
             tracking_number: str,
             api_key: str,
-            trace_event_map: dict
+            trace_event_map: TraceyEventMap,
+            http_client: AsyncClient,
+            cache_ttl_policy: CacheTTLPolicy,
+            rate_limiter: RateLimitScheduler,
+            circuit_breaker: CircuitBreaker
     ):
         """
         Initializes a DHLCarrier instance with the provided tracking number, API key, and trace event map.
@@ -32,43 +64,316 @@ class DHLCarrier(Carrier):
         Args:
             tracking_number (str): The tracking number associated with the shipment.
             api_key (str): The API key required for accessing DHL services.
-            trace_event_map (dict): The mapping of Tracey events.
+            trace_event_map (TraceyEventMap): The compiled mapping of DHL events to Tracey events.
+            http_client (AsyncClient): The app-scoped, pooled HTTP client used for calling the DHL API.
+            cache_ttl_policy (CacheTTLPolicy): The policy deciding how long the shipment is cached for.
+            rate_limiter (RateLimitScheduler): The scheduler keeping the calls within the API key's rate limit.
+            circuit_breaker (CircuitBreaker): The circuit breaker protecting the application from a degraded DHL API.
         """
         super().__init__(
             tracking_number=tracking_number,
             trace_event_map=trace_event_map
         )
         self.api_key = api_key
-        self._dhl_tracking_base_url = 'https://api-eu.dhl.com/track/shipments'
+        self.http_client = http_client
+        self.cache_ttl_policy = cache_ttl_policy
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self._dhl_tracking_base_url = f'{DHL_API_BASE_URL}/track/shipments'
         self._cache_key = f'DHL_{self.tracking_number}'
 
-    async def _get_shipment_tracking_info(self) -> Response:
+    async def _get_shipment_tracking_info(
+            self,
+            priority: RequestPriority,
+            event_descriptions: set[str] | None = None
+    ) -> ShipmentStatus:
         """
-        Retrieve shipment information from the DHL API.
+        Retrieve shipment information from the DHL API, and transforms it into Tracey format.
+
+        The response is streamed, so its body is read (and transformed) as part of the call: failing to read it,
+        e.g. if the API stalls in the middle of it, fails the call, whose latency covers the whole body.
+
+        Args:
+            priority (RequestPriority): The priority of the call, when it has to wait for the rate limit.
+            event_descriptions (set[str], optional): Collects the descriptions matched against the event map.
 
         Returns:
-            Response from the API call.
-        """
-
-        async with httpx.AsyncClient(timeout=60) as client:
-            tracking_info = await client.get(
-                url=self._dhl_tracking_base_url,
-                params={
-                    'trackingNumber': self.tracking_number
-                },
-                headers={
-                    'DHL-API-Key': self.api_key
-                }
+            ShipmentStatus: The shipment status in Tracey format.
+
+        Raises:
+            CarrierException: If the shipment can't be retrieved from the DHL API.
+        """
+
+        # When DHL is degraded, calls fail fast instead of holding a worker slot until they time out
+        self.circuit_breaker.check()
+
+        # Rather than failing once we're out of quota, the call waits for its turn (within a maximum wait)
+        await self.rate_limiter.acquire(priority)
+
+        try:
+            return await self.circuit_breaker.call(
+                partial(self._request_and_transform_shipment_tracking_info, event_descriptions=event_descriptions),
+                # Errors of the client (e.g. an unknown shipment) are not failures of the API
+                is_failure_exception=lambda ex: (
+                    not isinstance(ex, CarrierException)
+                    or ex.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            )
+        except (httpx.TimeoutException, TimeoutError):
+            raise CarrierException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                message='DHL API did not respond in time, please try again later!'
             )
+        except httpx.HTTPError as ex:
+            logger.error(f'Calling the DHL API failed for {self.tracking_number}: {ex!r}')
+            raise CarrierException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                message='DHL API is not available, please try again later!'
+            )
+
+    async def _request_and_transform_shipment_tracking_info(
+            self,
+            read_timeout: float,
+            event_descriptions: set[str] | None = None
+    ) -> ShipmentStatus:
+        """
+        Requests the shipment information from the DHL API, and transforms the response as it's received.
+
+        Args:
+            read_timeout (float): The time (in seconds) to wait for each read of the response, adapted to
+                the API's latency (the whole call is bounded by it as well, see `CircuitBreaker`).
+            event_descriptions (set[str], optional): Collects the descriptions matched against the event map.
+
+        Returns:
+            ShipmentStatus: The shipment status in Tracey format.
+        """
+        shipment_tracking_info = await self._request_shipment_tracking_info(read_timeout)
+
+        try:
+            self.rate_limiter.update_from_headers(shipment_tracking_info.status_code, shipment_tracking_info.headers)
+            return await self._transform_shipment_tracking_info_in_tracey(shipment_tracking_info, event_descriptions)
+        finally:
+            await shipment_tracking_info.aclose()
+
+    async def _request_shipment_tracking_info(self, read_timeout: float) -> Response:
+        """
+        Sends the request for the shipment information to the DHL API.
+
+        Args:
+            read_timeout (float): The time (in seconds) to wait for each read of the response.
+
+        Returns:
+            Response from the API call, whose body is streamed, so it must be closed once it's read.
+        """
+        timeout = self.http_client.timeout
+
+        # The client is shared and pooled, so it must not be closed here
+        request = self.http_client.build_request(
+            method='GET',
+            url=self._dhl_tracking_base_url,
+            params={
+                'trackingNumber': self.tracking_number
+            },
+            headers={
+                'DHL-API-Key': self.api_key
+            },
+            timeout=httpx.Timeout(connect=timeout.connect, read=read_timeout, write=timeout.write, pool=timeout.pool)
+        )
+
+        return await self.http_client.send(request, stream=True)
+
+    async def is_cached(self) -> bool:
+        return await cache.get(self._cache_key) is not None
 
-            return tracking_info
+    async def get_cached_shipment(self) -> CachedShipment:
+        # Once the shipment is stale, it's still served while it's refreshed in the background
+        cached_shipment = await cache.get(self._cache_key, refresh=self.refresh_cached_shipment)
+
+        if cached_shipment is not None and cached_shipment.event_map_version != self.trace_event_map.version:
+            cached_shipment = await self._revalidate_cached_shipment(cached_shipment)
+
+        if cached_shipment is not None:
+            shipment_cache_stats.record_hit(cached_shipment.phase)
+            return cached_shipment  # type: ignore[no-any-return]
+
+        # Concurrent requests for the same shipment share a single call to the DHL API,
+        # along with its result or exception, instead of each of them calling it on a cache miss
+        cached_shipment = await single_flight.do(
+            self._cache_key,
+            partial(self._load_or_fetch_shipment, self.priority)
+        )
+        shipment_cache_stats.record_miss(cached_shipment.phase)
+
+        return cached_shipment
 
     async def get_shipment_and_transform_into_tracey(self) -> ShipmentStatus:
-        cached_shipment_info = await cache.get(self._cache_key)
+        cached_shipment = await self.get_cached_shipment()
+        return ShipmentStatus.model_validate_json(cached_shipment.content)
+
+    async def _revalidate_cached_shipment(self, cached_shipment: CachedShipment) -> CachedShipment | None:
+        """
+        Checks whether a shipment transformed with another version of the event map is still valid.
+
+        Args:
+            cached_shipment (CachedShipment): The cached shipment.
+
+        Returns:
+            CachedShipment | None: The cached shipment with the current version of the event map,
+            or None if it has been invalidated, since it would be transformed differently now.
+        """
+        if self.trace_event_map.transforms_differently(
+                version=cached_shipment.event_map_version,
+                descriptions=cached_shipment.event_descriptions
+        ):
+            await cache.delete(self._cache_key)
+            return None
+
+        cached_shipment = replace(cached_shipment, event_map_version=self.trace_event_map.version)
+        ttl = int(cached_shipment.fetched_at + cached_shipment.ttl - time.time())
+
+        # The shipment is not checked again on the next hits, unless it's stale and about to be refreshed anyway
+        if ttl > 0:
+            await cache.set(
+                key=self._cache_key,
+                value=cached_shipment,
+                ttl=ttl,
+                stale_ttl=self.cache_ttl_policy.stale_ttl
+            )
+
+        return cached_shipment
+
+    async def refresh_cached_shipment(self) -> CachedShipment:
+        # The call to the DHL API is shared with any in-flight one
+        return await single_flight.do(
+            self._cache_key,
+            partial(self._fetch_and_cache_shipment, RequestPriority.BACKGROUND)
+        )
+
+    async def _load_or_fetch_shipment(self, priority: RequestPriority) -> CachedShipment:
+        """
+        Retrieves the shipment persisted in the database, or from the DHL API if it's not fresh anymore.
+
+        A persisted shipment which is still fresh (e.g. after a restart) is cached again without calling
+        the DHL API. An outdated one is still served if the DHL API is unavailable, without being cached.
+
+        Args:
+            priority (RequestPriority): The priority of the call to the DHL API.
+
+        Returns:
+            CachedShipment: The shipment status in Tracey format.
+
+        Raises:
+            CarrierException: If the shipment can't be retrieved from the DHL API, and it's not persisted.
+        """
+        stored_shipment = await shipment_store.load(DHL_CARRIER_TYPE, self.tracking_number)
+        cached_shipment = None
+
+        if stored_shipment is not None:
+            cached_shipment = self._to_cached_shipment(stored_shipment)
+            ttl = cached_shipment.max_age()
 
-        shipment_tracking_info = await self._get_shipment_tracking_info() \
-            if not cached_shipment_info else cached_shipment_info
+            if ttl > 0 and not self.trace_event_map.transforms_differently(
+                    version=cached_shipment.event_map_version,
+                    descriptions=cached_shipment.event_descriptions
+            ):
+                await cache.set(
+                    key=self._cache_key,
+                    value=cached_shipment,
+                    ttl=ttl,
+                    stale_ttl=self.cache_ttl_policy.stale_ttl
+                )
+                return cached_shipment
 
+        try:
+            return await self._fetch_and_cache_shipment(priority)
+        except CarrierException as ex:
+            if cached_shipment is None or (
+                    ex.status_code < status.HTTP_500_INTERNAL_SERVER_ERROR
+                    and ex.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+            ):
+                raise
+
+            logger.warning(f'Serving the persisted shipment {self.tracking_number}, as DHL is unavailable: {ex!r}')
+            shipment_store.record_stale_served()
+            return cached_shipment
+
+    async def _fetch_and_cache_shipment(self, priority: RequestPriority) -> CachedShipment:
+        """
+        Retrieves shipment information from the DHL API, transforms it into Tracey format, caches and persists it.
+
+        Args:
+            priority (RequestPriority): The priority of the call to the DHL API.
+
+        Returns:
+            CachedShipment: The cached shipment status in Tracey format.
+        """
+        event_descriptions: set[str] = set()
+        shipment = await self._get_shipment_tracking_info(priority, event_descriptions)
+
+        stored_shipment = StoredShipment(
+            shipment=shipment,
+            fetched_at=time.time(),
+            event_map_version=self.trace_event_map.version,
+            event_descriptions=frozenset(event_descriptions)
+        )
+        cached_shipment = self._to_cached_shipment(stored_shipment)
+
+        # To prevent hitting rate limits, the result is cached for as long as its status
+        # is not expected to change, e.g. minutes when it's out for delivery, days once delivered.
+        # Hits don't set it again, so the entry expires relative to the fetch.
+        await cache.set(
+            key=self._cache_key,
+            value=cached_shipment,
+            ttl=cached_shipment.ttl,
+            stale_ttl=self.cache_ttl_policy.stale_ttl
+        )
+        await shipment_store.save(DHL_CARRIER_TYPE, self.tracking_number, stored_shipment)
+
+        return cached_shipment
+
+    def _to_cached_shipment(self, stored_shipment: StoredShipment) -> CachedShipment:
+        """
+        Serializes a shipment as it's kept in the cache.
+
+        Args:
+            stored_shipment (StoredShipment): The shipment, either fetched or persisted.
+
+        Returns:
+            CachedShipment: The cached shipment status in Tracey format.
+        """
+        shipment = stored_shipment.shipment
+
+        return CachedShipment.from_shipment(
+            shipment,
+            fetched_at=stored_shipment.fetched_at,
+            phase=CacheTTLPolicy.get_phase(shipment.status),
+            ttl=self.cache_ttl_policy.get_ttl(shipment.status),
+            event_map_version=stored_shipment.event_map_version,
+            event_descriptions=stored_shipment.event_descriptions
+        )
+
+    async def _transform_shipment_tracking_info_in_tracey(
+            self,
+            shipment_tracking_info: Response,
+            event_descriptions: set[str] | None = None
+    ) -> ShipmentStatus:
+        """
+        Validates the response of the DHL API and transforms it into Tracey format.
+
+        Large responses are parsed as they're received, event by event, keeping only the fields of the
+        first shipment the transformation needs, instead of loading the whole payload (e.g. the addresses
+        of every event) at once. So the memory used doesn't grow with the size of the payload.
+
+        Args:
+            shipment_tracking_info (Response): The response of the DHL API, which may not have been read yet.
+            event_descriptions (set[str], optional): Collects the descriptions matched against the event map.
+
+        Returns:
+            ShipmentStatus: The shipment status in Tracey format.
+
+        Raises:
+            CarrierException: If the DHL API responded with an error, or there's no data for the shipment.
+        """
         if shipment_tracking_info.status_code == status.HTTP_404_NOT_FOUND:
             raise CarrierException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -76,81 +381,150 @@ class DHLCarrier(Carrier):
             )
 
         if shipment_tracking_info.status_code != status.HTTP_200_OK:
+            await shipment_tracking_info.aread()
             raise CarrierException(
                 status_code=shipment_tracking_info.status_code,
-                message=shipment_tracking_info.json()['detail']
+                message=self._error_detail(shipment_tracking_info)
             )
 
-        # To prevent hitting rate limits, the result is cached for 1 hour
-        # (adjustable based on the expected frequency of status changes)
-        await cache.set(key=self._cache_key, value=shipment_tracking_info)
-
         # We have a successful response, let's transform it into Tracey
-        shipment_response = shipment_tracking_info.json()
+        shipment_found = False
+        tracey_current_event = None
+        tracery_events = []
 
-        if not shipment_response['shipments']:
+        try:
+            async for prefix, shipment_event in self._parse_shipment_tracking_info(shipment_tracking_info):
+                if prefix == _SHIPMENT:
+                    shipment_found = True
+                elif prefix == _SHIPMENT_STATUS:
+                    tracey_current_event = self._transform_shipment_event_in_tracey_event(
+                        shipment_event=shipment_event,
+                        event_descriptions=event_descriptions
+                    ) if shipment_event else None
+                else:
+                    tracey_event = self._transform_shipment_event_in_tracey_event(shipment_event, event_descriptions)
+                    if tracey_event:
+                        tracery_events.append(tracey_event)
+        except (ValueError, ijson.JSONError) as ex:
+            logger.error(f'The DHL API responded with an invalid payload for {self.tracking_number}: {ex!r}')
+            raise CarrierException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                message='DHL API responded with an invalid payload, please try again later!'
+            )
+
+        if not shipment_found:
             raise CarrierException(
                 status_code=400,
                 message=f'There is no data for the shipment with ID: {self.tracking_number}'
             )
 
-        tracey_current_event = self._transform_shipment_event_in_tracey_event(
-            shipment_event=shipment_response['shipments'][0]['status']
-        ) if shipment_response['shipments'][0].get('status') else None
-
-        shipment_events = shipment_response['shipments'][0].get('events', [])
-        tracery_events = []
-        for event in shipment_events:
-            tracey_event = self._transform_shipment_event_in_tracey_event(event)
-            if tracey_event:
-                tracery_events.append(tracey_event)
-
         return ShipmentStatus(
             shipment_id=self.tracking_number,
             status=tracey_current_event,
             events=tracery_events
         )
 
+    @staticmethod
+    def _error_detail(shipment_tracking_info: Response) -> str:
+        """
+        Retrieves the description of the error the DHL API responded with.
+
+        Args:
+            shipment_tracking_info (Response): The (read) error response of the DHL API.
+
+        Returns:
+            str: The `detail` of the error, or a generic message if the response doesn't have any (e.g. it's HTML).
+        """
+        try:
+            body = shipment_tracking_info.json()
+        except ValueError:
+            body = None
+
+        detail = body.get('detail') if isinstance(body, dict) else None
+
+        if not isinstance(detail, str) or not detail:
+            return 'DHL API responded with an error, please try again later!'
+
+        return detail
+
+    @staticmethod
+    async def _parse_shipment_tracking_info(shipment_tracking_info: Response) -> AsyncIterator[tuple[str, dict]]:
+        """
+        Parses the status and the events of the first shipment in the response of the DHL API.
+
+        Args:
+            shipment_tracking_info (Response): The successful response of the DHL API.
+
+        Yields:
+            tuple[str, dict]: The prefix of the status (`shipments.item.status`) or of each event
+            (`shipments.item.events.item`) along with its fields, then the prefix of the shipment
+            (`shipments.item`) once it's been parsed, if there's any.
+        """
+        content_length = shipment_tracking_info.headers.get('content-length', '')
+
+        if content_length.isdigit() and int(content_length) <= STREAMING_PARSE_THRESHOLD:
+            # Parsing a small response in one go is several times faster than streaming it
+            await shipment_tracking_info.aread()
+            shipments = shipment_tracking_info.json()['shipments']
+
+            if shipments:
+                if shipments[0].get('status'):
+                    yield _SHIPMENT_STATUS, shipments[0]['status']
+
+                for event in shipments[0].get('events', []):
+                    yield _SHIPMENT_EVENT, event
+
+                yield _SHIPMENT, shipments[0]
+
+            return
+
+        async for prefix, shipment_part in stream_json_objects(
+                shipment_tracking_info.aiter_bytes(),
+                prefixes=(_SHIPMENT, _SHIPMENT_STATUS, _SHIPMENT_EVENT),
+                fields=_SHIPMENT_EVENT_FIELDS,
+                within=_SHIPMENT
+        ):
+            yield prefix, shipment_part
+
     def _transform_shipment_event_in_tracey_event(
             self,
-            shipment_event: dict
+            shipment_event: dict,
+            event_descriptions: set[str] | None = None
     ) -> ShipmentEvent | None:
         """
         Transforms a shipment event into a Tracey event.
 
         Args:
             shipment_event (dict): The shipment event to transform.
+            event_descriptions (set[str], optional): Collects the descriptions matched against the event map.
 
         Returns:
             ShipmentEvent | None: The transformed Tracey event, or None if transformation fails.
         """
 
-        if shipment_event['description'].startswith('Processed at'):
-            # Does Tracey consider all processing events as a single event?
-            tracey_status = self.trace_event_map['Processed at']
-        else:
-            tracey_status = self.trace_event_map.get(shipment_event['description'])
+        tracey_event = self.trace_event_map.match(shipment_event['description'])
 
-        if not tracey_status:
+        if event_descriptions is not None:
+            event_descriptions.add(shipment_event['description'])
+
+        if tracey_event is None:
             # If the Tracey event couldn't be found in the description key,
             # we can check whether the status code indicates delivery. It appears
             # that Tracey considers parcels collected by the recipient as delivered.
             # However, we may also classify such events as UNKNOWN.
-            if shipment_event['statusCode'].title() == 'Delivered':
-                tracey_status = self.trace_event_map.get('Delivered')
-            else:
+            if shipment_event['statusCode'].lower() == 'delivered':
+                tracey_event = self.trace_event_map.match('Delivered')
+
+                if event_descriptions is not None:
+                    event_descriptions.add('Delivered')
+
+            if tracey_event is None:
                 logger.warning(f'Some unknown event found in the DHL API response.\n'
                                f'event: {shipment_event}')
                 return None
 
+        # The Tracey event is shared (and immutable), so it's not validated or copied again
         return ShipmentEvent(
             event_datetime=shipment_event['timestamp'],
-            event=TraceyEvent(
-                carrier_exception=tracey_status['carrierException'],
-                exception_type=tracey_status['exceptionType'],
-                is_returned=tracey_status['isReturned'],
-                phase=tracey_status['phase'],
-                sub_phase=tracey_status['subPhase'],
-                tracey_event=tracey_status['traceyEvent'],
-            )
+            event=tracey_event
         )
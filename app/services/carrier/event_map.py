@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections import Counter, OrderedDict
+from logging import getLogger
+from typing import Any, Iterable
+
+from app.schemas.schema_tracey import TraceyEvent
+
+logger = getLogger(__name__)
+
+
+class TraceyEventMap:
+    """
+    A carrier's mapping of event descriptions to Tracey events, compiled once when it's loaded.
+
+    A description is matched against the keys of the map by the following rules, in order:
+
+    - exact: the key is the description, e.g. `Delivered`.
+    - prefix: the key ends with `*` (or is one of the given prefixes) and the description starts
+      with it, e.g. `Processed at*` matches `Processed at LEIPZIG - GERMANY`. The longest one wins.
+    - pattern: the key starts with `re:` and its regular expression is found in the description,
+      e.g. `re:^Arrived at .+ facility$`. The first one (in the map's order) wins.
+
+    Each distinct Tracey event is validated once, and the same immutable instance is returned by
+    every match, instead of a new one being built for every event of every shipment.
+
+    Note:
+        Event maps are immutable, so a new one (with a new version) is compiled whenever the events
+        file changes (see `TraceyEventMaps`). The previous versions of the carrier's map are kept
+        in its history, to check whether a shipment transformed by one of them is still valid.
+    """
+
+    PREFIX_WILDCARD = '*'
+    PATTERN_MARKER = 're:'
+
+    def __init__(
+            self,
+            event_map: dict[str, dict],
+            prefixes: Iterable[str] = (),
+            version: str = '',
+            history: dict[str, 'TraceyEventMap'] | None = None
+    ):
+        """
+        Initializes a TraceyEventMap instance.
+
+        Args:
+            event_map (dict[str, dict]): The raw mapping of the carrier's event descriptions to Tracey events,
+                as found in the events file.
+            prefixes (Iterable[str], optional): The keys which are matched as prefixes even though they don't
+                end with `*`, e.g. `Processed at` for DHL.
+            version (str, optional): The version of the map, e.g. a hash of the events file.
+            history (dict[str, TraceyEventMap], optional): The previous versions of the carrier's map,
+                keyed by version. It's shared by all the versions of the map.
+
+        Raises:
+            pydantic.ValidationError: If a Tracey event is invalid.
+            re.error: If a pattern is invalid.
+        """
+        self.version = version
+        self._history = history if history is not None else {}
+
+        prefixes = set(prefixes)
+        interned: dict[tuple, TraceyEvent] = {}
+
+        self._exact: dict[str, TraceyEvent] = {}
+        self._prefixes: dict[str, TraceyEvent] = {}
+        patterns: list[tuple[re.Pattern, TraceyEvent]] = []
+
+        for key, raw_event in event_map.items():
+            identity = tuple(sorted(raw_event.items()))
+            event = interned.get(identity)
+
+            if event is None:
+                event = interned[identity] = TraceyEvent(
+                    carrier_exception=raw_event['carrierException'],
+                    exception_type=raw_event['exceptionType'],
+                    is_returned=raw_event['isReturned'],
+                    phase=raw_event['phase'],
+                    sub_phase=raw_event['subPhase'],
+                    tracey_event=raw_event['traceyEvent'],
+                )
+
+            if key.startswith(self.PATTERN_MARKER):
+                patterns.append((re.compile(key[len(self.PATTERN_MARKER):]), event))
+            elif key.endswith(self.PREFIX_WILDCARD):
+                self._prefixes[key[:-len(self.PREFIX_WILDCARD)]] = event
+            else:
+                self._exact[key] = event
+
+                if key in prefixes:
+                    self._prefixes[key] = event
+
+        # All the prefixes are matched in a single pass, trying the longest ones first
+        self._prefix_regex = re.compile(
+            '|'.join(re.escape(prefix) for prefix in sorted(self._prefixes, key=len, reverse=True))
+        ) if self._prefixes else None
+        self._patterns = tuple(patterns)
+        self.events = tuple(interned.values())
+
+    def match(self, description: str) -> TraceyEvent | None:
+        """
+        Finds the Tracey event of a carrier's event description.
+
+        Args:
+            description (str): The description of the carrier's event.
+
+        Returns:
+            TraceyEvent | None: The Tracey event, or None if the description doesn't match any key.
+        """
+        event = self._exact.get(description)
+
+        if event is not None:
+            return event
+
+        if self._prefix_regex is not None:
+            prefix = self._prefix_regex.match(description)
+
+            if prefix is not None:
+                return self._prefixes[prefix.group()]
+
+        for pattern, event in self._patterns:
+            if pattern.search(description):
+                return event
+
+        return None
+
+    def transforms_differently(self, version: str, descriptions: Iterable[str]) -> bool:
+        """
+        Checks whether the given descriptions match other Tracey events than with another version of the map.
+
+        Args:
+            version (str): The version of the map the descriptions have been matched with.
+            descriptions (Iterable[str]): The descriptions which have been matched.
+
+        Returns:
+            bool: True if any of the descriptions matches another Tracey event (or the version
+            is no longer in the history, so it can't be told), False otherwise.
+        """
+        if version == self.version:
+            return False
+
+        previous = self._history.get(version)
+
+        if previous is None:
+            return True
+
+        return any(previous.match(description) != self.match(description) for description in descriptions)
+
+
+class TraceyEventMaps:
+    """
+    The compiled event maps of all the carriers, loaded from the events file and reloaded when it changes.
+
+    A reload compiles the new maps and swaps them all at once, so a request keeps using the maps
+    it started with, while the next ones use the new maps without restarting the application.
+    The version of the maps is a hash of the events file, so it's the same in all the workers.
+    """
+
+    # How many previous versions of the maps are kept, to revalidate the shipments transformed with them
+    MAX_HISTORY = 8
+
+    def __init__(self, path: str, prefixes: dict[str, Iterable[str]] | None = None):
+        """
+        Initializes a TraceyEventMaps instance, loading the events file.
+
+        Args:
+            path (str): The path of the events file.
+            prefixes (dict[str, Iterable[str]], optional): The keys matched as prefixes, per carrier
+                (see `TraceyEventMap`).
+
+        Raises:
+            OSError: If the events file can't be read.
+            ValueError: If the events file is invalid.
+        """
+        self.path = path
+        self.prefixes = prefixes or {}
+
+        self._maps: dict[str, TraceyEventMap] = {}
+        self._histories: dict[str, OrderedDict[str, TraceyEventMap]] = {}
+        self._modified_at: float | None = None
+        self._stats: Counter[str] = Counter()
+
+        self.load()
+
+    @property
+    def version(self) -> str:
+        return next(iter(self._maps.values())).version if self._maps else ''
+
+    def snapshot(self) -> dict[str, TraceyEventMap]:
+        """
+        Retrieves the current event maps, which are never modified once they're loaded.
+
+        Returns:
+            dict[str, TraceyEventMap]: The compiled event map of each carrier, keyed by carrier name.
+        """
+        return self._maps
+
+    def load(self) -> bool:
+        """
+        Loads the events file, swapping the event maps if it has changed.
+
+        Returns:
+            bool: True if the event maps have changed, False otherwise.
+
+        Raises:
+            OSError: If the events file can't be read.
+            ValueError: If the events file is invalid.
+        """
+        modified_at = os.stat(self.path).st_mtime
+
+        with open(self.path, 'rb') as events_file:
+            content = events_file.read()
+
+        self._modified_at = modified_at
+        version = hashlib.sha256(content).hexdigest()[:12]
+
+        if version == self.version:
+            return False
+
+        maps = {}
+        for carrier, event_map in json.loads(content).items():
+            history = self._histories.setdefault(carrier, OrderedDict())
+            maps[carrier] = TraceyEventMap(
+                event_map=event_map,
+                prefixes=self.prefixes.get(carrier, ()),
+                version=version,
+                history=history
+            )
+
+        # Once they're all compiled, the maps are swapped at once
+        for carrier, event_map in maps.items():
+            history = self._histories[carrier]
+            history[version] = event_map
+
+            while len(history) > self.MAX_HISTORY:
+                history.popitem(last=False)
+
+        if self._maps:
+            self._stats['reloads'] += 1
+            logger.info(f'The Tracey event maps have been reloaded, version: {version}')
+
+        self._maps = maps
+        return True
+
+    def reload_if_modified(self) -> bool:
+        """
+        Reloads the events file if it has been modified, keeping the current maps if it's invalid.
+
+        Returns:
+            bool: True if the event maps have changed, False otherwise.
+        """
+        try:
+            if os.stat(self.path).st_mtime == self._modified_at:
+                return False
+
+            return self.load()
+        except Exception as ex:
+            # The watcher must keep running, e.g. if the file is being written or is invalid
+            self._stats['reload_failures'] += 1
+            logger.error(f'Reloading the Tracey event maps failed, keeping version {self.version}: {ex!r}')
+            return False
+
+    async def watch(self, interval: float):
+        """
+        Reloads the events file whenever it's modified, until cancelled.
+
+        Args:
+            interval (float): How often (in seconds) the events file is checked.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.reload_if_modified)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'version': self.version,
+            'carriers': sorted(self._maps),
+            'reloads': self._stats['reloads'],
+            'reload_failures': self._stats['reload_failures']
+        }
@@ -5,3 +5,17 @@ class CarrierException(Exception):
         self.message = message
         self.status_code = status_code
         super().__init__(self.message)
+
+
+class CircuitOpenError(CarrierException):
+    """Exception raised when a carrier's circuit breaker is open, so the call is not even attempted."""
+
+    def __init__(self, message: str = 'The carrier is temporarily unavailable, please try again later!'):
+        super().__init__(status_code=503, message=message)
+
+
+class RateLimitExceededError(CarrierException):
+    """Exception raised when a call would wait too long for the carrier's rate limit, so it's not made."""
+
+    def __init__(self, message: str = 'Too many calls to the carrier are waiting, please try again later!'):
+        super().__init__(status_code=503, message=message)
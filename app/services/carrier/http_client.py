@@ -0,0 +1,145 @@
+import asyncio
+from logging import getLogger
+
+import httpx
+
+from app.config.base import Settings
+
+logger = getLogger(__name__)
+
+
+class CarrierHTTPClients:
+    """
+    A registry of app-scoped, pooled HTTP clients, one per carrier.
+
+    Reusing a single client per carrier keeps the TCP/TLS connections to the carrier's
+    API alive between requests, instead of paying a new handshake on every cache miss.
+
+    Note:
+        The clients are created on startup and closed on shutdown by the application's
+        lifespan. If a client is requested before startup (e.g. when the lifespan is not
+        run, like in tests), it is created lazily and closed on shutdown as well.
+    """
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def _build_client(settings: Settings) -> httpx.AsyncClient:
+        """
+        Builds a new pooled HTTP client based on the application settings.
+
+        Args:
+            settings (Settings): The application settings.
+
+        Returns:
+            httpx.AsyncClient: The pooled HTTP client.
+        """
+        return httpx.AsyncClient(
+            http2=settings.CARRIER_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.CARRIER_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.CARRIER_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.CARRIER_HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.CARRIER_HTTP_CONNECT_TIMEOUT,
+                read=settings.CARRIER_HTTP_READ_TIMEOUT,
+                write=settings.CARRIER_HTTP_WRITE_TIMEOUT,
+                pool=settings.CARRIER_HTTP_POOL_TIMEOUT
+            )
+        )
+
+    def get_client(self, carrier: str, settings: Settings) -> httpx.AsyncClient:
+        """
+        Retrieves the pooled HTTP client of the given carrier, creating it if needed.
+
+        Args:
+            carrier (str): The name of the carrier, e.g. `dhl`.
+            settings (Settings): The application settings.
+
+        Returns:
+            httpx.AsyncClient: The pooled HTTP client of the carrier.
+        """
+        client = self._clients.get(carrier)
+
+        if client is None or client.is_closed:
+            client = self._clients[carrier] = self._build_client(settings)
+
+        return client
+
+    async def startup(self, settings: Settings, base_urls: dict[str, str]):
+        """
+        Creates the HTTP clients of the given carriers and optionally pre-warms their connections.
+
+        Args:
+            settings (Settings): The application settings.
+            base_urls (dict[str, str]): The base URL of each carrier's API, keyed by carrier name.
+        """
+        for carrier, base_url in base_urls.items():
+            client = self.get_client(carrier, settings)
+
+            if settings.CARRIER_HTTP_PREWARM_CONNECTIONS > 0:
+                await self._prewarm(client, base_url, settings.CARRIER_HTTP_PREWARM_CONNECTIONS)
+
+    @staticmethod
+    async def _prewarm(client: httpx.AsyncClient, base_url: str, connections: int):
+        """
+        Opens connections to the carrier's API ahead of the first request.
+
+        The response itself is irrelevant, we only care about the connection
+        (and TLS session) that is left in the pool afterward.
+
+        Args:
+            client (httpx.AsyncClient): The HTTP client to pre-warm.
+            base_url (str): The base URL of the carrier's API.
+            connections (int): The number of concurrent connections to open.
+        """
+        results = await asyncio.gather(
+            *(client.head(base_url) for _ in range(connections)),
+            return_exceptions=True
+        )
+
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f'Pre-warming connections to {base_url} failed: {failures[0]}')
+
+    async def shutdown(self):
+        """
+        Closes all the HTTP clients and their connections.
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Retrieves the connection pool statistics of each carrier's HTTP client.
+
+        Returns:
+            dict[str, dict[str, int]]: The number of open, idle and active connections,
+            and the number of requests waiting for a connection, keyed by carrier name.
+        """
+        stats = {}
+
+        for carrier, client in self._clients.items():
+            # httpx doesn't expose its connection pool, so we have to reach into the transport
+            pool = getattr(client._transport, '_pool', None)
+            connections = pool.connections if pool is not None else []
+            requests = getattr(pool, '_requests', [])
+
+            idle = sum(1 for connection in connections if connection.is_idle())
+
+            stats[carrier] = {
+                'open': len(connections),
+                'idle': idle,
+                'active': len(connections) - idle,
+                'waiting': sum(1 for request in requests if request.is_queued())
+            }
+
+        return stats
+
+
+carrier_http_clients = CarrierHTTPClients()
@@ -0,0 +1,248 @@
+import asyncio
+import heapq
+import itertools
+from collections import Counter
+from enum import IntEnum
+from logging import getLogger
+from typing import Any, Mapping
+
+from app.services.carrier.exceptions import RateLimitExceededError
+
+logger = getLogger(__name__)
+
+
+class RequestPriority(IntEnum):
+    """
+    The priority of a call to a carrier's API, the lower the value the sooner it's served.
+
+    """
+    INTERACTIVE = 0  # a user waiting for a single shipment
+    BATCH = 1  # batch or bulk tracking requests
+    BACKGROUND = 2  # cache refreshes nobody is waiting for
+
+
+class RateLimitScheduler:
+    """
+    A token-bucket scheduler keeping the calls to a carrier's API within its rate limit.
+
+    Instead of failing once the bucket is empty, callers are queued and served in order of
+    priority (then arrival), as soon as tokens are refilled. The bucket also adapts to the
+    rate limit headers returned by the carrier, pausing until the reset time once the
+    carrier reports the quota as exhausted.
+
+    Callers waiting for longer than `max_wait` are rejected with a `RateLimitExceededError`, so the
+    queue can't grow beyond what the rate limit can serve in that time, however many calls arrive.
+    """
+
+    def __init__(self, rate: float, burst: int, max_wait: float | None = None):
+        """
+        Initializes a RateLimitScheduler instance.
+
+        Args:
+            rate (float): The number of calls allowed per second.
+            burst (int): The maximum number of calls allowed at once, i.e. the bucket's capacity.
+            max_wait (float, optional): The maximum time (in seconds) a call waits for, unlimited by default.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+
+        self._tokens = float(burst)
+        self._updated_at: float | None = None
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+
+        self._queued: Counter[RequestPriority] = Counter()
+        self._stats: Counter[str] = Counter()
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    @staticmethod
+    def _now() -> float:
+        return asyncio.get_running_loop().time()
+
+    def _refill(self, now: float):
+        if self._updated_at is not None and now > self._paused_until:
+            elapsed = now - max(self._updated_at, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+        self._updated_at = now
+
+    async def acquire(self, priority: RequestPriority = RequestPriority.INTERACTIVE):
+        """
+        Waits until a call with the given priority is allowed to be made.
+
+        Args:
+            priority (RequestPriority, optional): The priority of the call. Defaults to INTERACTIVE.
+
+        Raises:
+            RateLimitExceededError: If the call would wait for longer than `max_wait`.
+        """
+        now = self._now()
+        self._refill(now)
+
+        if not self._waiters and now >= self._paused_until and self._tokens >= 1:
+            self._tokens -= 1
+            self._record_wait(0.0)
+            return
+
+        if self.max_wait is not None and self._paused_until - now > self.max_wait:
+            # The carrier won't accept any call in time anyway
+            self._stats['rejected'] += 1
+            raise RateLimitExceededError
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._queued[priority] += 1
+        self._schedule_dispatch()
+
+        try:
+            # The future is cancelled on timeout, so it's skipped once dispatched
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._stats['rejected'] += 1
+            raise RateLimitExceededError from None
+        finally:
+            self._queued[priority] -= 1
+
+        self._record_wait(self._now() - now)
+
+    def _schedule_dispatch(self):
+        """
+        Schedules serving the queued callers once the next token is available.
+        """
+        if self._wakeup is not None or not self._waiters:
+            return
+
+        now = self._now()
+        delay = max(self._paused_until - now, 0.0, (1 - self._tokens) / self.rate)
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        self._wakeup = None
+        self._refill(self._now())
+
+        while self._waiters and self._tokens >= 1 and self._now() >= self._paused_until:
+            _, _, future = heapq.heappop(self._waiters)
+
+            if future.done():
+                # The caller has been cancelled while it was waiting
+                continue
+
+            self._tokens -= 1
+            future.set_result(None)
+
+        self._schedule_dispatch()
+
+    def update_from_headers(self, status_code: int, headers: Mapping[str, str]):
+        """
+        Adapts the bucket to the rate limit reported by the carrier.
+
+        Args:
+            status_code (int): The status code of the carrier's response.
+            headers (Mapping[str, str]): The headers of the carrier's response, e.g. `RateLimit-Remaining`,
+                `RateLimit-Reset` (in seconds) and `Retry-After` (in seconds).
+        """
+        remaining = _parse_number(headers.get('ratelimit-remaining'))
+        reset = _parse_number(headers.get('ratelimit-reset'))
+        retry_after = _parse_number(headers.get('retry-after'))
+
+        now = self._now()
+        self._refill(now)
+
+        if remaining is not None:
+            # The carrier knows better how many calls are left, e.g. if the API key is shared
+            self._tokens = min(self._tokens, remaining)
+
+        pause = retry_after if status_code == 429 and retry_after is not None else (
+            reset if remaining is not None and remaining < 1 and reset is not None else None
+        )
+
+        if pause is None and status_code == 429:
+            pause = 1 / self.rate
+
+        if pause is not None:
+            self._stats['pauses'] += 1
+            self._tokens = 0
+            self._paused_until = max(self._paused_until, now + pause)
+            logger.warning(f'Carrier rate limit exhausted, pausing calls for {pause:.1f} seconds')
+
+    def _record_wait(self, wait_time: float):
+        self._stats['acquired'] += 1
+        self._total_wait_time += wait_time
+        self._max_wait_time = max(self._max_wait_time, wait_time)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the scheduler.
+
+        Returns:
+            dict[str, Any]: The queue depth per priority, the available tokens, the wait times (in seconds)
+                and the number of calls rejected for waiting too long.
+        """
+        acquired = self._stats['acquired']
+
+        return {
+            'queue_depth': {priority.name.lower(): self._queued[priority] for priority in RequestPriority},
+            'tokens': round(self._tokens, 2),
+            'acquired': acquired,
+            'pauses': self._stats['pauses'],
+            'rejected': self._stats['rejected'],
+            'average_wait_time': round(self._total_wait_time / acquired, 4) if acquired else 0.0,
+            'max_wait_time': round(self._max_wait_time, 4)
+        }
+
+
+def _parse_number(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CarrierRateLimiters:
+    """
+    A registry of the rate limit schedulers, one per carrier (i.e. per API key).
+
+    Note:
+        The schedulers are per process, so each worker (of each pod) enforces its own limit. The API key's rate
+        and burst must therefore be divided between the processes sharing it (see `get_carrier_handler`),
+        otherwise they'd make that many times more calls than allowed, and be paused by the carrier's 429s.
+    """
+
+    def __init__(self):
+        self._schedulers: dict[str, RateLimitScheduler] = {}
+
+    def get_scheduler(
+            self,
+            carrier: str,
+            rate: float,
+            burst: int,
+            max_wait: float | None = None
+    ) -> RateLimitScheduler:
+        """
+        Retrieves the rate limit scheduler of the given carrier, creating it if needed.
+
+        Args:
+            carrier (str): The name of the carrier, e.g. `dhl`.
+            rate (float): The number of calls allowed per second (by this process).
+            burst (int): The maximum number of calls allowed at once (by this process).
+            max_wait (float, optional): The maximum time (in seconds) a call waits for, unlimited by default.
+
+        Returns:
+            RateLimitScheduler: The rate limit scheduler of the carrier.
+        """
+        scheduler = self._schedulers.get(carrier)
+
+        if scheduler is None:
+            scheduler = self._schedulers[carrier] = RateLimitScheduler(rate=rate, burst=burst, max_wait=max_wait)
+
+        return scheduler
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {carrier: scheduler.stats() for carrier, scheduler in self._schedulers.items()}
+
+
+carrier_rate_limiters = CarrierRateLimiters()
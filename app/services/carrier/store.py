@@ -0,0 +1,276 @@
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Any, Callable
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.models import ShipmentEventModel, ShipmentModel
+from app.schemas.schema_tracey import ShipmentEvent, ShipmentStatus, TraceyEvent
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class StoredShipment:
+    """
+    A shipment status in Tracey format, as it's persisted in the database.
+
+    Attributes:
+        shipment: The shipment status, with its events from the most recent to the oldest one.
+        fetched_at: The time (in seconds since the epoch) the shipment was last fetched from the carrier.
+        event_map_version: The version of the Tracey event map the shipment has been transformed with.
+        event_descriptions: The carrier's event descriptions which have been matched against the event map.
+    """
+    shipment: ShipmentStatus
+    fetched_at: float
+    event_map_version: str
+    event_descriptions: frozenset[str]
+
+
+class ShipmentServices:
+    """
+    A class responsible for persisting the shipments and their events.
+
+    """
+
+    @staticmethod
+    def save_shipment(
+            db: Session,
+            carrier_type: str,
+            tracking_number: str,
+            shipment: ShipmentStatus,
+            fetched_at: float,
+            event_map_version: str,
+            event_descriptions: frozenset[str]
+    ):
+        """
+        Upserts a shipment, inserting only its events which are not persisted yet.
+
+        The events already persisted are left untouched, unless the shipment has been transformed with
+        another version of the event map, in which case they're all replaced.
+
+        Args:
+            db (Session): The database session.
+            carrier_type (str): The type of carrier, e.g. `dhl`.
+            tracking_number (str): The tracking number associated with the shipment.
+            shipment (ShipmentStatus): The shipment status in Tracey format.
+            fetched_at (float): The time (in seconds since the epoch) the shipment was fetched from the carrier.
+            event_map_version (str): The version of the Tracey event map the shipment has been transformed with.
+            event_descriptions (frozenset[str]): The carrier's event descriptions matched against the event map.
+        """
+        previous_event_map_version = db.query(ShipmentModel.event_map_version).where(
+            ShipmentModel.carrier_type == carrier_type,
+            ShipmentModel.tracking_number == tracking_number
+        ).scalar()
+
+        upsert = insert(ShipmentModel).values(
+            carrier_type=carrier_type,
+            tracking_number=tracking_number,
+            status=shipment.status.model_dump(mode='json') if shipment.status else None,
+            fetched_at=datetime.fromtimestamp(fetched_at, timezone.utc),
+            event_map_version=event_map_version,
+            event_descriptions=sorted(event_descriptions)
+        )
+        shipment_id = db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[ShipmentModel.carrier_type, ShipmentModel.tracking_number],
+                set_={
+                    column: upsert.excluded[column]
+                    for column in ('status', 'fetched_at', 'event_map_version', 'event_descriptions')
+                }
+            ).returning(ShipmentModel.id)
+        ).scalar_one()
+
+        if previous_event_map_version is not None and previous_event_map_version != event_map_version:
+            db.query(ShipmentEventModel).where(ShipmentEventModel.shipment_id == shipment_id).delete()
+
+        if shipment.events:
+            # A single statement for all the events, skipping the ones already persisted
+            db.execute(
+                insert(ShipmentEventModel).on_conflict_do_nothing(
+                    index_elements=[
+                        ShipmentEventModel.shipment_id,
+                        ShipmentEventModel.event_datetime,
+                        ShipmentEventModel.tracey_event
+                    ]
+                ),
+                [
+                    {
+                        'shipment_id': shipment_id,
+                        'event_datetime': event.event_datetime,
+                        'carrier_exception': event.event.carrier_exception,
+                        'exception_type': event.event.exception_type.value,
+                        'is_returned': event.event.is_returned,
+                        'phase': event.event.phase,
+                        'sub_phase': event.event.sub_phase,
+                        'tracey_event': event.event.tracey_event
+                    }
+                    for event in shipment.events
+                ]
+            )
+
+        db.commit()
+
+    @staticmethod
+    def get_shipment(db: Session, carrier_type: str, tracking_number: str) -> StoredShipment | None:
+        """
+        Retrieves a persisted shipment, along with its events.
+
+        Args:
+            db (Session): The database session.
+            carrier_type (str): The type of carrier, e.g. `dhl`.
+            tracking_number (str): The tracking number associated with the shipment.
+
+        Returns:
+            StoredShipment | None: The persisted shipment, or None if it's not persisted.
+        """
+        shipment = db.query(ShipmentModel).where(
+            ShipmentModel.carrier_type == carrier_type,
+            ShipmentModel.tracking_number == tracking_number
+        ).one_or_none()
+
+        if shipment is None:
+            return None
+
+        rows = db.query(ShipmentEventModel).where(
+            ShipmentEventModel.shipment_id == shipment.id
+        ).order_by(ShipmentEventModel.event_datetime.desc(), ShipmentEventModel.id.desc())
+
+        # Like the event maps do, the events mapped to the same Tracey event share the same instance
+        tracey_events: dict[tuple, TraceyEvent] = {}
+        events = []
+        for row in rows:
+            identity = (row.carrier_exception, row.exception_type, row.is_returned, row.phase, row.sub_phase,
+                        row.tracey_event)
+            tracey_event = tracey_events.get(identity)
+
+            if tracey_event is None:
+                tracey_event = tracey_events[identity] = TraceyEvent(
+                    carrier_exception=row.carrier_exception,
+                    exception_type=row.exception_type,
+                    is_returned=row.is_returned,
+                    phase=row.phase,
+                    sub_phase=row.sub_phase,
+                    tracey_event=row.tracey_event
+                )
+
+            # The times are returned in the database session's timezone
+            events.append(ShipmentEvent(event_datetime=row.event_datetime.astimezone(timezone.utc), event=tracey_event))
+
+        return StoredShipment(
+            shipment=ShipmentStatus(
+                shipment_id=tracking_number,
+                status=ShipmentEvent.model_validate(shipment.status) if shipment.status else None,
+                events=events
+            ),
+            fetched_at=shipment.fetched_at.timestamp(),
+            event_map_version=shipment.event_map_version,
+            event_descriptions=frozenset(shipment.event_descriptions)
+        )
+
+
+class ShipmentStore:
+    """
+    Persists the shipments in the database, behind the cache, so they survive restarts and deploys.
+
+    The shipments are read from the database on cache misses, before calling the carrier, and can
+    still be served from it while the carrier is unavailable. Failures of the database are logged
+    and counted, but never fail the tracking requests, which then fall back to the carrier.
+
+    Note:
+        The store is disabled until it's configured with a database on startup.
+    """
+
+    def __init__(self):
+        self._session_factory: Callable[[], Session] | None = None
+        self._stats: Counter[str] = Counter()
+
+    def configure(self, session_factory: Callable[[], Session]):
+        """
+        Enables the store.
+
+        Args:
+            session_factory (Callable[[], Session]): Creates a new database session.
+        """
+        self._session_factory = session_factory
+
+    async def load(self, carrier_type: str, tracking_number: str) -> StoredShipment | None:
+        """
+        Retrieves a persisted shipment.
+
+        Args:
+            carrier_type (str): The type of carrier, e.g. `dhl`.
+            tracking_number (str): The tracking number associated with the shipment.
+
+        Returns:
+            StoredShipment | None: The persisted shipment, or None if it's not persisted (or can't be retrieved).
+        """
+        if self._session_factory is None:
+            return None
+
+        try:
+            stored_shipment = await asyncio.to_thread(
+                self._with_session, ShipmentServices.get_shipment, carrier_type, tracking_number
+            )
+        except Exception as ex:
+            self._stats['load_failures'] += 1
+            logger.error(f'Loading the shipment {carrier_type}/{tracking_number} failed: {ex!r}')
+            return None
+
+        self._stats['hits' if stored_shipment is not None else 'misses'] += 1
+        return stored_shipment  # type: ignore[no-any-return]
+
+    async def save(self, carrier_type: str, tracking_number: str, stored_shipment: StoredShipment):
+        """
+        Persists a shipment, along with its new events.
+
+        Args:
+            carrier_type (str): The type of carrier, e.g. `dhl`.
+            tracking_number (str): The tracking number associated with the shipment.
+            stored_shipment (StoredShipment): The shipment to persist.
+        """
+        if self._session_factory is None:
+            return
+
+        try:
+            await asyncio.to_thread(
+                self._with_session,
+                ShipmentServices.save_shipment,
+                carrier_type,
+                tracking_number,
+                stored_shipment.shipment,
+                stored_shipment.fetched_at,
+                stored_shipment.event_map_version,
+                stored_shipment.event_descriptions
+            )
+        except Exception as ex:
+            self._stats['save_failures'] += 1
+            logger.error(f'Saving the shipment {carrier_type}/{tracking_number} failed: {ex!r}')
+            return
+
+        self._stats['saves'] += 1
+
+    def _with_session(self, func: Callable[..., Any], *args: Any) -> Any:
+        with self._session_factory() as db:  # type: ignore[misc]
+            return func(db, *args)
+
+    def record_stale_served(self):
+        self._stats['stale_served'] += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'enabled': self._session_factory is not None,
+            'hits': self._stats['hits'],
+            'misses': self._stats['misses'],
+            'saves': self._stats['saves'],
+            'stale_served': self._stats['stale_served'],
+            'load_failures': self._stats['load_failures'],
+            'save_failures': self._stats['save_failures']
+        }
+
+
+shipment_store = ShipmentStore()
@@ -0,0 +1,383 @@
+import asyncio
+from collections import Counter, deque
+from logging import getLogger
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+from fastapi import status
+from pydantic_core import to_json
+
+from app.config.base import Settings
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.rate_limit import RequestPriority
+
+logger = getLogger(__name__)
+
+# A shipment subscribed to, as a carrier type and a tracking number
+ShipmentKey = tuple[str, str]
+
+KEEP_ALIVE_MESSAGE = b': keep-alive\n\n'
+
+
+class ShipmentSubscription:
+    """
+    A client's subscription to the new events of one or more shipments.
+
+    The messages are pushed by the shipments' pollers, already formatted as Server-Sent Events, and
+    are kept until the client receives them. A client which doesn't keep up (i.e. with more than
+    `max_pending` messages waiting) is disconnected, instead of its messages piling up in memory.
+
+    Attributes:
+        shipments: The shipments subscribed to.
+        closed: Whether the subscription has been closed, e.g. since the client didn't keep up.
+    """
+
+    def __init__(self, shipments: list[ShipmentKey], max_pending: int):
+        """
+        Initializes a ShipmentSubscription instance.
+
+        Args:
+            shipments (list[ShipmentKey]): The shipments subscribed to.
+            max_pending (int): The maximum number of messages waiting to be received by the client.
+        """
+        self.shipments = shipments
+        self.max_pending = max_pending
+        self.closed = False
+
+        self._messages: deque[bytes] = deque()
+        self._pushed = asyncio.Event()
+
+    def push(self, message: bytes) -> bool:
+        """
+        Pushes a message to the client.
+
+        Args:
+            message (bytes): The message, formatted as a Server-Sent Event.
+
+        Returns:
+            bool: True if the message has been pushed, False if the subscription is (or has just been) closed.
+        """
+        if self.closed:
+            return False
+
+        if len(self._messages) >= self.max_pending:
+            self.closed = True
+        else:
+            self._messages.append(message)
+
+        self._pushed.set()
+        return not self.closed
+
+    def close(self):
+        """
+        Closes the subscription, ending its stream.
+        """
+        self.closed = True
+        self._pushed.set()
+
+    async def stream(self, keep_alive_interval: float) -> AsyncIterator[bytes]:
+        """
+        Yields the messages as they're pushed, until the subscription is closed.
+
+        While there are no messages, the client only waits without any polling of its own, except
+        for a comment every `keep_alive_interval` seconds, so idle connections are not dropped.
+
+        Args:
+            keep_alive_interval (float): How long (in seconds) to wait for a message before sending a comment.
+
+        Yields:
+            bytes: The messages, formatted as Server-Sent Events.
+        """
+        while not self.closed:
+            if not self._messages:
+                try:
+                    async with asyncio.timeout(keep_alive_interval):
+                        await self._pushed.wait()
+                except TimeoutError:
+                    yield KEEP_ALIVE_MESSAGE
+                    continue
+
+            while self._messages and not self.closed:
+                yield self._messages.popleft()
+
+            self._pushed.clear()
+
+
+class ShipmentPoller:
+    """
+    Polls a shipment on behalf of all its subscribers, pushing its new events to them.
+
+    The shipment is retrieved through its carrier handler, so it's served from the cache while it's
+    fresh, and the poller sleeps until it expires (between `min_interval` and `max_interval` seconds).
+    The new events are serialized once, then pushed to all the subscribers.
+    """
+
+    def __init__(
+            self,
+            shipment: ShipmentKey,
+            carrier_handler_factory: Callable[[], Carrier],
+            min_interval: float,
+            max_interval: float
+    ):
+        """
+        Initializes a ShipmentPoller instance.
+
+        Args:
+            shipment (ShipmentKey): The shipment to poll.
+            carrier_handler_factory (Callable[[], Carrier]): Builds the carrier handler of the shipment,
+                for every poll, so it uses the current Tracey event map.
+            min_interval (float): The minimum time (in seconds) between two polls.
+            max_interval (float): The maximum time (in seconds) between two polls.
+        """
+        self.shipment = shipment
+        self.carrier_handler_factory = carrier_handler_factory
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self.subscriptions: set[ShipmentSubscription] = set()
+        self.task: asyncio.Task | None = None
+        self._seen_events: set[bytes] | None = None
+        self._last_error: CarrierException | None = None
+        self._failures = 0
+        self._stats: Counter[str] = Counter()
+
+    async def run(self):
+        """
+        Polls the shipment until cancelled.
+        """
+        while True:
+            try:
+                delay = await self.poll()
+            except Exception as ex:
+                # The poller must keep running for its subscribers, whatever happens to a single poll
+                logger.exception(f'Polling {self.shipment} failed: {ex!r}')
+                delay = self.max_interval
+
+            await asyncio.sleep(delay)
+
+    async def poll(self) -> float:
+        """
+        Retrieves the shipment once, pushing its new events (or its error) to the subscribers.
+
+        Returns:
+            float: How long (in seconds) to wait before the next poll.
+        """
+        self._stats['polls'] += 1
+
+        try:
+            carrier_handler = self.carrier_handler_factory()
+            carrier_handler.priority = RequestPriority.BACKGROUND
+            cached_shipment = await carrier_handler.get_cached_shipment()
+        except CarrierException as ex:
+            return self._fail(ex)
+        except NotImplementedError:
+            return self._fail(CarrierException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                message='Tracking is not supported for this carrier yet!'
+            ))
+        except httpx.HTTPError as ex:
+            logger.error(f'Calling the carrier API failed for {self.shipment}: {ex!r}')
+            return self._fail(CarrierException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                message='The carrier API is not available, please try again later!'
+            ))
+
+        self._failures = 0
+        self._last_error = None
+        self._push_new_events(cached_shipment)
+
+        return min(max(cached_shipment.max_age(), self.min_interval), self.max_interval)
+
+    def _push_new_events(self, cached_shipment: CachedShipment):
+        """
+        Pushes the events which haven't been seen yet to the subscribers.
+
+        The events found by the first poll are the ones the subscribers already know about
+        (e.g. from `GET /track/shipments`), so only the later ones are pushed.
+
+        Args:
+            cached_shipment (CachedShipment): The current shipment status.
+        """
+        events = cached_shipment.serialized_events()
+
+        if self._seen_events is None:
+            self._seen_events = set(events)
+            return
+
+        new_events = [event for event in events if event not in self._seen_events]
+
+        if not new_events:
+            return
+
+        self._seen_events.update(new_events)
+        self._stats['events'] += len(new_events)
+        self._push(b'shipment', b'{"carrier_type":%s,"tracking_number":%s,"events":[%s]}' % (
+            to_json(self.shipment[0]),
+            to_json(self.shipment[1]),
+            b','.join(new_events)
+        ))
+
+    def _fail(self, ex: CarrierException) -> float:
+        """
+        Pushes the error of a poll to the subscribers, unless it's the same as the previous poll's one.
+
+        Args:
+            ex (CarrierException): The error of the poll.
+
+        Returns:
+            float: How long (in seconds) to wait before the next poll, backing off as failures add up.
+        """
+        self._stats['errors'] += 1
+        self._failures += 1
+
+        if self._last_error is None or (ex.status_code, ex.message) != (
+                self._last_error.status_code, self._last_error.message
+        ):
+            self._push(b'error', b'{"carrier_type":%s,"tracking_number":%s,"status_code":%d,"detail":%s}' % (
+                to_json(self.shipment[0]),
+                to_json(self.shipment[1]),
+                ex.status_code,
+                to_json(ex.message)
+            ))
+
+        self._last_error = ex
+        return min(self.min_interval * 2 ** (self._failures - 1), self.max_interval)
+
+    def _push(self, event: bytes, data: bytes):
+        """
+        Pushes a Server-Sent Event to all the subscribers, formatted once for all of them.
+
+        Args:
+            event (bytes): The type of the event, e.g. `shipment`.
+            data (bytes): The data of the event, serialized as JSON on a single line.
+        """
+        message = b'event: %s\ndata: %s\n\n' % (event, data)
+
+        for subscription in self.subscriptions:
+            if not subscription.push(message):
+                self._stats['overflows'] += 1
+
+    def stats(self) -> Counter[str]:
+        return self._stats
+
+
+class ShipmentSubscriptions:
+    """
+    The registry of the shipments' subscriptions, with a single poller per shipment, however many subscribers it has.
+
+    A poller is started with the first subscription to its shipment, and stopped with the last one.
+    """
+
+    def __init__(self):
+        self._pollers: dict[ShipmentKey, ShipmentPoller] = {}
+        self._subscriptions = 0
+        self._stats: Counter[str] = Counter()
+
+    def subscribe(
+            self,
+            carrier_handler_factories: dict[ShipmentKey, Callable[[], Carrier]],
+            settings: Settings
+    ) -> ShipmentSubscription:
+        """
+        Subscribes to the new events of the given shipments, starting the pollers of those not polled yet.
+
+        Args:
+            carrier_handler_factories (dict[ShipmentKey, Callable[[], Carrier]]): The carrier handler
+                factory of each shipment, used if its poller has to be started.
+            settings (Settings): The application settings.
+
+        Returns:
+            ShipmentSubscription: The subscription, which must be unsubscribed once it's over.
+        """
+        subscription = ShipmentSubscription(
+            shipments=list(carrier_handler_factories),
+            max_pending=settings.TRACKING_SUBSCRIPTION_MAX_PENDING
+        )
+
+        for shipment, carrier_handler_factory in carrier_handler_factories.items():
+            poller = self._pollers.get(shipment)
+
+            if poller is None:
+                poller = self._pollers[shipment] = ShipmentPoller(
+                    shipment=shipment,
+                    carrier_handler_factory=carrier_handler_factory,
+                    min_interval=settings.TRACKING_SUBSCRIPTION_MIN_POLL_INTERVAL,
+                    max_interval=settings.TRACKING_SUBSCRIPTION_MAX_POLL_INTERVAL
+                )
+                poller.task = asyncio.create_task(poller.run())
+
+            poller.subscriptions.add(subscription)
+
+        self._subscriptions += 1
+        self._stats['subscribed'] += 1
+        return subscription
+
+    def unsubscribe(self, subscription: ShipmentSubscription):
+        """
+        Unsubscribes from the shipments, stopping the pollers which have no subscribers left.
+
+        Args:
+            subscription (ShipmentSubscription): The subscription returned by `subscribe`.
+        """
+        subscription.close()
+
+        for shipment in subscription.shipments:
+            poller = self._pollers.get(shipment)
+
+            if poller is None:
+                continue
+
+            poller.subscriptions.discard(subscription)
+
+            if not poller.subscriptions:
+                self._stop(shipment, poller)
+
+        self._subscriptions -= 1
+
+    async def close(self):
+        """
+        Stops all the pollers, e.g. on shutdown.
+        """
+        tasks = [poller.task for poller in self._pollers.values() if poller.task is not None]
+
+        for shipment, poller in list(self._pollers.items()):
+            for subscription in poller.subscriptions:
+                subscription.close()
+
+            self._stop(shipment, poller)
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _stop(self, shipment: ShipmentKey, poller: ShipmentPoller):
+        """
+        Stops a poller, keeping its statistics.
+
+        Args:
+            shipment (ShipmentKey): The shipment of the poller.
+            poller (ShipmentPoller): The poller to stop.
+        """
+        if poller.task is not None:
+            poller.task.cancel()
+
+        self._stats.update(poller.stats())
+        del self._pollers[shipment]
+
+    def stats(self) -> dict[str, Any]:
+        stats = self._stats.copy()
+
+        for poller in self._pollers.values():
+            stats.update(poller.stats())
+
+        return {
+            'pollers': len(self._pollers),
+            'subscriptions': self._subscriptions,
+            'subscribed': stats['subscribed'],
+            'polls': stats['polls'],
+            'events': stats['events'],
+            'errors': stats['errors'],
+            'overflows': stats['overflows']
+        }
+
+
+shipment_subscriptions = ShipmentSubscriptions()
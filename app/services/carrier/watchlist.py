@@ -0,0 +1,415 @@
+import asyncio
+import heapq
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from logging import getLogger
+from typing import Any, Callable, Iterable
+
+import httpx
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config.base import Settings
+from app.db.models import WatchlistModel
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.rate_limit import RequestPriority
+from app.services.carrier.subscriptions import ShipmentKey
+
+logger = getLogger(__name__)
+
+
+class WatchlistServices:
+    """
+    A class responsible for managing the persisted watchlist of shipments, through a database session,
+    for the refresher, which runs its queries in a thread (the endpoints use `AsyncWatchlistServices`).
+
+    """
+
+    @staticmethod
+    def deactivate_shipment(db: Session, shipment: ShipmentKey):
+        """
+        Keeps a shipment in the watchlist without refreshing it anymore, e.g. once it's delivered.
+
+        Args:
+            db (Session): The database session.
+            shipment (ShipmentKey): The carrier type and tracking number of the shipment.
+        """
+        carrier_type, tracking_number = shipment
+        db.query(WatchlistModel).where(
+            WatchlistModel.carrier_type == carrier_type,
+            WatchlistModel.tracking_number == tracking_number
+        ).update({WatchlistModel.is_active: False})
+        db.commit()
+
+    @staticmethod
+    def retention_start(retention_days: int) -> datetime:
+        """
+        Computes the time since which the shipments added to the watchlist are still watched.
+
+        Args:
+            retention_days (int): How long (in days) the shipments are watched for.
+
+        Returns:
+            datetime: The time the oldest watched shipments have been added at.
+        """
+        return datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+    @staticmethod
+    def get_active_shipments(db: Session, added_since: datetime) -> list[WatchlistModel]:
+        """
+        Retrieves the shipments of the watchlist which are still refreshed.
+
+        Args:
+            db (Session): The database session.
+            added_since (datetime): Only the shipments added since this time are retrieved.
+
+        Returns:
+            list[WatchlistModel]: The active watchlist entries, from the oldest to the most recent one.
+        """
+        return db.query(WatchlistModel).where(
+            WatchlistModel.is_active.is_(True),
+            WatchlistModel.added_at >= added_since
+        ).order_by(WatchlistModel.added_at).all()
+
+
+class AsyncWatchlistServices:
+    """
+    A class responsible for managing the persisted watchlist of shipments, through an asynchronous database
+    session, so the queries of the watchlist endpoints don't block the event loop.
+
+    """
+
+    @staticmethod
+    async def add_shipments(db: AsyncSession, shipments: list[ShipmentKey]) -> datetime:
+        """
+        Adds shipments to the watchlist, or reactivates them (as if they were just added) if they're already in it.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            shipments (list[ShipmentKey]): The carrier type and tracking number of each shipment.
+
+        Returns:
+            datetime: The time the shipments have been added at.
+        """
+        added_at = datetime.now(timezone.utc)
+        entries = {
+            (entry.carrier_type, entry.tracking_number): entry
+            for entry in await db.scalars(select(WatchlistModel).where(
+                tuple_(WatchlistModel.carrier_type, WatchlistModel.tracking_number).in_(shipments)
+            ))
+        }
+
+        for carrier_type, tracking_number in shipments:
+            entry = entries.get((carrier_type, tracking_number))
+
+            if entry is None:
+                entry = entries[carrier_type, tracking_number] = WatchlistModel(
+                    carrier_type=carrier_type,
+                    tracking_number=tracking_number
+                )
+                db.add(entry)
+
+            entry.added_at = added_at
+            entry.is_active = True
+
+        await db.commit()
+
+        return added_at
+
+    @staticmethod
+    async def remove_shipment(db: AsyncSession, shipment: ShipmentKey) -> bool:
+        """
+        Removes a shipment from the watchlist.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            shipment (ShipmentKey): The carrier type and tracking number of the shipment.
+
+        Returns:
+            bool: True if the shipment was in the watchlist, False otherwise.
+        """
+        carrier_type, tracking_number = shipment
+        result = await db.execute(delete(WatchlistModel).where(
+            WatchlistModel.carrier_type == carrier_type,
+            WatchlistModel.tracking_number == tracking_number
+        ))
+        await db.commit()
+
+        return bool(result.rowcount)  # type: ignore[attr-defined]
+
+    @staticmethod
+    async def get_active_shipments(db: AsyncSession, added_since: datetime) -> list[WatchlistModel]:
+        """
+        Retrieves the shipments of the watchlist which are still refreshed.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            added_since (datetime): Only the shipments added since this time are retrieved.
+
+        Returns:
+            list[WatchlistModel]: The active watchlist entries, from the oldest to the most recent one.
+        """
+        entries = await db.scalars(select(WatchlistModel).where(
+            WatchlistModel.is_active.is_(True),
+            WatchlistModel.added_at >= added_since
+        ).order_by(WatchlistModel.added_at))
+
+        return list(entries)
+
+
+class WatchlistRefresher:
+    """
+    Refreshes the shipments of the watchlist in the background, before they expire from the cache.
+
+    Each shipment is refreshed at a random time within the last `2 * lead` of its TTL, where `lead` is
+    `WATCHLIST_REFRESH_LEAD` of the TTL. So the interval follows the shipment's cache TTL policy, e.g.
+    minutes when it's out for delivery, and the shipments cached at the same time don't expire at once.
+    A shipment is no longer refreshed once it has reached a final phase (e.g. delivered), or once
+    it has been in the watchlist for longer than `WATCHLIST_RETENTION_DAYS`.
+
+    The refreshes are started at most `WATCHLIST_REFRESH_RATE` times per second, with the lowest priority
+    of the carriers' rate limits, so the load is spread evenly over time and user requests are served first.
+
+    Note:
+        Every worker refreshes the whole watchlist, but a shipment which is still fresh in the cache (e.g.
+        refreshed by another worker sharing the Redis cache) is rescheduled without calling the carrier.
+    """
+
+    def __init__(self):
+        self._added_at: dict[ShipmentKey, float] = {}
+        self._due: dict[ShipmentKey, float] = {}
+        self._schedule: list[tuple[float, ShipmentKey]] = []
+        self._scheduled = asyncio.Event()
+        self._refreshes: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
+        self._carrier_handler_factory: Callable[[str, str], Carrier] | None = None
+        self._session_factory: Callable[[], Session] | None = None
+        self._settings: Settings | None = None
+        self._stats: Counter[str] = Counter()
+
+    async def start(
+            self,
+            carrier_handler_factory: Callable[[str, str], Carrier],
+            session_factory: Callable[[], Session],
+            settings: Settings
+    ):
+        """
+        Loads the active shipments of the watchlist, and starts refreshing them.
+
+        The loaded shipments are spread over `WATCHLIST_STARTUP_SPREAD` seconds, instead of
+        being refreshed all at once on startup.
+
+        Args:
+            carrier_handler_factory (Callable[[str, str], Carrier]): Builds the carrier handler
+                of a shipment, from its carrier type and tracking number.
+            session_factory (Callable[[], Session]): Creates a new database session.
+            settings (Settings): The application settings.
+        """
+        self._carrier_handler_factory = carrier_handler_factory
+        self._session_factory = session_factory
+        self._settings = settings
+
+        entries = await asyncio.to_thread(
+            self._with_session,
+            WatchlistServices.get_active_shipments,
+            WatchlistServices.retention_start(settings.WATCHLIST_RETENTION_DAYS)
+        )
+
+        self._task = asyncio.create_task(self._run())
+        self.watch(
+            ((entry.carrier_type, entry.tracking_number, entry.added_at.timestamp()) for entry in entries),
+            spread=settings.WATCHLIST_STARTUP_SPREAD
+        )
+        logger.info(f'{len(entries)} shipments of the watchlist are refreshed in the background')
+
+    async def stop(self):
+        """
+        Stops refreshing the shipments, e.g. on shutdown.
+        """
+        tasks = [task for task in (self._task, *self._refreshes) if task is not None]
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def watch(self, shipments: Iterable[tuple[str, str, float]], spread: float = 0):
+        """
+        Schedules the refresh of shipments, replacing their current schedule if they're already watched.
+
+        Nothing is scheduled unless the refresher has been started, e.g. if it's disabled.
+
+        Args:
+            shipments (Iterable[tuple[str, str, float]]): The carrier type, tracking number
+                and time (in seconds since the epoch) each shipment was added to the watchlist.
+            spread (float, optional): The shipments are scheduled evenly over this many seconds,
+                instead of right away.
+        """
+        if self._task is None:
+            return
+
+        shipments = list(shipments)
+        now = time.time()
+
+        for index, (carrier_type, tracking_number, added_at) in enumerate(shipments):
+            self._added_at[carrier_type, tracking_number] = added_at
+            self._schedule_at((carrier_type, tracking_number), now + spread * index / len(shipments))
+
+    def unwatch(self, shipment: ShipmentKey):
+        """
+        Stops refreshing a shipment.
+
+        Args:
+            shipment (ShipmentKey): The carrier type and tracking number of the shipment.
+        """
+        self._added_at.pop(shipment, None)
+        self._due.pop(shipment, None)
+
+    def _schedule_at(self, shipment: ShipmentKey, due: float):
+        """
+        Schedules the next refresh of a shipment.
+
+        Args:
+            shipment (ShipmentKey): The carrier type and tracking number of the shipment.
+            due (float): The time (in seconds since the epoch) of the refresh.
+        """
+        # The previous schedule of the shipment (if any) is left in the heap, and skipped once it's due
+        self._due[shipment] = due
+        heapq.heappush(self._schedule, (due, shipment))
+        self._scheduled.set()
+
+    async def _run(self):
+        """
+        Starts the refreshes as they're due, until cancelled.
+        """
+        while True:
+            if not self._schedule:
+                await self._scheduled.wait()
+                self._scheduled.clear()
+                continue
+
+            due, shipment = self._schedule[0]
+            delay = due - time.time()
+
+            if delay > 0:
+                # Woken up early if a shipment is scheduled meanwhile, since it may be due first
+                try:
+                    async with asyncio.timeout(delay):
+                        await self._scheduled.wait()
+                except TimeoutError:
+                    pass
+
+                self._scheduled.clear()
+                continue
+
+            heapq.heappop(self._schedule)
+
+            if self._due.get(shipment) != due:
+                continue
+
+            del self._due[shipment]
+            refresh = asyncio.create_task(self._refresh(shipment))
+            self._refreshes.add(refresh)
+            refresh.add_done_callback(self._refreshes.discard)
+
+            await asyncio.sleep(1 / self._settings.WATCHLIST_REFRESH_RATE)  # type: ignore[union-attr]
+
+    async def _refresh(self, shipment: ShipmentKey):
+        """
+        Refreshes a shipment if it's about to expire from the cache, then schedules its next refresh.
+
+        Args:
+            shipment (ShipmentKey): The carrier type and tracking number of the shipment.
+        """
+        settings: Settings = self._settings  # type: ignore[assignment]
+
+        try:
+            carrier_handler = self._carrier_handler_factory(*shipment)  # type: ignore[misc]
+            carrier_handler.priority = RequestPriority.BACKGROUND
+            cached_shipment = await carrier_handler.get_cached_shipment()
+
+            if cached_shipment.max_age() <= 2 * self._lead(cached_shipment):
+                cached_shipment = await carrier_handler.refresh_cached_shipment()
+                self._stats['refreshed'] += 1
+            else:
+                self._stats['fresh'] += 1
+        except NotImplementedError:
+            logger.warning(f'The watchlist\'s shipment {shipment} can\'t be refreshed, as its carrier isn\'t supported')
+            self.unwatch(shipment)
+            return
+        except (CarrierException, httpx.HTTPError) as ex:
+            self._stats['failures'] += 1
+            logger.warning(f'Refreshing the watchlist\'s shipment {shipment} failed: {ex!r}')
+            self._reschedule(shipment, time.time() + settings.WATCHLIST_RETRY_INTERVAL)
+            return
+
+        if cached_shipment.phase in settings.WATCHLIST_FINAL_PHASES:
+            self._stats['completed'] += 1
+            self.unwatch(shipment)
+            await asyncio.to_thread(self._with_session, WatchlistServices.deactivate_shipment, shipment)
+            return
+
+        # Refreshed at a random time before it expires, at least `WATCHLIST_MIN_REFRESH_INTERVAL` seconds from now
+        lead = self._lead(cached_shipment)
+        self._reschedule(shipment, max(
+            time.time() + cached_shipment.max_age() - random.uniform(lead, 2 * lead),
+            time.time() + settings.WATCHLIST_MIN_REFRESH_INTERVAL
+        ))
+
+    def _reschedule(self, shipment: ShipmentKey, due: float):
+        """
+        Schedules the next refresh of a shipment, unless it's no longer watched (or has been watched for too long).
+
+        Args:
+            shipment (ShipmentKey): The carrier type and tracking number of the shipment.
+            due (float): The time (in seconds since the epoch) of the next refresh.
+        """
+        added_at = self._added_at.get(shipment)
+
+        if added_at is None or shipment in self._due:
+            # Unwatched, or added again (so already rescheduled) during the refresh
+            return
+
+        if due - added_at > self._settings.WATCHLIST_RETENTION_DAYS * 24 * 3600:  # type: ignore[union-attr]
+            self._stats['expired'] += 1
+            self.unwatch(shipment)
+            return
+
+        self._schedule_at(shipment, due)
+
+    def _lead(self, cached_shipment: CachedShipment) -> float:
+        return cached_shipment.ttl * self._settings.WATCHLIST_REFRESH_LEAD  # type: ignore[union-attr]
+
+    def _with_session(self, func: Callable[[Session, Any], Any], argument: Any) -> Any:
+        """
+        Calls a `WatchlistServices` method with a new database session, e.g. from a worker thread.
+
+        Args:
+            func (Callable[[Session, Any], Any]): The method to call.
+            argument (Any): The argument of the method, besides the session.
+
+        Returns:
+            Any: The result of the method.
+        """
+        with self._session_factory() as db:  # type: ignore[misc]
+            return func(db, argument)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'watched': len(self._added_at),
+            'scheduled': len(self._due),
+            'refreshing': len(self._refreshes),
+            'refreshed': self._stats['refreshed'],
+            'fresh': self._stats['fresh'],
+            'completed': self._stats['completed'],
+            'expired': self._stats['expired'],
+            'failures': self._stats['failures']
+        }
+
+
+watchlist_refresher = WatchlistRefresher()
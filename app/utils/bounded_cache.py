@@ -0,0 +1,241 @@
+import random
+import sys
+import time
+from collections import Counter, OrderedDict
+from typing import Any, NamedTuple
+
+from app.utils.cache_backends import CacheBackend
+
+def approximate_size(value: Any) -> int:
+    """
+    Approximates the memory used by a value, in constant time.
+
+    The value's nested objects aren't walked through, so the values holding a large payload
+    (e.g. a serialized shipment) account for it in their `__sizeof__` instead.
+
+    Args:
+        value (Any): The value to measure.
+
+    Returns:
+        int: The approximate size of the value, in bytes.
+    """
+    return sys.getsizeof(value)
+
+
+class FrequencySketch:
+    """
+    A Count-Min sketch estimating how often keys have been accessed recently, as used by TinyLFU.
+
+    Counters are 4-bit (capped at 15), and all of them are halved once the number of recorded
+    accesses reaches ten times the width, so the estimates favour recent popularity.
+    """
+
+    MAX_FREQUENCY = 15
+
+    # Small caches still get enough counters for the estimates not to be dominated by collisions
+    MIN_WIDTH = 64
+
+    def __init__(self, width: int, depth: int = 4):
+        """
+        Initializes a FrequencySketch instance.
+
+        Args:
+            width (int): The number of counters per row, usually the maximum number of cached entries.
+            depth (int, optional): The number of rows (i.e. hash functions). Defaults to 4.
+        """
+        self._width = 1 << max(width - 1, self.MIN_WIDTH - 1).bit_length()
+        self._mask = self._width - 1
+        self._rows = [bytearray(self._width) for _ in range(depth)]
+        self._seeds = [random.getrandbits(32) for _ in range(depth)]
+        self._additions = 0
+        self._sample_size = 10 * self._width
+
+    def _indexes(self, key: str) -> list[int]:
+        return [hash((seed, key)) & self._mask for seed in self._seeds]
+
+    def increment(self, key: str):
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.MAX_FREQUENCY:
+                row[index] += 1
+
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def frequency(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _age(self):
+        """
+        Halves all the counters, so keys which are no longer popular can be evicted eventually.
+        """
+        self._rows = [bytearray(counter >> 1 for counter in row) for row in self._rows]
+        self._additions //= 2
+
+
+class _Item(NamedTuple):
+    value: Any
+    expires_at: float | None
+    size: int
+
+
+class BoundedMemoryCache(CacheBackend):
+    """
+    An in-memory cache bounded by a maximum number of entries and an approximate byte budget.
+
+    Entries are kept in least-recently-used order, so every operation is O(1). Once the cache is
+    full, the least recently used entry is evicted to make room for a new one, unless the
+    `tinylfu` eviction policy is selected: then the new entry is admitted only if it has been
+    accessed more often recently than the entry it would evict, which keeps one-off lookups
+    from flushing popular entries out of the cache.
+
+    Note:
+        Expired entries are removed lazily, when they are accessed or reach the eviction end.
+        None of the operations await, so they are atomic from the event loop's point of view.
+        The size of an entry is what `sys.getsizeof` reports for its key and value (see `approximate_size`).
+    """
+
+    LRU = 'lru'
+    TINY_LFU = 'tinylfu'
+
+    def __init__(
+            self,
+            max_entries: int = 100_000,
+            max_bytes: int = 256 * 1024 * 1024,
+            eviction_policy: str = LRU
+    ):
+        """
+        Initializes a BoundedMemoryCache instance.
+
+        Args:
+            max_entries (int, optional): The maximum number of entries. Defaults to 100,000.
+            max_bytes (int, optional): The approximate maximum memory used by the entries. Defaults to 256 MB.
+            eviction_policy (str, optional): Either `lru` or `tinylfu`. Defaults to `lru`.
+
+        Raises:
+            ValueError: If an invalid eviction policy has been selected.
+        """
+        if eviction_policy not in (self.LRU, self.TINY_LFU):
+            raise ValueError(f'Invalid eviction policy has been selected: {eviction_policy}')
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+
+        self._items: OrderedDict[str, _Item] = OrderedDict()
+        self._bytes = 0
+        self._sketch = FrequencySketch(max_entries) if eviction_policy == self.TINY_LFU else None
+        self._stats: Counter[str] = Counter()
+
+    async def get(self, key: str) -> Any:
+        if self._sketch is not None:
+            self._sketch.increment(key)
+
+        item = self._items.get(key)
+
+        if item is None:
+            self._stats['misses'] += 1
+            return None
+
+        if self._is_expired(item):
+            self._remove(key)
+            self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return None
+
+        self._items.move_to_end(key)
+        self._stats['hits'] += 1
+
+        return item.value
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        """
+        Sets a key-value pair in the cache, evicting other entries if it's full.
+
+        Args:
+            key (str): The key for the cache entry.
+            value (Any): The value to be stored in the cache.
+            ttl (float, optional): The time-to-live (in seconds) for the cache entry. Defaults to None (no expiry).
+
+        Returns:
+            bool: True if the entry has been stored, False if it hasn't been admitted.
+
+        Note:
+            The previous value of the key is removed even if the new one isn't stored (e.g. it's larger
+            than the whole byte budget), so an outdated value is never served instead of the new one.
+        """
+        size = approximate_size(key) + approximate_size(value)
+        is_update = self._remove(key)
+
+        if size > self.max_bytes:
+            self._stats['rejections'] += 1
+            return False
+
+        while self._items and (len(self._items) >= self.max_entries or self._bytes + size > self.max_bytes):
+            victim_key, victim = next(iter(self._items.items()))
+
+            if self._is_expired(victim):
+                self._stats['expirations'] += 1
+            elif (
+                    not is_update
+                    and self._sketch is not None
+                    and self._sketch.frequency(key) <= self._sketch.frequency(victim_key)
+            ):
+                self._stats['rejections'] += 1
+                return False
+            else:
+                self._stats['evictions'] += 1
+
+            self._remove(victim_key)
+
+        self._items[key] = _Item(
+            value=value,
+            expires_at=time.monotonic() + ttl if ttl else None,
+            size=size
+        )
+        self._bytes += size
+
+        return True
+
+    async def delete(self, key: str) -> bool:
+        return self._remove(key)
+
+    async def clear(self):
+        self._items.clear()
+        self._bytes = 0
+
+    @staticmethod
+    def _is_expired(item: _Item) -> bool:
+        return item.expires_at is not None and item.expires_at <= time.monotonic()
+
+    def _remove(self, key: str) -> bool:
+        item = self._items.pop(key, None)
+
+        if item is None:
+            return False
+
+        self._bytes -= item.size
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the cache.
+
+        Returns:
+            dict[str, Any]: The size of the cache, along with its hits, misses, evictions and rejections.
+        """
+        lookups = self._stats['hits'] + self._stats['misses']
+
+        return {
+            'eviction_policy': self.eviction_policy,
+            'entries': len(self._items),
+            'max_entries': self.max_entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self._stats['hits'],
+            'misses': self._stats['misses'],
+            'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+            'evictions': self._stats['evictions'],
+            'expirations': self._stats['expirations'],
+            'rejections': self._stats['rejections']
+        }
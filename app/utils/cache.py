@@ -1,4 +1,41 @@
-from aiocache import SimpleMemoryCache
+import asyncio
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Awaitable, Callable
+
+from app.config.base import Settings
+from app.utils.bounded_cache import BoundedMemoryCache
+from app.utils.cache_backends import CacheBackend, RedisCacheBackend, TieredCacheBackend, cache_codec
+
+logger = getLogger(__name__)
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """
+    A value kept in the cache, along with the time it becomes stale.
+
+    Attributes:
+        value: The cached value.
+        stale_at: The time (in seconds since the epoch) after which the value is stale and should be refreshed.
+            It's a wall-clock time, since the entry may be shared with other processes.
+    """
+    value: Any
+    stale_at: float
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self.value)
+
+
+cache_codec.register(
+    CacheEntry,
+    tag=0,
+    to_fields=lambda entry: [entry.value, entry.stale_at],
+    from_fields=lambda fields: CacheEntry(value=fields[0], stale_at=fields[1])
+)
 
 
 class AppInMemoryCache:
@@ -7,26 +44,56 @@ class AppInMemoryCache:
 
     This class provides methods for setting, getting, and deleting key-value pairs in the cache.
 
+    Entries can optionally be served stale while they are revalidated: once an entry is past its
+    TTL, it's still returned for up to `stale_ttl` more seconds, while a single background task
+    refreshes it. If the refresh fails, the stale value keeps being served until it's evicted.
+
     Note:
         This class follows the Singleton design pattern to ensure that only one instance
         of the cache is created throughout the application.
 
+        The entries are kept in a bounded in-memory backend (see `BoundedMemoryCache`) by default,
+        which can be replaced through `configure` on startup, e.g. by a backend shared by all
+        the workers (see `create_cache_backend`).
+
     Attributes:
         _instance: The singleton instance of the cache.
-        cache: The underlying cache implementation.
+        cache: The underlying cache backend.
 
     """
 
     _instance = None
 
+    # How long to wait before refreshing a stale entry again, after its refresh has failed
+    REFRESH_RETRY_INTERVAL = 30
+
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             # Initialize the cache instance here
-            cls._instance.cache = SimpleMemoryCache()
+            cls._instance.cache = BoundedMemoryCache()
+            cls._instance._refreshes = {}
+            cls._instance._stats = Counter()
         return cls._instance
 
-    async def set(self, key: str, value, ttl: int = 3600):
+    def configure(self, backend: CacheBackend):
+        """
+        Replaces the underlying cache backend.
+
+        Args:
+            backend (CacheBackend): The new cache backend.
+
+        """
+        self.cache = backend
+
+    async def close(self):
+        """
+        Releases the resources (e.g. connections) held by the cache backend.
+
+        """
+        await self.cache.close()
+
+    async def set(self, key: str, value, ttl: int = 3600, stale_ttl: int = 0):
         """
         Sets a key-value pair in the cache with an optional time-to-live (TTL).
 
@@ -34,22 +101,75 @@ class AppInMemoryCache:
             key (str): The key for the cache entry.
             value: The value to be stored in the cache.
             ttl (int, optional): The time-to-live (in seconds) for the cache entry. Defaults to 3600.
+            stale_ttl (int, optional): How long (in seconds) the entry can be served stale after its TTL,
+                while it's being refreshed. Defaults to 0 (evicted once its TTL is over).
 
         """
-        await self.cache.set(key=key, value=value, ttl=ttl)  # type: ignore[attr-defined]
+        await self.cache.set(
+            key=key,
+            value=CacheEntry(value=value, stale_at=time.time() + ttl),
+            ttl=ttl + stale_ttl
+        )
 
-    async def get(self, key):
+    async def get(self, key, refresh: Callable[[], Awaitable[Any]] | None = None):
         """
         Retrieves the value associated with the given key from the cache.
 
         Args:
             key: The key to retrieve the value for.
+            refresh (Callable[[], Awaitable[Any]], optional): The function refreshing the entry (by setting it
+                again) if it's stale. It runs in the background, while the stale value is returned right away.
 
         Returns:
             The value associated with the key, or None if the key is not found in the cache.
 
         """
-        return await self.cache.get(key=key)
+        entry: CacheEntry | None = await self.cache.get(key)
+
+        if entry is None:
+            return None
+
+        if refresh is not None and entry.stale_at <= time.time():
+            self._stats['stale_hits'] += 1
+            self._refresh_in_background(key, entry, refresh)
+
+        return entry.value
+
+    def _refresh_in_background(self, key: str, entry: CacheEntry, refresh: Callable[[], Awaitable[Any]]):
+        """
+        Starts refreshing a stale entry in the background, unless it's already being refreshed.
+
+        Args:
+            key (str): The key of the stale entry.
+            entry (CacheEntry): The stale entry.
+            refresh (Callable[[], Awaitable[Any]]): The function refreshing the entry.
+        """
+        if key in self._refreshes:
+            return
+
+        task = self._refreshes[key] = asyncio.ensure_future(self._refresh(key, entry, refresh))
+        task.add_done_callback(lambda _: self._refreshes.pop(key, None))
+
+    async def _refresh(self, key: str, entry: CacheEntry, refresh: Callable[[], Awaitable[Any]]):
+        """
+        Refreshes a stale entry, keeping the stale value if the refresh fails.
+
+        Args:
+            key (str): The key of the stale entry.
+            entry (CacheEntry): The stale entry.
+            refresh (Callable[[], Awaitable[Any]]): The function refreshing the entry.
+        """
+        self._stats['refreshes'] += 1
+
+        try:
+            await refresh()
+        except Exception as ex:
+            self._stats['refresh_failures'] += 1
+            logger.warning(f'Refreshing the stale cache entry {key} failed: {ex!r}')
+
+            # The stale value is still served until it's evicted, but without
+            # trying to refresh it again on every single hit in the meantime
+            entry.stale_at = time.time() + self.REFRESH_RETRY_INTERVAL
 
     async def delete(self, key):
         """
@@ -62,7 +182,59 @@ class AppInMemoryCache:
             bool: True if the entry was successfully deleted, False otherwise.
 
         """
-        return await self.cache.delete(key=key)
+        return await self.cache.delete(key)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the cache.
+
+        Returns:
+            dict[str, Any]: The size, hits, misses and evictions of the cache,
+            along with the number of stale hits, background refreshes and failed refreshes.
+
+        """
+        return {
+            **self.cache.stats(),
+            'stale_hits': self._stats['stale_hits'],
+            'refreshes': self._stats['refreshes'],
+            'refresh_failures': self._stats['refresh_failures'],
+            'refreshing': len(self._refreshes)
+        }
+
+
+def create_cache_backend(settings: Settings) -> CacheBackend:
+    """
+    Creates the cache backend selected in the application settings.
+
+    With the `memory` backend, each process has its own bounded cache. With the `redis` backend,
+    the entries are shared by all the processes, with a bounded per-process cache in front of it.
+
+    Args:
+        settings (Settings): The application settings.
+
+    Returns:
+        CacheBackend: The cache backend.
+
+    Raises:
+        ValueError: If an invalid cache backend has been selected.
+    """
+    memory_cache = BoundedMemoryCache(
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        max_bytes=settings.CACHE_MAX_BYTES,
+        eviction_policy=settings.CACHE_EVICTION_POLICY
+    )
+
+    if settings.CACHE_BACKEND == 'memory':
+        return memory_cache
+
+    if settings.CACHE_BACKEND == 'redis':
+        return TieredCacheBackend(
+            l1=memory_cache,
+            l2=RedisCacheBackend.from_url(settings.CACHE_REDIS_URL),
+            l1_ttl=settings.CACHE_L1_TTL
+        )
+
+    raise ValueError(f'Invalid cache backend has been selected: {settings.CACHE_BACKEND}')
 
 
 cache = AppInMemoryCache()
@@ -0,0 +1,323 @@
+import abc
+from collections import Counter
+from logging import getLogger
+from typing import Any, Callable
+
+import ormsgpack
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = getLogger(__name__)
+
+
+class CacheBackend(abc.ABC):
+    """
+    This is the base class for the storages behind the application's cache.
+
+    All cache backends should extend this class and implement all abstract methods.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Any:
+        """
+        Retrieves the value associated with the given key, or None if it's not found (or expired).
+        """
+        raise NotImplementedError
+
+    async def get_with_ttl(self, key: str) -> tuple[Any, float | None]:
+        """
+        Retrieves the value associated with the given key (or None), along with its remaining time-to-live
+        (in seconds), which is None if the entry doesn't expire or if the backend doesn't keep track of it.
+        """
+        return await self.get(key), None
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        """
+        Sets a key-value pair with an optional time-to-live (in seconds), returning whether it has been stored.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> bool:
+        """
+        Deletes the entry associated with the given key, returning whether it existed.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the backend.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """
+        Releases the resources (e.g. connections) held by the backend.
+        """
+
+
+class MsgpackCodec:
+    """
+    Serializes the values stored outside the process (e.g. in Redis) with MessagePack, prefixed by a format version.
+
+    Besides the values MessagePack supports natively, only the types explicitly registered (with their tag
+    and the conversion from and to their fields) can be serialized, so decoding never runs arbitrary code,
+    unlike pickle. Data which can't be decoded, e.g. written by another version of the application after
+    a type has changed shape, raises a ValueError.
+    """
+
+    VERSION = b'\x01'
+
+    def __init__(self):
+        self._encoders: dict[type, tuple[int, Callable[[Any], list[Any]]]] = {}
+        self._decoders: dict[int, Callable[[list[Any]], Any]] = {}
+
+    def register(
+            self,
+            cls: type,
+            tag: int,
+            to_fields: Callable[[Any], list[Any]],
+            from_fields: Callable[[list[Any]], Any]
+    ):
+        """
+        Registers a type which can be serialized.
+
+        Args:
+            cls (type): The type.
+            tag (int): The MessagePack extension type of its values, between 0 and 127, unique per type.
+                It should be changed whenever its fields do, so the values of the previous shape become unreadable.
+            to_fields (Callable[[Any], list[Any]]): Converts a value into a list of serializable fields.
+            from_fields (Callable[[list[Any]], Any]): Builds a value back from its fields.
+        """
+        self._encoders[cls] = (tag, to_fields)
+        self._decoders[tag] = from_fields
+
+    def _default(self, value: Any) -> ormsgpack.Ext:
+        encoder = self._encoders.get(type(value))
+
+        if encoder is None:
+            raise TypeError(f'{type(value).__name__} is not registered for serialization')
+
+        tag, to_fields = encoder
+        return ormsgpack.Ext(tag, self._pack(to_fields(value)))
+
+    def _pack(self, value: Any) -> bytes:
+        # The dataclasses would otherwise be serialized as maps of all their fields, without the registered conversion
+        return ormsgpack.packb(value, default=self._default, option=ormsgpack.OPT_PASSTHROUGH_DATACLASS)
+
+    def _ext_hook(self, tag: int, data: bytes) -> Any:
+        from_fields = self._decoders.get(tag)
+
+        if from_fields is None:
+            raise ValueError(f'The extension type {tag} is not registered')
+
+        return from_fields(ormsgpack.unpackb(data, ext_hook=self._ext_hook))
+
+    def encode(self, value: Any) -> bytes:
+        """
+        Serializes a value.
+
+        Raises:
+            TypeError: If the value (or one nested in it) can't be serialized.
+        """
+        return self.VERSION + self._pack(value)
+
+    def decode(self, data: bytes) -> Any:
+        """
+        Deserializes a value.
+
+        Raises:
+            ValueError: If the data isn't a value serialized by this version of the codec.
+        """
+        if data[:1] != self.VERSION:
+            raise ValueError('Unsupported serialization format')
+
+        return ormsgpack.unpackb(data[1:], ext_hook=self._ext_hook)
+
+
+# The codec of the application's cache, with which the cached types register themselves
+cache_codec = MsgpackCodec()
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    A cache backend storing the entries in Redis (or any server speaking its protocol),
+    so they are shared by all the workers and pods of the application.
+
+    Values are serialized explicitly (see `MsgpackCodec`), so reading an entry never runs code,
+    and an entry which can't be read (e.g. corrupt, or written by another version of the application)
+    is treated as a miss and deleted.
+
+    Note:
+        The cache is an optimization, so Redis being unavailable is not an error: lookups
+        are treated as misses and writes are dropped, and both are counted in the stats.
+    """
+
+    def __init__(self, redis: Redis, key_prefix: str = 'tracey:', codec: MsgpackCodec = cache_codec):
+        """
+        Initializes a RedisCacheBackend instance.
+
+        Args:
+            redis (Redis): The asyncio Redis client.
+            key_prefix (str, optional): The prefix of all the keys, to share a Redis database safely.
+            codec (MsgpackCodec, optional): The codec of the values. Defaults to the application's cache codec.
+        """
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.codec = codec
+        self._stats: Counter[str] = Counter()
+
+    @classmethod
+    def from_url(cls, url: str, key_prefix: str = 'tracey:') -> 'RedisCacheBackend':
+        """
+        Creates a RedisCacheBackend instance connected to the given Redis URL, e.g. `redis://localhost:6379/0`.
+        """
+        return cls(redis=Redis.from_url(url), key_prefix=key_prefix)
+
+    async def get(self, key: str) -> Any:
+        try:
+            raw_value = await self.redis.get(self.key_prefix + key)
+        except RedisError as ex:
+            self._stats['errors'] += 1
+            logger.warning(f'Reading {key} from the Redis cache failed: {ex!r}')
+            return None
+
+        return await self._decode(key, raw_value)
+
+    async def get_with_ttl(self, key: str) -> tuple[Any, float | None]:
+        try:
+            # Both are read in a single round trip
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                raw_value, ttl_ms = await pipeline.get(self.key_prefix + key).pttl(self.key_prefix + key).execute()
+        except RedisError as ex:
+            self._stats['errors'] += 1
+            logger.warning(f'Reading {key} from the Redis cache failed: {ex!r}')
+            return None, None
+
+        # A negative TTL means that the key doesn't expire (-1), or doesn't exist (-2)
+        return await self._decode(key, raw_value), ttl_ms / 1000 if ttl_ms >= 0 else None
+
+    async def _decode(self, key: str, raw_value: bytes | None) -> Any:
+        """
+        Deserializes the value read for the given key, deleting it if it's unreadable.
+
+        Args:
+            key (str): The key of the entry.
+            raw_value (bytes | None): The serialized value, or None if the entry wasn't found.
+
+        Returns:
+            Any: The value, or None if it wasn't found or is unreadable.
+        """
+        if raw_value is None:
+            self._stats['misses'] += 1
+            return None
+
+        try:
+            value = self.codec.decode(raw_value)
+        except (ValueError, TypeError) as ex:
+            self._stats['decode_errors'] += 1
+            self._stats['misses'] += 1
+            logger.warning(f'Decoding {key} from the Redis cache failed, deleting it: {ex!r}')
+            await self.delete(key)
+            return None
+
+        self._stats['hits'] += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        try:
+            await self.redis.set(
+                self.key_prefix + key,
+                self.codec.encode(value),
+                px=int(ttl * 1000) if ttl else None
+            )
+        except RedisError as ex:
+            self._stats['errors'] += 1
+            logger.warning(f'Writing {key} to the Redis cache failed: {ex!r}')
+            return False
+
+        return True
+
+    async def delete(self, key: str) -> bool:
+        try:
+            return bool(await self.redis.delete(self.key_prefix + key))
+        except RedisError as ex:
+            self._stats['errors'] += 1
+            logger.warning(f'Deleting {key} from the Redis cache failed: {ex!r}')
+            return False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'hits': self._stats['hits'],
+            'misses': self._stats['misses'],
+            'errors': self._stats['errors'],
+            'decode_errors': self._stats['decode_errors']
+        }
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class TieredCacheBackend(CacheBackend):
+    """
+    A cache backend with a small per-process cache (L1) in front of a shared one (L2).
+
+    Hot entries are served from the process' memory without a network round trip, while
+    the shared cache lets all the workers benefit from each other's calls to the carriers.
+
+    Note:
+        An entry is kept in L1 for at most `l1_ttl` seconds, so a change made by another
+        worker (e.g. a refresh) is visible to this one after `l1_ttl` seconds at the latest.
+        It never outlives its L2 entry either, whose remaining time-to-live caps the one in L1.
+    """
+
+    def __init__(self, l1: CacheBackend, l2: CacheBackend, l1_ttl: float):
+        """
+        Initializes a TieredCacheBackend instance.
+
+        Args:
+            l1 (CacheBackend): The per-process cache.
+            l2 (CacheBackend): The shared cache.
+            l1_ttl (float): The maximum time-to-live (in seconds) of the entries in L1.
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+
+    async def get(self, key: str) -> Any:
+        value = await self.l1.get(key)
+
+        if value is None:
+            value, ttl = await self.l2.get_with_ttl(key)
+
+            if value is None:
+                return None
+
+            ttl = self.l1_ttl if ttl is None else min(ttl, self.l1_ttl)
+
+            # An entry about to expire from L2 isn't worth keeping (a TTL of 0 would keep it forever)
+            if ttl > 0:
+                await self.l1.set(key, value, ttl=ttl)
+
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        await self.l1.set(key, value, ttl=min(ttl, self.l1_ttl) if ttl else self.l1_ttl)
+        return await self.l2.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> bool:
+        deleted_from_l1 = await self.l1.delete(key)
+        deleted_from_l2 = await self.l2.delete(key)
+        return deleted_from_l1 or deleted_from_l2
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'l1': self.l1.stats(),
+            'l2': self.l2.stats()
+        }
+
+    async def close(self):
+        await self.l1.close()
+        await self.l2.close()
@@ -0,0 +1,70 @@
+from typing import Any, AsyncIterable, AsyncIterator, Iterable
+
+import ijson
+
+_SCALAR_EVENTS = frozenset(('string', 'number', 'boolean', 'null'))
+
+
+async def stream_json_objects(
+        chunks: AsyncIterable[bytes],
+        prefixes: Iterable[str],
+        fields: Iterable[str],
+        within: str
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """
+    Parses a JSON document incrementally, yielding the objects found at the given prefixes as soon as they're parsed.
+
+    Only the given scalar fields of the objects are kept, so the memory used doesn't depend on the size of
+    the document, nor on the size of the objects (e.g. their nested objects are skipped). Prefixes follow
+    the `ijson` notation, e.g. `shipments.item.events.item` for the events of each shipment.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The chunks of the JSON document, e.g. `response.aiter_bytes()`.
+        prefixes (Iterable[str]): The prefixes of the objects to yield.
+        fields (Iterable[str]): The scalar fields of the objects to keep.
+        within (str): The prefix of the object containing all the objects to yield, e.g. `shipments.item`.
+            Only the objects within the first one are yielded, and the rest of the document is skipped.
+
+    Yields:
+        tuple[str, dict[str, Any]]: The prefix of each object, along with its fields. The containing object
+        (if it's one of the given prefixes) is yielded last.
+
+    Raises:
+        ijson.JSONError: If the document is not valid JSON.
+    """
+    prefixes = frozenset(prefixes)
+    field_prefixes = {f'{prefix}.{field}': (prefix, field) for prefix in prefixes for field in fields}
+
+    parsed_events = ijson.sendable_list()
+    parser = ijson.parse_coro(parsed_events)
+    objects: dict[str, dict[str, Any]] = {}
+    done = False
+
+    async for chunk in chunks:
+        if done:
+            # The rest of the document is still received, so the connection can be reused
+            continue
+
+        parser.send(chunk)
+
+        # Most of the parsed events are skipped, so they're filtered by prefix first
+        for prefix, event, value in parsed_events:
+            if prefix in field_prefixes:
+                object_prefix, field = field_prefixes[prefix]
+
+                if event in _SCALAR_EVENTS and object_prefix in objects:
+                    objects[object_prefix][field] = value
+            elif prefix in prefixes:
+                if event == 'start_map':
+                    objects[prefix] = {}
+                elif event == 'end_map' and prefix in objects:
+                    yield prefix, objects.pop(prefix)
+
+                if event == 'end_map' and prefix == within:
+                    done = True
+                    break
+
+        del parsed_events[:]
+
+    if not done:
+        parser.close()
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing the same key into a single execution.
+
+    While a call for a key is in flight, any other call for the same key waits for it
+    and gets the very same result (or exception), instead of executing it again.
+
+    Note:
+        The call runs in its own task, so a caller being cancelled (e.g. its client has
+        disconnected) doesn't cancel the call for the other callers waiting for it.
+
+    Attributes:
+        executed: The number of calls that have actually been executed.
+        coalesced: The number of calls that have shared the result of an in-flight call.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Executes the given function, unless a call with the same key is already in flight.
+
+        Args:
+            key (str): The key identifying the call.
+            func (Callable[[], Awaitable[T]]): The function to execute.
+
+        Returns:
+            T: The result of the (possibly shared) call.
+        """
+        task = self._calls.get(key)
+
+        if task is None:
+            self.executed += 1
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)  # type: ignore[no-any-return]
+
+    def _forget(self, key: str, task: asyncio.Task):
+        """
+        Removes a finished call, so the next call with the same key gets executed again.
+
+        Args:
+            key (str): The key identifying the call.
+            task (asyncio.Task): The finished task of the call.
+        """
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        if not task.cancelled():
+            # Mark the exception as retrieved, in case all the callers have been cancelled
+            task.exception()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Retrieves the statistics of the calls.
+
+        Returns:
+            dict[str, Any]: The number of in-flight, executed and coalesced calls.
+        """
+        return {
+            'in_flight': len(self._calls),
+            'executed': self.executed,
+            'coalesced': self.coalesced
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,113 @@
+"""
+Compares the cache hit path of DHLCarrier before and after caching the transformed shipment.
+
+Before: the raw `httpx.Response` is cached, and every hit parses its body, builds the Tracey
+models again and sets the entry again. After: the pre-serialized shipment is cached, and a hit
+is a single cache lookup whose bytes are sent as-is.
+
+Usage:
+    poetry run python -m benchmarks.bench_cache_hit_path
+"""
+import asyncio
+import time
+import tracemalloc
+
+import httpx
+
+from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.cache_policy import CacheTTLPolicy
+from app.services.carrier.circuit_breaker import CircuitBreaker
+from app.services.carrier.dhl import DHL_EVENT_PREFIXES, DHLCarrier
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.rate_limit import RateLimitScheduler
+from app.utils.cache import AppInMemoryCache
+from benchmarks.payloads import DHL_EVENT_MAP, dhl_payload
+
+HITS = 2_000
+SHIPMENTS = 500
+
+
+def _carrier(tracking_number: str, events: int = 0) -> DHLCarrier:
+    return DHLCarrier(
+        tracking_number=tracking_number,
+        api_key='',
+        trace_event_map=TraceyEventMap(event_map=DHL_EVENT_MAP, prefixes=DHL_EVENT_PREFIXES),
+        http_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json=dhl_payload(tracking_number, events)))
+        ),
+        cache_ttl_policy=CacheTTLPolicy({}),
+        rate_limiter=RateLimitScheduler(rate=1_000_000, burst=1_000_000),
+        circuit_breaker=CircuitBreaker()
+    )
+
+
+async def _hit_before(cache: AppInMemoryCache, carrier: DHLCarrier) -> bytes:
+    response = await cache.get(carrier._cache_key)
+    await cache.set(key=carrier._cache_key, value=response)
+    shipment = await carrier._transform_shipment_tracking_info_in_tracey(response)
+    return shipment.model_dump_json().encode()  # what the response encoding used to cost
+
+
+async def _hit_after(cache: AppInMemoryCache, carrier: DHLCarrier) -> bytes:
+    cached_shipment = await cache.get(carrier._cache_key)
+    return cached_shipment.content  # type: ignore[no-any-return]
+
+
+async def _cache_entries(events: int, transformed: bool) -> list:
+    entries = []
+    for index in range(SHIPMENTS):
+        response = httpx.Response(200, json=dhl_payload(f'JVGL{index:020d}', events))
+        if transformed:
+            carrier = _carrier(f'JVGL{index:020d}')
+            shipment: ShipmentStatus = await carrier._transform_shipment_tracking_info_in_tracey(response)
+            entries.append(shipment.model_dump_json().encode())
+        else:
+            entries.append(response)
+    return entries
+
+
+async def _memory_per_entry(events: int, transformed: bool) -> float:
+    tracemalloc.start()
+    entries = await _cache_entries(events, transformed)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entries
+    return size / SHIPMENTS
+
+
+async def _latency(events: int, transformed: bool) -> float:
+    cache = AppInMemoryCache()
+    carrier = _carrier('JVGL06252498000966068673', events)
+
+    if transformed:
+        await carrier.get_cached_shipment()
+        hit = _hit_after
+    else:
+        response = await carrier._request_shipment_tracking_info(read_timeout=30.0)
+        await response.aread()
+        await cache.set(key=carrier._cache_key, value=response)
+        hit = _hit_before
+
+    started = time.perf_counter()
+    for _ in range(HITS):
+        await hit(cache, carrier)
+    elapsed = time.perf_counter() - started
+
+    await cache.delete(carrier._cache_key)
+    return elapsed / HITS * 1_000_000
+
+
+async def main():
+    print(f'{"events":>8} {"before (us/hit)":>16} {"after (us/hit)":>15} {"before (B/entry)":>17} {"after (B/entry)":>16}')
+    for events in (5, 50, 500):
+        before = await _latency(events, transformed=False)
+        after = await _latency(events, transformed=True)
+        print(
+            f'{events:>8} {before:>16.1f} {after:>15.1f} '
+            f'{await _memory_per_entry(events, transformed=False):>17,.0f} '
+            f'{await _memory_per_entry(events, transformed=True):>16,.0f}'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
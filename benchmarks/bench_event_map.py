@@ -0,0 +1,87 @@
+"""
+Compares the transformation of DHL events into Tracey events before and after compiling the event map.
+
+Before: every event is checked against the hard-coded `Processed at` prefix, looked up in the raw
+event map, and a new `TraceyEvent` is built (and validated) from the map's dict. After: the event
+map is compiled once into a `TraceyEventMap`, and every event is matched to a shared `TraceyEvent`.
+
+Usage:
+    poetry run python -m benchmarks.bench_event_map
+"""
+import time
+
+import httpx
+
+from app.schemas.schema_tracey import ShipmentEvent, TraceyEvent
+from app.services.carrier.cache_policy import CacheTTLPolicy
+from app.services.carrier.circuit_breaker import CircuitBreaker
+from app.services.carrier.dhl import DHL_EVENT_PREFIXES, DHLCarrier
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.rate_limit import RateLimitScheduler
+from benchmarks.payloads import DHL_EVENT_MAP, dhl_event
+
+HISTORY_SIZES = (1_000, 10_000, 100_000)
+
+
+def _transform_before(event_map: dict, shipment_event: dict) -> ShipmentEvent | None:
+    if shipment_event['description'].startswith('Processed at'):
+        tracey_status = event_map['Processed at']
+    else:
+        tracey_status = event_map.get(shipment_event['description'])
+
+    if not tracey_status:
+        if shipment_event['statusCode'].title() == 'Delivered':
+            tracey_status = event_map.get('Delivered')
+        else:
+            return None
+
+    return ShipmentEvent(
+        event_datetime=shipment_event['timestamp'],
+        event=TraceyEvent(
+            carrier_exception=tracey_status['carrierException'],
+            exception_type=tracey_status['exceptionType'],
+            is_returned=tracey_status['isReturned'],
+            phase=tracey_status['phase'],
+            sub_phase=tracey_status['subPhase'],
+            tracey_event=tracey_status['traceyEvent'],
+        )
+    )
+
+
+def _carrier(event_map: TraceyEventMap) -> DHLCarrier:
+    return DHLCarrier(
+        tracking_number='JVGL00000000000000000000',
+        api_key='',
+        trace_event_map=event_map,
+        http_client=httpx.AsyncClient(),
+        cache_ttl_policy=CacheTTLPolicy({}),
+        rate_limiter=RateLimitScheduler(rate=1, burst=1),
+        circuit_breaker=CircuitBreaker()
+    )
+
+
+def main():
+    carrier = _carrier(TraceyEventMap(event_map=DHL_EVENT_MAP, prefixes=DHL_EVENT_PREFIXES))
+
+    print(f'{"events":>8} {"before (ms)":>12} {"after (ms)":>11} {"speedup":>8} {"µs/event after":>15}')
+    for size in HISTORY_SIZES:
+        events = [dhl_event(index) for index in range(size)]
+
+        started = time.perf_counter()
+        before = [_transform_before(DHL_EVENT_MAP, event) for event in events]
+        before_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        after = [carrier._transform_shipment_event_in_tracey_event(event) for event in events]
+        after_time = time.perf_counter() - started
+
+        assert [event.model_dump() for event in before] == [event.model_dump() for event in after]
+
+        print(
+            f'{size:>8} {before_time * 1000:>12.1f} {after_time * 1000:>11.1f} '
+            f'{before_time / after_time:>7.2f}x {after_time / size * 1e6:>15.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
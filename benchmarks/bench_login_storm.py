@@ -0,0 +1,102 @@
+"""
+Compares the latency of tracking a (cached) shipment while a storm of logins is served by the same worker,
+with the users queried through the synchronous and through the asynchronous database sessions.
+
+Sync: the login endpoints, although coroutines, queried the users through a synchronous session, so every
+query blocked the event loop, and every other request of the worker waited for it. Async: the users are
+queried through an asynchronous session (asyncpg), so the event loop keeps serving the other requests
+while the queries are awaited.
+
+The logins are made with unknown usernames, so no password is hashed and only the database is measured.
+Unlike the other benchmarks, this one needs the Postgres database configured in the `.env` file.
+
+Usage:
+    poetry run python -m benchmarks.bench_login_storm
+"""
+import asyncio
+import statistics
+import time
+
+from app.api.dependencies import get_database_handler
+from app.auth.exceptions import InvalidCredentialsError
+from app.auth.users import AsyncUserServices, UserServices
+from app.db.database import DatabaseHandler
+from benchmarks.bench_cache_hit_path import _carrier
+
+DURATION = 3.0
+TRACKING_INTERVAL = 0.001
+LOGINS_IN_FLIGHT = (0, 10, 50)
+
+
+async def _login_sync(db_handler: DatabaseHandler):
+    with db_handler.create_session() as session:
+        try:
+            UserServices.get_user(db=session, username='unknown')
+        except InvalidCredentialsError:
+            pass
+
+
+async def _login_async(db_handler: DatabaseHandler):
+    async with db_handler.create_async_session() as session:
+        try:
+            await AsyncUserServices.get_user(db=session, username='unknown')
+        except InvalidCredentialsError:
+            pass
+
+
+async def _storm(login, db_handler: DatabaseHandler, stop: asyncio.Event, logins: list[int]):
+    while not stop.is_set():
+        await login(db_handler)
+        logins[0] += 1
+        # Yields to the event loop, like a new request would
+        await asyncio.sleep(0)
+
+
+async def _run(login, db_handler: DatabaseHandler, in_flight: int) -> tuple[list[float], float]:
+    carrier = _carrier('JVGL06252498000966068673')
+    await carrier.get_cached_shipment()
+
+    stop = asyncio.Event()
+    logins = [0]
+    storm = [asyncio.create_task(_storm(login, db_handler, stop, logins)) for _ in range(in_flight)]
+
+    latencies = []
+    started = time.perf_counter()
+
+    while time.perf_counter() - started < DURATION:
+        # The latency of a tracking request includes the time it waits for the event loop
+        requested = time.perf_counter()
+        await asyncio.sleep(TRACKING_INTERVAL)
+        await carrier.get_cached_shipment()
+        latencies.append((time.perf_counter() - requested - TRACKING_INTERVAL) * 1_000)
+
+    stop.set()
+    await asyncio.gather(*storm)
+
+    return latencies, logins[0] / (time.perf_counter() - started)
+
+
+async def main():
+    db_handler = get_database_handler()
+    db_handler.initialize()
+
+    print(f'{"session":>8} {"logins":>7} {"p50 (ms)":>9} {"p99 (ms)":>9} {"max (ms)":>9} {"logins/s":>9}')
+    try:
+        for name, login in (('sync', _login_sync), ('async', _login_async)):
+            # Warms up the pool, so connecting isn't measured
+            await asyncio.gather(*(login(db_handler) for _ in range(max(LOGINS_IN_FLIGHT))))
+
+            for in_flight in LOGINS_IN_FLIGHT:
+                latencies, throughput = await _run(login, db_handler, in_flight)
+                p99 = statistics.quantiles(latencies, n=100, method='inclusive')[98]
+                print(
+                    f'{name:>8} {in_flight:>7} {statistics.median(latencies):>9.2f} '
+                    f'{p99:>9.2f} {max(latencies):>9.2f} {throughput:>9,.0f}'
+                )
+    finally:
+        db_handler.dispose()
+        await db_handler.dispose_async()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Compares the login throughput, and the responsiveness of the event loop, with the passwords verified
+on the event loop and in pools of increasing size.
+
+Event loop: bcrypt runs on the event loop, so the logins are verified one at a time and nothing else is
+served meanwhile. Pool: bcrypt runs in a bounded pool of threads (it releases the GIL), so the logins are
+verified in parallel, up to the number of cores, while the event loop keeps serving the other requests.
+The logins beyond the pool and its queue are rejected right away (with a 503 by the API).
+
+Usage:
+    poetry run python -m benchmarks.bench_password_hashing
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from app.auth.exceptions import PasswordHasherBusyError
+from app.auth.hashing import PasswordHasher, pwd_context
+
+DURATION = 3.0
+CLIENTS = 32
+MAX_QUEUE = 16
+POOL_SIZES = (1, 2, 4, 8)
+PASSWORD = 'somesecret123'
+HASHED_PASSWORD = pwd_context.hash(PASSWORD)
+
+
+async def _clients(verify, stop: asyncio.Event, latencies: list[float], rejected: list[int]):
+    async def _client():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                await verify(PASSWORD, HASHED_PASSWORD)
+                latencies.append((time.perf_counter() - started) * 1_000)
+                # Yields to the event loop, like a new request would
+                await asyncio.sleep(0)
+            except PasswordHasherBusyError:
+                rejected[0] += 1
+                # The client waits for the `Retry-After` before trying again
+                await asyncio.sleep(0.1)
+
+    await asyncio.gather(*(_client() for _ in range(CLIENTS)))
+
+
+async def _run(verify) -> tuple[float, float, int, float]:
+    stop = asyncio.Event()
+    latencies: list[float] = []
+    rejected = [0]
+    clients = asyncio.create_task(_clients(verify, stop, latencies, rejected))
+
+    # The lag of the event loop is how late a timer fires, i.e. how long any other request waits for it
+    lags = []
+    started = time.perf_counter()
+
+    while time.perf_counter() - started < DURATION:
+        requested = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - requested - 0.01) * 1_000)
+
+    stop.set()
+    await clients
+    elapsed = time.perf_counter() - started
+
+    return len(latencies) / elapsed, statistics.median(latencies), rejected[0], max(lags)
+
+
+async def _verify_on_event_loop(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)  # type: ignore[no-any-return]
+
+
+async def main():
+    print(f'{CLIENTS} clients, {os.cpu_count()} cores')
+    print(f'{"workers":>10} {"logins/s":>9} {"p50 (ms)":>9} {"rejected":>9} {"max lag (ms)":>13}')
+
+    throughput, latency, rejected, lag = await _run(_verify_on_event_loop)
+    print(f'{"event loop":>10} {throughput:>9.1f} {latency:>9.1f} {rejected:>9} {lag:>13.1f}')
+
+    for workers in POOL_SIZES:
+        hasher = PasswordHasher(workers=workers, max_queue=MAX_QUEUE)
+        throughput, latency, rejected, lag = await _run(hasher.verify)
+        hasher.shutdown()
+
+        print(f'{workers:>10} {throughput:>9.1f} {latency:>9.1f} {rejected:>9} {lag:>13.1f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Compares serializing a response through FastAPI's default path with serializing it through the fast path.
+
+Default: the endpoint returns the model, which FastAPI (as of the pinned version) validates against
+the `response_model`, dumps into JSON-compatible objects, then encodes with `json`. Fast: the endpoint
+serializes the model itself, in a single pass, either as JSON (by pydantic's serializer) or as MessagePack
+(by ormsgpack), as negotiated with the `Accept` header.
+
+Usage:
+    poetry run python -m benchmarks.bench_serialization
+"""
+import asyncio
+import json
+import time
+from typing import Callable
+
+from pydantic import TypeAdapter
+
+from app.api.responses import ResponseFormat, model_response
+from app.schemas.schema_tracey import ShipmentStatus
+from benchmarks.bench_sparse_response import _cached_shipment
+
+SERIALIZATIONS = 200
+
+RESPONSE_MODEL = TypeAdapter(ShipmentStatus)
+
+
+def _serialize_default(shipment: ShipmentStatus) -> bytes:
+    # What `serialize_response` then `JSONResponse.render` do with a returned model
+    content = RESPONSE_MODEL.dump_python(
+        RESPONSE_MODEL.validate_python(shipment, from_attributes=True),
+        mode='json'
+    )
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode()
+
+
+def _serialize_json(shipment: ShipmentStatus) -> bytes:
+    return model_response(model=shipment, response_format=ResponseFormat.JSON).body
+
+
+def _serialize_msgpack(shipment: ShipmentStatus) -> bytes:
+    return model_response(model=shipment, response_format=ResponseFormat.MSGPACK).body
+
+
+def _latency(serialize: Callable[[ShipmentStatus], bytes], shipment: ShipmentStatus) -> float:
+    started = time.perf_counter()
+    for _ in range(SERIALIZATIONS):
+        serialize(shipment)
+
+    return (time.perf_counter() - started) / SERIALIZATIONS * 1_000_000
+
+
+async def main():
+    print(f'{"events":>8} {"default (us)":>13} {"json (us)":>10} {"msgpack (us)":>13} '
+          f'{"json (B)":>10} {"msgpack (B)":>12}')
+    for events in (5, 50, 500, 5_000):
+        shipment = ShipmentStatus.model_validate_json((await _cached_shipment(events)).content)
+
+        print(
+            f'{events:>8} {_latency(_serialize_default, shipment):>13.1f} '
+            f'{_latency(_serialize_json, shipment):>10.1f} {_latency(_serialize_msgpack, shipment):>13.1f} '
+            f'{len(_serialize_json(shipment)):>10,} {len(_serialize_msgpack(shipment)):>12,}'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
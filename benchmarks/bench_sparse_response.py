@@ -0,0 +1,68 @@
+"""
+Compares rendering the last few events (or only the status) of a cached shipment with and without the event offsets.
+
+Without: the cached shipment is loaded into a `ShipmentStatus`, the events are filtered, and the
+remaining model is serialized again. With: the requested parts of the serialized shipment are sliced
+out of the cached content, without building nor serializing any model.
+
+Usage:
+    poetry run python -m benchmarks.bench_sparse_response
+"""
+import asyncio
+import time
+
+import httpx
+
+from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.base import CachedShipment
+from app.services.carrier.dhl import DHL_EVENT_PREFIXES
+from app.services.carrier.event_map import TraceyEventMap
+from benchmarks.bench_event_map import _carrier
+from benchmarks.payloads import DHL_EVENT_MAP, dhl_payload
+
+RENDERS = 200
+LIMIT = 5
+
+
+def _render_from_models(cached_shipment: CachedShipment, fields: set[str]) -> bytes:
+    shipment = ShipmentStatus.model_validate_json(cached_shipment.content)
+    shipment.events = shipment.events[:LIMIT]
+    return shipment.model_dump_json(include=fields).encode()
+
+
+def _render_from_offsets(cached_shipment: CachedShipment, fields: set[str]) -> bytes:
+    return cached_shipment.render(limit=LIMIT, fields=fields)
+
+
+async def _cached_shipment(events: int) -> CachedShipment:
+    carrier = _carrier(TraceyEventMap(event_map=DHL_EVENT_MAP, prefixes=DHL_EVENT_PREFIXES))
+    response = httpx.Response(200, json=dhl_payload(carrier.tracking_number, events))
+    shipment = await carrier._transform_shipment_tracking_info_in_tracey(response)
+
+    return CachedShipment.from_shipment(shipment, fetched_at=0, phase='in transit', ttl=60)
+
+
+def _latency(render, cached_shipment: CachedShipment, fields: set[str]) -> float:
+    started = time.perf_counter()
+    for _ in range(RENDERS):
+        render(cached_shipment, fields)
+
+    return (time.perf_counter() - started) / RENDERS * 1_000_000
+
+
+async def main():
+    print(f'{"events":>8} {"fields":>7} {"models (us)":>12} {"offsets (us)":>13} {"full (B)":>9} {"sparse (B)":>11}')
+    for events in (50, 500, 5_000):
+        cached_shipment = await _cached_shipment(events)
+
+        for fields in ({'shipment_id', 'status', 'events'}, {'status'}):
+            print(
+                f'{events:>8} {"all" if len(fields) > 1 else "status":>7} '
+                f'{_latency(_render_from_models, cached_shipment, fields):>12.1f} '
+                f'{_latency(_render_from_offsets, cached_shipment, fields):>13.1f} '
+                f'{len(cached_shipment.content):>9,} {len(_render_from_offsets(cached_shipment, fields)):>11,}'
+            )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Compares the peak memory of transforming large DHL responses before and after parsing them as they're received.
+
+Before: the whole response is read, then loaded at once (every event with its nested address objects)
+before being transformed. After: the response is parsed chunk by chunk, keeping only the fields of each
+event the transformation needs, so only the transformed shipment grows with the history's length.
+
+Usage:
+    poetry run python -m benchmarks.bench_streaming_parse
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import AsyncIterator
+
+import httpx
+
+from app.services.carrier import dhl
+from app.services.carrier.event_map import TraceyEventMap
+from benchmarks.bench_event_map import _carrier
+from benchmarks.payloads import DHL_EVENT_MAP, dhl_payload
+
+HISTORY_SIZES = (1_000, 10_000, 50_000)
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkedStream(httpx.AsyncByteStream):
+    """
+    The body of a response, received in chunks as it would be from the network.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for start in range(0, len(self.body), CHUNK_SIZE):
+            yield self.body[start:start + CHUNK_SIZE]
+
+
+async def _transform(body: bytes, streaming: bool):
+    carrier = _carrier(TraceyEventMap(event_map=DHL_EVENT_MAP, prefixes=dhl.DHL_EVENT_PREFIXES))
+    dhl.STREAMING_PARSE_THRESHOLD = 0 if streaming else len(body)
+
+    response = httpx.Response(200, headers={'content-length': str(len(body))}, stream=_ChunkedStream(body))
+    await carrier._transform_shipment_tracking_info_in_tracey(response)
+
+
+async def _peak_memory(body: bytes, streaming: bool) -> float:
+    tracemalloc.start()
+    await _transform(body, streaming)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak / 1024 / 1024
+
+
+async def _latency(body: bytes, streaming: bool) -> float:
+    started = time.perf_counter()
+    await _transform(body, streaming)
+
+    return (time.perf_counter() - started) * 1000
+
+
+async def main():
+    print(
+        f'{"events":>8} {"payload (MB)":>13} {"before (peak MB)":>17} {"after (peak MB)":>16} '
+        f'{"before (ms)":>12} {"after (ms)":>11}'
+    )
+
+    # Warms up the parsers and the models, so it's not accounted for in the first measurements
+    for streaming in (False, True):
+        await _transform(json.dumps(dhl_payload('JVGL06252498000966068673', 10)).encode(), streaming)
+
+    for size in HISTORY_SIZES:
+        body = json.dumps(dhl_payload('JVGL06252498000966068673', size)).encode()
+
+        before_peak, after_peak = await _peak_memory(body, streaming=False), await _peak_memory(body, streaming=True)
+        before_time, after_time = await _latency(body, streaming=False), await _latency(body, streaming=True)
+
+        print(
+            f'{size:>8} {len(body) / 1024 / 1024:>13.1f} {before_peak:>17.1f} {after_peak:>16.1f} '
+            f'{before_time:>12.1f} {after_time:>11.1f}'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
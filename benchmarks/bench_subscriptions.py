@@ -0,0 +1,102 @@
+"""
+Measures the cost of many clients subscribed to the new events of shipments, with a single poller per shipment.
+
+Tens of thousands of subscriptions (a few per shipment) are kept open while idle, then a new event is
+found for every shipment. The memory and the CPU time used while idle, along with the time it takes
+for the new events to reach every subscriber, are reported. Each shipment is polled by its poller only,
+whereas each client would poll it on its own without subscriptions.
+
+Usage:
+    poetry run python -m benchmarks.bench_subscriptions
+"""
+import asyncio
+import time
+import tracemalloc
+
+from app.config.base import Settings
+from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.subscriptions import KEEP_ALIVE_MESSAGE, ShipmentSubscription, ShipmentSubscriptions
+from benchmarks.bench_sparse_response import _cached_shipment
+
+SUBSCRIPTIONS = 20_000
+SHIPMENTS = 2_000
+IDLE_DURATION = 5.0
+POLL_INTERVAL = 1.0
+
+SETTINGS = Settings(
+    TRACKING_SUBSCRIPTION_MIN_POLL_INTERVAL=POLL_INTERVAL,
+    TRACKING_SUBSCRIPTION_MAX_POLL_INTERVAL=POLL_INTERVAL,
+    TRACKING_SUBSCRIPTION_KEEP_ALIVE_INTERVAL=15.0
+)
+# The cached shipment without (then with) its most recent event
+CACHED_SHIPMENTS: list[CachedShipment] = []
+
+
+class _Carrier(Carrier):
+    updated = False
+    polls = 0
+
+    def __init__(self):
+        super().__init__(tracking_number='JVGL00000000000000000000', trace_event_map=TraceyEventMap({}))
+
+    async def get_cached_shipment(self) -> CachedShipment:
+        _Carrier.polls += 1
+        return CACHED_SHIPMENTS[_Carrier.updated]
+
+    async def get_shipment_and_transform_into_tracey(self) -> ShipmentStatus:
+        raise NotImplementedError
+
+
+async def _receive(subscription: ShipmentSubscription, received: list[float]):
+    async for message in subscription.stream(SETTINGS.TRACKING_SUBSCRIPTION_KEEP_ALIVE_INTERVAL):
+        if message is not KEEP_ALIVE_MESSAGE:
+            received.append(time.perf_counter())
+
+
+async def main():
+    CACHED_SHIPMENTS.extend([await _cached_shipment(events=10), await _cached_shipment(events=11)])
+    subscriptions = ShipmentSubscriptions()
+    received: list[float] = []
+
+    tracemalloc.start()
+    clients = []
+    for index in range(SUBSCRIPTIONS):
+        subscription = subscriptions.subscribe({('dhl', f'JVGL{index % SHIPMENTS:020}'): _Carrier}, SETTINGS)
+        clients.append((subscription, asyncio.create_task(_receive(subscription, received))))
+
+    # Lets the first polls (which only record the current events) happen
+    await asyncio.sleep(POLL_INTERVAL / 2)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    polls = _Carrier.polls
+    started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.sleep(IDLE_DURATION)
+    idle_cpu = (time.process_time() - cpu_started) / (time.perf_counter() - started)
+    polls = _Carrier.polls - polls
+
+    _Carrier.updated = True
+    updated_at = time.perf_counter()
+    while len(received) < SUBSCRIPTIONS:
+        await asyncio.sleep(0.01)
+
+    fan_out = max(received) - updated_at
+
+    print(f'subscriptions: {SUBSCRIPTIONS:,} to {SHIPMENTS:,} shipments, {subscriptions.stats()["pollers"]:,} pollers')
+    print(f'memory per subscription: {memory / SUBSCRIPTIONS / 1024:.1f} KB')
+    print(f'idle CPU: {idle_cpu:.1%} ({polls / IDLE_DURATION:,.0f} polls/s, vs {SUBSCRIPTIONS / POLL_INTERVAL:,.0f} '
+          f'if every client polled every {POLL_INTERVAL:g}s)')
+    print(f'new events received by every subscriber {fan_out * 1000:.0f} ms after they appeared '
+          f'(polled every {POLL_INTERVAL:g}s)')
+
+    for subscription, client in clients:
+        subscriptions.unsubscribe(subscription)
+        client.cancel()
+
+    await subscriptions.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
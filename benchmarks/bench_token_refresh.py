@@ -0,0 +1,98 @@
+"""
+Compares the latency of renewing an access token by logging in again and by using a refresh token.
+
+Login: the user is queried by username, and their password is verified with bcrypt (in the hashing pool).
+Refresh: the refresh token is looked up by its SHA-256, through the unique index of the refresh tokens,
+then rotated, i.e. revoked and replaced by a new one, without any password verification.
+
+Unlike most of the other benchmarks, this one needs the Postgres database configured in the `.env` file,
+in which it creates a user (deleted afterwards, along with its refresh tokens).
+
+Usage:
+    poetry run python -m benchmarks.bench_token_refresh
+"""
+import asyncio
+import secrets
+import statistics
+import time
+
+from sqlalchemy import delete, select
+
+from app.api.dependencies import get_database_handler
+from app.auth.hashing import password_hasher
+from app.auth.users import AsyncUserServices, UserAuthServices
+from app.db.models import RefreshTokenModel, UserModel
+
+RENEWALS = 50
+PASSWORD = 'somesecret123'
+SECRET_KEY = 'benchmark'
+
+
+async def _latencies(renew) -> list[float]:
+    latencies = []
+    for _ in range(RENEWALS):
+        started = time.perf_counter()
+        await renew()
+        latencies.append((time.perf_counter() - started) * 1_000)
+
+    return latencies
+
+
+async def main():
+    db_handler = get_database_handler()
+    db_handler.initialize()
+    username = f'benchmark_{secrets.token_hex(4)}'
+
+    try:
+        async with db_handler.create_async_session() as db:
+            await AsyncUserServices.create_user(
+                db=db,
+                email=f'{username}@example.com',
+                username=username,
+                password=PASSWORD
+            )
+
+            async def _login():
+                return await UserAuthServices.authenticate_user_and_create_token_async(
+                    db=db,
+                    username=username,
+                    password=PASSWORD,
+                    access_token_expire_time=60,
+                    secret_key=SECRET_KEY,
+                    algorithm='HS256',
+                    refresh_token_expire_time=30
+                )
+
+            refresh_token = (await _login()).refresh_token
+
+            async def _refresh():
+                nonlocal refresh_token
+                token = await UserAuthServices.refresh_access_token(
+                    db=db,
+                    refresh_token=refresh_token,  # type: ignore[arg-type]
+                    access_token_expire_time=60,
+                    refresh_token_expire_time=30,
+                    secret_key=SECRET_KEY,
+                    algorithm='HS256'
+                )
+                refresh_token = token.refresh_token
+
+            print(f'{"renewal":>8} {"mean (ms)":>10} {"p50 (ms)":>9} {"p99 (ms)":>9}')
+            for name, renew in (('login', _login), ('refresh', _refresh)):
+                latencies = await _latencies(renew)
+                p99 = statistics.quantiles(latencies, n=100, method='inclusive')[98]
+                print(f'{name:>8} {statistics.mean(latencies):>10.2f} {statistics.median(latencies):>9.2f} {p99:>9.2f}')
+    finally:
+        async with db_handler.create_async_session() as db:
+            user_ids = select(UserModel.id).where(UserModel.username == username)
+            await db.execute(delete(RefreshTokenModel).where(RefreshTokenModel.user_id.in_(user_ids)))
+            await db.execute(delete(UserModel).where(UserModel.username == username))
+            await db.commit()
+
+        password_hasher.shutdown()
+        db_handler.dispose()
+        await db_handler.dispose_async()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
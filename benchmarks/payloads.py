@@ -0,0 +1,59 @@
+"""
+Synthetic DHL payloads and Tracey event maps shared by the benchmarks.
+"""
+from datetime import datetime, timedelta, timezone
+
+
+def tracey_status(phase: str, sub_phase: str, tracey_event: str, is_returned: bool = False) -> dict:
+    return {
+        'carrierException': None,
+        'exceptionType': 'success',
+        'isReturned': is_returned,
+        'phase': phase,
+        'subPhase': sub_phase,
+        'traceyEvent': tracey_event
+    }
+
+
+DHL_EVENT_MAP = {
+    'Processed at': tracey_status('In transit', 'Processing', 'Processed'),
+    'Shipment picked up': tracey_status('In transit', 'Picked up', 'Picked up'),
+    'Arrived at Delivery Facility': tracey_status('In transit', 'At delivery facility', 'Arrived at facility'),
+    'Shipment is out with courier for delivery': tracey_status('Out for delivery', 'With courier', 'Out for delivery'),
+    'Delivered': tracey_status('Delivered', 'Delivered', 'Delivered'),
+    'Returned to shipper': tracey_status('Returned', 'Returned', 'Returned', is_returned=True),
+}
+
+_DESCRIPTIONS = [
+    'Shipment picked up',
+    'Processed at LEIPZIG - GERMANY',
+    'Processed at BRUSSELS - BELGIUM',
+    'Arrived at Delivery Facility',
+    'Shipment is out with courier for delivery',
+]
+
+
+def dhl_event(index: int, description: str | None = None) -> dict:
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index)
+    return {
+        'timestamp': timestamp.isoformat().replace('+00:00', 'Z'),
+        'location': {'address': {'addressLocality': 'LEIPZIG - GERMANY', 'countryCode': 'DE', 'postalCode': '04435'}},
+        'statusCode': 'transit',
+        'status': 'TRANSIT',
+        'description': description or _DESCRIPTIONS[index % len(_DESCRIPTIONS)],
+    }
+
+
+def dhl_payload(tracking_number: str, events: int) -> dict:
+    return {
+        'shipments': [{
+            'id': tracking_number,
+            'service': 'parcel-de',
+            'origin': {'address': {'addressLocality': 'Germany', 'countryCode': 'DE'}},
+            'destination': {'address': {'addressLocality': 'Belgium', 'countryCode': 'BE'}},
+            'status': dhl_event(events, 'Shipment is out with courier for delivery'),
+            'details': {'product': {'productName': 'DHL PAKET'}, 'weight': {'value': 1.2, 'unitText': 'kg'}},
+            'events': [dhl_event(index) for index in reversed(range(events))],
+        }],
+        'possibleAdditionalShipmentsUrl': [],
+    }
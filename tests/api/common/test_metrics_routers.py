@@ -0,0 +1,32 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import FastAPI, status
+
+from app.api.dependencies import get_settings
+from app.config.base import Settings
+from tests.conftest import access_token, app, async_client
+
+
+@pytest.mark.asyncio
+async def test_metrics(app: FastAPI, async_client: AsyncClient, access_token: str):
+    app.dependency_overrides[get_settings] = lambda: Settings(ADMIN_USERNAMES=['johndoe'])
+
+    try:
+        response = await async_client.get('/metrics', headers={'Authorization': f'Bearer {access_token}'})
+    finally:
+        del app.dependency_overrides[get_settings]
+
+    assert response.status_code == status.HTTP_200_OK
+    assert 'http_pools' in response.json()
+
+
+@pytest.mark.asyncio
+async def test_metrics_without_token(async_client: AsyncClient):
+    response = await async_client.get('/metrics')
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_metrics_are_restricted_to_admins(async_client: AsyncClient, access_token: str):
+    response = await async_client.get('/metrics', headers={'Authorization': f'Bearer {access_token}'})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
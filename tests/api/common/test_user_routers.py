@@ -1,9 +1,11 @@
 import pytest
 from httpx import AsyncClient
-from fastapi import status
+from fastapi import FastAPI, status
 
+from app.api.dependencies import get_settings, get_token_claims_cache
+from app.config.base import Settings
 from app.schemas.schema_users import User, UserInDB, Token
-from tests.conftest import async_client, user_schema_instance
+from tests.conftest import app, async_client, user_schema_instance
 
 
 @pytest.mark.asyncio
@@ -55,3 +57,104 @@ async def test_get_token_invalid_credentials(async_client: AsyncClient, user_sch
 
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
     assert response.json()['detail'] == 'Invalid authentication credentials'
+
+
+async def _login(async_client: AsyncClient, user_schema_instance: UserInDB) -> Token:
+    await async_client.post(url='/user/register', json=user_schema_instance.model_dump())
+
+    response = await async_client.post(
+        url='/user/token',
+        data={
+            'username': user_schema_instance.username,
+            'password': user_schema_instance.password
+        }
+    )
+
+    return Token(**response.json())
+
+
+@pytest.fixture
+def without_reuse_grace(app: FastAPI):
+    """
+    Takes any reuse of a rotated refresh token as a theft, even right after its rotation.
+    """
+    app.dependency_overrides[get_settings] = lambda: Settings(JWT_REFRESH_TOKEN_REUSE_GRACE=0)
+    yield
+    del app.dependency_overrides[get_settings]
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_is_rotated(
+        async_client: AsyncClient,
+        user_schema_instance: UserInDB,
+        without_reuse_grace: None
+):
+    token = await _login(async_client, user_schema_instance)
+    assert token.refresh_token is not None
+
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': token.refresh_token})
+
+    assert response.status_code == status.HTTP_200_OK
+    refreshed_token = Token(**response.json())
+    assert refreshed_token.refresh_token not in (None, token.refresh_token)
+
+    # Reusing the rotated refresh token revokes the new one as well
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': token.refresh_token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': refreshed_token.refresh_token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_revoked_refresh_token_is_rejected(async_client: AsyncClient, user_schema_instance: UserInDB):
+    token = await _login(async_client, user_schema_instance)
+
+    response = await async_client.post(url='/user/token/revoke', json={'refresh_token': token.refresh_token})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': token.refresh_token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()['detail'] == 'Invalid refresh token'
+
+
+@pytest.mark.asyncio
+async def test_reused_refresh_token_revokes_the_access_tokens(
+        async_client: AsyncClient,
+        user_schema_instance: UserInDB,
+        without_reuse_grace: None
+):
+    token = await _login(async_client, user_schema_instance)
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': token.refresh_token})
+    refreshed_token = Token(**response.json())
+    headers = {'Authorization': f'Bearer {refreshed_token.access_token}'}
+
+    response = await async_client.get(url='/v1/track/watchlist', headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    # The rotated refresh token has been stolen, so the access tokens issued until then are revoked as well
+    try:
+        await async_client.post(url='/user/token/refresh', json={'refresh_token': token.refresh_token})
+
+        response = await async_client.get(url='/v1/track/watchlist', headers=headers)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    finally:
+        # The revocation is kept by the process, so it would reject the tokens of the next tests
+        get_token_claims_cache.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rotation_does_not_revoke_the_new_refresh_token(
+        async_client: AsyncClient,
+        user_schema_instance: UserInDB
+):
+    token = await _login(async_client, user_schema_instance)
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': token.refresh_token})
+    refreshed_token = Token(**response.json())
+
+    # Another request of the same client rotating the token right after loses the race, but isn't taken as a theft
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': token.refresh_token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await async_client.post(url='/user/token/refresh', json={'refresh_token': refreshed_token.refresh_token})
+    assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,28 @@
+import ormsgpack
+import pytest
+
+from app.api.responses import ResponseFormat, json_response, model_response
+from tests.services.test_cached_shipment import SHIPMENT
+
+
+@pytest.mark.parametrize('accept, response_format', [
+    (None, ResponseFormat.JSON),
+    ('*/*', ResponseFormat.JSON),
+    ('application/json', ResponseFormat.JSON),
+    ('application/msgpack', ResponseFormat.MSGPACK),
+    ('application/x-msgpack, */*;q=0.1', ResponseFormat.MSGPACK),
+    ('application/msgpack;q=0.5, application/json', ResponseFormat.JSON),
+    ('application/json, application/msgpack', ResponseFormat.JSON),
+    ('application/*, application/msgpack;q=0.9', ResponseFormat.JSON)
+])
+def test_response_format_is_negotiated(accept: str | None, response_format: ResponseFormat):
+    assert ResponseFormat.negotiate(accept) is response_format
+
+
+def test_model_is_sent_in_both_formats():
+    json_content = model_response(model=SHIPMENT, response_format=ResponseFormat.JSON).body
+    msgpack_content = model_response(model=SHIPMENT, response_format=ResponseFormat.MSGPACK).body
+
+    assert json_content == SHIPMENT.model_dump_json().encode()
+    assert ormsgpack.unpackb(msgpack_content) == SHIPMENT.model_dump(mode='json')
+    assert json_response(content=json_content, response_format=ResponseFormat.MSGPACK).body == msgpack_content
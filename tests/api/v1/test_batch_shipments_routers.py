@@ -0,0 +1,97 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+
+from app.api.v1.routers.shipments import _batch_item
+from app.api.v1.schemas.schema_parcels import (
+    CarrierType,
+    ShipmentBatchError,
+    ShipmentBatchItem,
+    ShipmentBatchResponse,
+    ShipmentQuery
+)
+from app.services.carrier.exceptions import CarrierException
+from tests.conftest import async_client
+from tests.services.test_cached_shipment import CACHED_SHIPMENT, SHIPMENT
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_per_item_errors(async_client: AsyncClient, access_token: str):
+    response = await async_client.post(
+        url='/v1/track/shipments/batch',
+        json={
+            'shipments': [
+                {'carrier_type': CarrierType.BPOST.value, 'tracking_number': 'JVGL06252498000966068673'},
+                {'carrier_type': CarrierType.BPOST.value, 'tracking_number': 'JVGL06252498000966068673'},
+            ]
+        },
+        headers={'Authorization': f'Bearer {access_token}'}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    batch = ShipmentBatchResponse(**response.json())
+
+    # Duplicates are tracked only once, and the failure doesn't fail the whole batch
+    assert len(batch.results) == 1
+    assert batch.results[0].shipment is None
+    assert batch.results[0].error.status_code == status.HTTP_501_NOT_IMPLEMENTED
+
+
+def test_batch_items_are_serialized_like_the_response_model():
+    query = ShipmentQuery(carrier_type=CarrierType.DHL, tracking_number='JVGL06252498000966068673')
+    error = CarrierException(status_code=status.HTTP_404_NOT_FOUND, message='No shipment found')
+
+    # The cached shipments are embedded as-is, the same as the model would serialize them
+    assert _batch_item(query, CACHED_SHIPMENT) == ShipmentBatchItem(
+        **query.model_dump(), shipment=SHIPMENT
+    ).model_dump_json().encode()
+    assert _batch_item(query, error) == ShipmentBatchItem(
+        **query.model_dump(), error=ShipmentBatchError(status_code=error.status_code, detail=error.message)
+    ).model_dump_json().encode()
+
+
+@pytest.mark.asyncio
+async def test_unauthorized_batch_request(async_client: AsyncClient):
+    response = await async_client.post(
+        url='/v1/track/shipments/batch',
+        json={
+            'shipments': [
+                {'carrier_type': CarrierType.DHL.value, 'tracking_number': 'JVGL06252498000966068673'}
+            ]
+        }
+    )
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()['detail'] == 'Not authenticated'
+
+
+@pytest.mark.asyncio
+async def test_bulk_upload_streams_results(async_client: AsyncClient, access_token: str):
+    response = await async_client.post(
+        url='/v1/track/shipments/bulk',
+        params={'carrier_type': CarrierType.BPOST.value},
+        content=b'tracking_number\nJVGL06252498000966068673\n',
+        headers={'Authorization': f'Bearer {access_token}', 'Content-Type': 'text/csv'}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+
+    result, summary = [json.loads(line) for line in response.text.splitlines()]
+
+    assert result['line'] == 2
+    assert result['error']['status_code'] == status.HTTP_501_NOT_IMPLEMENTED
+    assert summary == {'summary': {'total': 1, 'succeeded': 0, 'failed': 1}}
+
+
+@pytest.mark.asyncio
+async def test_bulk_upload_of_unsupported_format(async_client: AsyncClient, access_token: str):
+    response = await async_client.post(
+        url='/v1/track/shipments/bulk',
+        content=b'JVGL06252498000966068673',
+        headers={'Authorization': f'Bearer {access_token}', 'Content-Type': 'text/plain'}
+    )
+
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
@@ -1,5 +1,6 @@
 import asyncio
 
+import ormsgpack
 import pytest
 from httpx import AsyncClient
 from fastapi import status
@@ -56,3 +57,76 @@ async def test_unauthorized_shipment_transform_request(async_client: AsyncClient
 
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
     assert response.json()['detail'] == 'Not authenticated'
+
+
+@pytest.mark.asyncio
+async def test_invalid_fields_are_rejected(async_client: AsyncClient, access_token: str):
+    response = await async_client.get(
+        url='/v1/track/shipments',
+        params={
+            'carrier_type': CarrierType.DHL.value,
+            'tracking_number': 'JVGL06252498000966068673',
+            'fields': 'status,unknown'
+        },
+        headers={'Authorization': f'Bearer {access_token}'}
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_unmodified_shipment_is_not_sent_again(async_client: AsyncClient, access_token: str):
+    params = {
+        'carrier_type': CarrierType.DHL.value,
+        'tracking_number': 'JVGL06252498000966068673'
+    }
+    response = await async_client.get(
+        url='/v1/track/shipments',
+        params=params,
+        headers={'Authorization': f'Bearer {access_token}'}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['Cache-Control'].startswith('max-age=')
+
+    response = await async_client.get(
+        url='/v1/track/shipments',
+        params=params,
+        headers={'Authorization': f'Bearer {access_token}', 'If-None-Match': response.headers['ETag']}
+    )
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b''
+
+    response = await async_client.get(
+        url='/v1/track/shipments',
+        params={**params, 'fields': 'status'},
+        headers={'Authorization': f'Bearer {access_token}', 'If-None-Match': response.headers['ETag']}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_shipment_in_msgpack(async_client: AsyncClient, access_token: str):
+    params = {
+        'carrier_type': CarrierType.DHL.value,
+        'tracking_number': 'JVGL06252498000966068673'
+    }
+    json_response = await async_client.get(
+        url='/v1/track/shipments',
+        params=params,
+        headers={'Authorization': f'Bearer {access_token}'}
+    )
+    msgpack_response = await async_client.get(
+        url='/v1/track/shipments',
+        params=params,
+        headers={'Authorization': f'Bearer {access_token}', 'Accept': 'application/msgpack'}
+    )
+
+    assert msgpack_response.status_code == status.HTTP_200_OK
+    assert msgpack_response.headers['content-type'] == 'application/msgpack'
+    assert ormsgpack.unpackb(msgpack_response.content) == json_response.json()
+
+    # Each format is a representation of its own, so it's revalidated with its own ETag
+    assert msgpack_response.headers['ETag'] != json_response.headers['ETag']
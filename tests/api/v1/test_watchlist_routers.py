@@ -0,0 +1,49 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+
+from app.api.v1.schemas.schema_parcels import CarrierType, WatchlistResponse
+from tests.conftest import async_client
+
+
+@pytest.mark.asyncio
+async def test_watchlist_add_list_and_remove(async_client: AsyncClient, access_token: str):
+    headers = {'Authorization': f'Bearer {access_token}'}
+    shipment = {'carrier_type': CarrierType.DHL.value, 'tracking_number': 'JVGL06252498000966068673'}
+
+    response = await async_client.post(
+        url='/v1/track/watchlist',
+        json={'shipments': [shipment, shipment]},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(WatchlistResponse(**response.json()).entries) == 1
+
+    # Adding a shipment again reactivates it instead of duplicating it
+    response = await async_client.post(url='/v1/track/watchlist', json={'shipments': [shipment]}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.get(url='/v1/track/watchlist', headers=headers)
+    entries = WatchlistResponse(**response.json()).entries
+
+    assert [(entry.carrier_type, entry.tracking_number) for entry in entries] == [
+        (CarrierType.DHL, 'JVGL06252498000966068673')
+    ]
+    assert entries[0].is_active
+
+    response = await async_client.delete(url='/v1/track/watchlist', params=shipment, headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = await async_client.delete(url='/v1/track/watchlist', params=shipment, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await async_client.get(url='/v1/track/watchlist', headers=headers)
+    assert WatchlistResponse(**response.json()).entries == []
+
+
+@pytest.mark.asyncio
+async def test_unauthorized_watchlist_request(async_client: AsyncClient):
+    response = await async_client.get(url='/v1/track/watchlist')
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
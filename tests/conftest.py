@@ -44,6 +44,24 @@ def override_get_database_dependency() -> Callable:
     return _override_get_database_dependency
 
 
+@pytest.fixture
+def override_get_async_database_dependency() -> Callable:
+    """
+    A pytest fixture to override the asynchronous database session dependency for testing.
+    """
+
+    async def _override_get_async_database_dependency():
+        db_handler = get_test_db_handler()
+        db_handler.initialize()
+
+        async with db_handler.create_async_session() as session:
+            yield session
+
+        await db_handler.dispose_async()
+
+    return _override_get_async_database_dependency
+
+
 @pytest.fixture
 def postgres() -> Generator[DatabaseHandler, None, None]:
     """
@@ -82,6 +100,7 @@ def user_schema_instance() -> UserInDB:
 @pytest_asyncio.fixture
 async def app(
         override_get_database_dependency: Callable,
+        override_get_async_database_dependency: Callable,
 ) -> AsyncGenerator[FastAPI, None]:
     """
     Creates a FastAPI test app with overridden database dependencies.
@@ -89,14 +108,17 @@ async def app(
     Args:
         override_get_database_dependency: A callable that returns an instance
         of the test database handler.
+        override_get_async_database_dependency: A callable that yields an asynchronous
+        session of the test database.
 
     Yields:
         The FastAPI test application instance.
     """
-    from app.api.dependencies import get_db_session
+    from app.api.dependencies import get_async_db_session, get_db_session
     from app.main import app
 
     app.dependency_overrides[get_db_session] = override_get_database_dependency
+    app.dependency_overrides[get_async_db_session] = override_get_async_database_dependency
     yield app
 
     db_handler = get_test_db_handler()
@@ -1,3 +1,4 @@
+import pytest
 from sqlalchemy import select
 
 from app.db.models import UserModel
@@ -13,7 +14,7 @@ def test_create_tables(postgres):
     with postgres.create_session() as session:
         with session.bind.connect() as connection:
             table_names = session.bind.dialect.get_table_names(connection)
-            assert table_names == ['users']
+            assert sorted(table_names) == ['refresh_tokens', 'shipment_events', 'shipments', 'users', 'watchlist']
 
 
 def test_user_create(postgres, user_model_instance):
@@ -34,3 +35,30 @@ def test_drop_tables(postgres):
             assert table_names == []
 
     postgres.initialize()
+
+
+def test_pool_stats(postgres):
+    with postgres.create_session() as session:
+        session.execute(select(UserModel)).all()
+
+        stats = postgres.pool_stats()
+        assert stats['checked_out'] == 1
+        assert stats['checkouts'] >= 1
+
+    # Closing the session returns its connection to the pool
+    assert postgres.pool_stats()['checked_out'] == 0
+
+
+@pytest.mark.asyncio
+async def test_async_session(postgres, user_model_instance):
+    async with postgres.create_async_session() as session:
+        session.add(user_model_instance)
+        await session.commit()
+
+        users = (await session.scalars(select(UserModel))).all()
+        assert [user.username for user in users] == ['johndoe']
+
+        assert postgres.async_pool_stats()['checked_out'] == 1
+
+    assert postgres.async_pool_stats()['checked_out'] == 0
+    await postgres.dispose_async()
@@ -0,0 +1,55 @@
+from sqlalchemy import func, select
+
+from app.db.models import ShipmentEventModel
+from app.services.carrier.store import ShipmentServices
+from tests.conftest import postgres
+from tests.services.test_cached_shipment import SHIPMENT
+
+
+def save_shipment(postgres, events: int, event_map_version: str = 'v1'):
+    with postgres.create_session() as session:
+        ShipmentServices.save_shipment(
+            db=session,
+            carrier_type='dhl',
+            tracking_number=SHIPMENT.shipment_id,
+            shipment=SHIPMENT.model_copy(update={'events': SHIPMENT.events[-events:]}),
+            fetched_at=1_700_000_000,
+            event_map_version=event_map_version,
+            event_descriptions=frozenset({'Delivered'})
+        )
+
+
+def count_events(postgres) -> int:
+    with postgres.create_session() as session:
+        return session.execute(select(func.count()).select_from(ShipmentEventModel)).scalar_one()
+
+
+def test_only_new_events_are_inserted(postgres):
+    save_shipment(postgres, events=2)
+    save_shipment(postgres, events=4)
+
+    assert count_events(postgres) == 4
+
+    with postgres.create_session() as session:
+        stored_shipment = ShipmentServices.get_shipment(
+            db=session,
+            carrier_type='dhl',
+            tracking_number=SHIPMENT.shipment_id
+        )
+
+    assert stored_shipment.shipment == SHIPMENT
+    assert stored_shipment.fetched_at == 1_700_000_000
+    assert stored_shipment.event_map_version == 'v1'
+    assert stored_shipment.event_descriptions == {'Delivered'}
+
+
+def test_events_are_replaced_with_another_event_map_version(postgres):
+    save_shipment(postgres, events=4)
+    save_shipment(postgres, events=1, event_map_version='v2')
+
+    assert count_events(postgres) == 1
+
+
+def test_unknown_shipment_is_not_found(postgres):
+    with postgres.create_session() as session:
+        assert ShipmentServices.get_shipment(db=session, carrier_type='dhl', tracking_number='Unknown') is None
@@ -0,0 +1,50 @@
+import httpx
+import pytest
+
+from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.batch import track_shipments
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.exceptions import CarrierException
+from tests.services.test_cached_shipment import CACHED_SHIPMENT, SHIPMENT
+from tests.services.test_dhl import _carrier
+
+
+class FakeCarrier(Carrier):
+    """
+    A carrier tracking the shipment `CACHED_SHIPMENT`, except for the tracking number `broken`, which fails unexpectedly.
+    """
+
+    def __init__(self, tracking_number: str):
+        super().__init__(tracking_number=tracking_number, trace_event_map=TraceyEventMap(event_map={}))
+
+    async def is_cached(self) -> bool:
+        return False
+
+    async def get_cached_shipment(self) -> CachedShipment:
+        if self.tracking_number == 'broken':
+            raise KeyError('detail')
+
+        return CACHED_SHIPMENT
+
+    async def get_shipment_and_transform_into_tracey(self) -> ShipmentStatus:
+        return SHIPMENT
+
+
+@pytest.mark.asyncio
+async def test_unexpected_failure_of_a_shipment_does_not_fail_the_batch():
+    results = await track_shipments([FakeCarrier('broken'), FakeCarrier('JVGL06252498000966068673')], concurrency=2)
+
+    assert isinstance(results[0], CarrierException)
+    assert results[0].status_code == 502
+    assert results[1] is CACHED_SHIPMENT
+
+
+@pytest.mark.asyncio
+async def test_carrier_error_without_detail_fails_its_shipment_only():
+    carrier = _carrier(lambda request: httpx.Response(500, text='Internal Server Error'))
+
+    results = await track_shipments([carrier], concurrency=1)
+
+    assert isinstance(results[0], CarrierException)
+    assert results[0].status_code == 500
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator
+
+import pytest
+
+from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.bulk import parse_shipments, read_lines, track_bulk_shipments
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.exceptions import CarrierException
+from tests.services.test_cached_shipment import SHIPMENT
+
+
+async def chunked(content: bytes, size: int = 7) -> AsyncIterator[bytes]:
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+class FakeCarrier(Carrier):
+    """
+    A carrier which takes a while to retrieve its shipments, and can't find the ones starting with `UNKNOWN`.
+    """
+
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, carrier_type: str, tracking_number: str):
+        if carrier_type != 'dhl':
+            raise ValueError('Invalid carrier type has been selected!')
+
+        super().__init__(tracking_number=tracking_number, trace_event_map=TraceyEventMap({}))
+
+    async def get_cached_shipment(self) -> CachedShipment:
+        FakeCarrier.in_flight += 1
+        FakeCarrier.max_in_flight = max(FakeCarrier.max_in_flight, FakeCarrier.in_flight)
+
+        try:
+            await asyncio.sleep(0.001)
+        finally:
+            FakeCarrier.in_flight -= 1
+
+        if self.tracking_number.startswith('UNKNOWN'):
+            raise CarrierException(status_code=404, message='Shipment with given tracking number not found!')
+
+        return CachedShipment.from_shipment(SHIPMENT, fetched_at=time.time(), phase='delivered', ttl=60)
+
+    async def get_shipment_and_transform_into_tracey(self) -> ShipmentStatus:
+        raise NotImplementedError
+
+
+@pytest.mark.asyncio
+async def test_lines_are_split_across_chunks():
+    content = b'first\r\nsecond\n' + b'x' * 20 + b'\nlast'
+
+    lines = [line async for line in read_lines(chunked(content), max_line_length=10)]
+
+    assert lines == [b'first', b'second', None, b'last']
+
+
+@pytest.mark.asyncio
+async def test_csv_shipments_are_parsed():
+    content = b'\xef\xbb\xbfTracking_Number;Carrier_Type\nJVGL1;DHL\n\nJVGL2\n;dhl\n'
+
+    shipments = [shipment async for shipment in parse_shipments(chunked(content), 'csv', default_carrier_type='bpost')]
+
+    assert shipments == [
+        (2, ('dhl', 'JVGL1')),
+        (4, ('bpost', 'JVGL2')),
+        (5, 'The tracking number is missing!')
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_shipments_are_tracked_with_bounded_concurrency():
+    content = b'\n'.join(
+        [json.dumps({'carrier_type': 'dhl', 'tracking_number': f'JVGL{number}'}).encode() for number in range(50)]
+        + [b'{"carrier_type": "dhl", "tracking_number": "UNKNOWN"}', b'{"carrier_type": "ups", "tracking_number": "1"}',
+           b'not json']
+    )
+
+    lines = [
+        json.loads(line)
+        async for line in track_bulk_shipments(
+            chunks=chunked(content, size=100),
+            bulk_format='ndjson',
+            carrier_handler_factory=FakeCarrier,
+            concurrency=5
+        )
+    ]
+
+    assert FakeCarrier.max_in_flight == 5
+    assert lines[-1] == {'summary': {'total': 53, 'succeeded': 50, 'failed': 3}}
+
+    results = {line['line']: line for line in lines[:-1]}
+    assert sorted(results) == list(range(1, 54))
+    assert ShipmentStatus.model_validate(results[1]['shipment']) == SHIPMENT
+    assert results[51]['error'] == {'status_code': 404, 'detail': 'Shipment with given tracking number not found!'}
+    assert results[52]['error']['status_code'] == 400
+    assert results[53] == {'line': 53, 'error': {'status_code': 400, 'detail': 'The line is not valid JSON!'}}
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from app.schemas.schema_tracey import CarrierExceptionType, ShipmentEvent, TraceyEvent
+from app.services.carrier.cache_policy import DEFAULT_CACHE_TTL, CacheTTLPolicy
+
+
+def shipment_status(phase: str, sub_phase: str, is_returned: bool = False) -> ShipmentEvent:
+    return ShipmentEvent(
+        event_datetime=datetime.now(timezone.utc),
+        event=TraceyEvent(
+            exception_type=CarrierExceptionType.SUCCESS,
+            is_returned=is_returned,
+            phase=phase,
+            sub_phase=sub_phase,
+            tracey_event=sub_phase
+        )
+    )
+
+
+def test_ttl_is_based_on_the_most_specific_key():
+    policy = CacheTTLPolicy({
+        'default': 3600,
+        'Returned': 86400,
+        'delivered': 604800,
+        'out for delivery': 300,
+        'out for delivery/with courier': 60
+    })
+
+    assert policy.get_ttl(shipment_status('Delivered', 'Delivered')) == 604800
+    assert policy.get_ttl(shipment_status('Out for delivery', 'At pickup point')) == 300
+    assert policy.get_ttl(shipment_status('Out for delivery', 'With courier')) == 60
+    assert policy.get_ttl(shipment_status('Out for delivery', 'With courier', is_returned=True)) == 86400
+    assert policy.get_ttl(shipment_status('In transit', 'Processing')) == 3600
+    assert policy.get_ttl(None) == 3600
+
+
+def test_ttl_falls_back_to_default_cache_ttl():
+    assert CacheTTLPolicy({}).get_ttl(shipment_status('Delivered', 'Delivered')) == DEFAULT_CACHE_TTL
+
+
+def test_phase():
+    assert CacheTTLPolicy.get_phase(shipment_status('Delivered', 'Delivered')) == 'delivered'
+    assert CacheTTLPolicy.get_phase(shipment_status('In transit', 'Processing', is_returned=True)) == 'returned'
+    assert CacheTTLPolicy.get_phase(None) == 'unknown'
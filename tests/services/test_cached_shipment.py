@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.schemas.schema_tracey import ShipmentEvent, ShipmentStatus, TraceyEvent
+from app.services.carrier.base import CachedShipment
+
+
+def shipment_event(hour: int) -> ShipmentEvent:
+    return ShipmentEvent(
+        event_datetime=datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=hour),
+        event=TraceyEvent(
+            exception_type='success',
+            is_returned=False,
+            phase='In transit',
+            sub_phase='Processing',
+            tracey_event=f'Event {hour}'
+        )
+    )
+
+
+SHIPMENT = ShipmentStatus(
+    shipment_id='JVGL06252498000966068673',
+    status=shipment_event(9),
+    events=[shipment_event(hour) for hour in (3, 2, 1, 0)]
+)
+CACHED_SHIPMENT = CachedShipment.from_shipment(SHIPMENT, fetched_at=0, phase='in transit', ttl=60)
+
+
+def test_content_is_the_serialized_shipment():
+    assert CACHED_SHIPMENT.content == SHIPMENT.model_dump_json().encode()
+    assert CACHED_SHIPMENT.render() is CACHED_SHIPMENT.content
+
+
+def test_limit_keeps_the_most_recent_events():
+    rendered = json.loads(CACHED_SHIPMENT.render(limit=2))
+
+    assert [event['event']['tracey_event'] for event in rendered['events']] == ['Event 3', 'Event 2']
+    assert rendered['status'] == json.loads(SHIPMENT.status.model_dump_json())
+
+
+def test_since_keeps_the_events_after_it():
+    rendered = json.loads(CACHED_SHIPMENT.render(since=datetime(2024, 1, 1, 1, 30)))
+
+    assert [event['event']['tracey_event'] for event in rendered['events']] == ['Event 3', 'Event 2']
+
+
+def test_fields_are_selected():
+    assert list(json.loads(CACHED_SHIPMENT.render(fields={'status'}))) == ['status']
+    assert json.loads(CACHED_SHIPMENT.render(fields={'shipment_id', 'events'}, limit=0)) == {
+        'shipment_id': SHIPMENT.shipment_id,
+        'events': []
+    }
+
+
+def test_shipment_without_status_or_events():
+    shipment = ShipmentStatus(shipment_id='JVGL06252498000966068673', status=None, events=[])
+    cached_shipment = CachedShipment.from_shipment(shipment, fetched_at=0, phase='unknown', ttl=60)
+
+    assert cached_shipment.content == shipment.model_dump_json().encode()
+    assert json.loads(cached_shipment.render(limit=1)) == json.loads(shipment.model_dump_json())
+
+
+def test_etag_is_stable_and_distinct_per_rendering():
+    assert CACHED_SHIPMENT.etag() == CachedShipment.from_shipment(SHIPMENT, fetched_at=1, phase='', ttl=1).etag()
+    assert CACHED_SHIPMENT.etag(fields=['status', 'events']) == CACHED_SHIPMENT.etag(fields={'events', 'status'})
+
+    etags = {
+        CACHED_SHIPMENT.etag(),
+        CACHED_SHIPMENT.etag(limit=2),
+        CACHED_SHIPMENT.etag(limit=3),
+        CACHED_SHIPMENT.etag(fields={'status'}),
+        CACHED_SHIPMENT.etag(since=datetime(2024, 1, 1, 1, 30))
+    }
+    assert len(etags) == 5
+
+    shipment = SHIPMENT.model_copy(update={'events': SHIPMENT.events[1:]})
+    assert CachedShipment.from_shipment(shipment, fetched_at=0, phase='', ttl=60).etag() != CACHED_SHIPMENT.etag()
+
+
+def test_max_age_is_the_remaining_ttl():
+    assert CACHED_SHIPMENT.max_age(now=15.5) == 44
+    assert CACHED_SHIPMENT.max_age(now=90) == 0
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from app.services.carrier.circuit_breaker import CircuitBreaker, CircuitState
+from app.services.carrier.exceptions import CircuitOpenError
+
+
+async def succeed(timeout: float) -> int:
+    return 200
+
+
+async def fail(timeout: float) -> int:
+    raise ConnectionError
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_on_failures_and_fails_fast():
+    breaker = CircuitBreaker(window_size=4, minimum_calls=4, failure_rate_threshold=0.5, open_duration=60)
+
+    for _ in range(2):
+        await breaker.call(succeed)
+
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+
+    assert breaker.state is CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeed)
+
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    assert breaker.stats()['rejected'] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_responses_count_as_failures():
+    breaker = CircuitBreaker(window_size=2, minimum_calls=2, open_duration=60)
+
+    await breaker.call(succeed, is_failure=lambda status_code: status_code >= 500)
+    assert await breaker.call(
+        lambda timeout: asyncio.sleep(0, 503),
+        is_failure=lambda status_code: status_code >= 500
+    ) == 503
+
+    assert breaker.state is CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_successful_probe_closes_the_circuit():
+    breaker = CircuitBreaker(window_size=2, minimum_calls=2, open_duration=0.01)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+
+    await asyncio.sleep(0.02)
+    assert breaker.state is CircuitState.HALF_OPEN
+
+    assert await breaker.call(succeed) == 200
+    assert breaker.state is CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_opens_the_circuit_again():
+    breaker = CircuitBreaker(window_size=2, minimum_calls=2, open_duration=0.01)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+
+    await asyncio.sleep(0.02)
+
+    with pytest.raises(ConnectionError):
+        await breaker.call(fail)
+
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.stats()['opened'] == 2
+
+
+@pytest.mark.asyncio
+async def test_timeout_adapts_to_latency():
+    breaker = CircuitBreaker(minimum_calls=5, timeout_multiplier=2.0, min_timeout=0.05, max_timeout=30.0)
+    assert breaker.timeout() == 30.0
+
+    timeouts = []
+
+    async def slow_call(timeout: float) -> None:
+        timeouts.append(timeout)
+        await asyncio.sleep(0.05)
+
+    for _ in range(6):
+        await breaker.call(slow_call)
+
+    # Until enough calls have been made the upper bound is used, then about twice the latency
+    assert timeouts[0] == 30.0
+    assert 0.1 <= timeouts[-1] < 1.0
+
+
+
+@pytest.mark.asyncio
+async def test_timeout_ignores_the_latency_of_errors():
+    breaker = CircuitBreaker(minimum_calls=2, min_timeout=0.01, max_timeout=30.0)
+
+    async def not_found(timeout: float) -> None:
+        raise LookupError
+
+    # Fast client errors (e.g. an unknown shipment) aren't failures, nor samples of the latency
+    for _ in range(5):
+        with pytest.raises(LookupError):
+            await breaker.call(not_found, is_failure_exception=lambda ex: False)
+
+    assert breaker.stats()['failed'] == 0
+    assert breaker.timeout() == 30.0
+
+
+@pytest.mark.asyncio
+async def test_timeout_bounds_the_whole_call():
+    breaker = CircuitBreaker(max_timeout=0.05)
+
+    with pytest.raises(TimeoutError):
+        await breaker.call(lambda timeout: asyncio.sleep(1))
+
+    assert breaker.stats()['failed'] == 1
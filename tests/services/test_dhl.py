@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.carrier.cache_policy import CacheTTLPolicy
+from app.services.carrier.circuit_breaker import CircuitBreaker
+from app.services.carrier.dhl import DHL_EVENT_PREFIXES, DHLCarrier
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.rate_limit import RateLimitScheduler, RequestPriority
+
+
+class StalledStream(httpx.AsyncByteStream):
+    """
+    A response body whose first bytes are received, before the API stops sending the rest of it.
+    """
+
+    async def __aiter__(self):
+        yield b'{"shipments": [{"id": "JVGL06252498000966068673", "events": ['
+        raise httpx.ReadTimeout('The read operation timed out')
+
+
+class TricklingStream(httpx.AsyncByteStream):
+    """
+    A response body whose chunks are each received in time, but whose whole takes longer than the timeout.
+    """
+
+    async def __aiter__(self):
+        yield b'{"shipments": [{"id": "JVGL06252498000966068673", "events": ['
+
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+            yield b' '
+
+
+def _carrier(handler, circuit_breaker: CircuitBreaker | None = None) -> DHLCarrier:
+    return DHLCarrier(
+        tracking_number='JVGL06252498000966068673',
+        api_key='',
+        trace_event_map=TraceyEventMap(event_map={}, prefixes=DHL_EVENT_PREFIXES),
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        cache_ttl_policy=CacheTTLPolicy({}),
+        rate_limiter=RateLimitScheduler(rate=1000, burst=10),
+        circuit_breaker=circuit_breaker or CircuitBreaker()
+    )
+
+
+@pytest.mark.asyncio
+async def test_timeout_while_reading_the_body_fails_the_call():
+    carrier = _carrier(lambda request: httpx.Response(200, stream=StalledStream()))
+
+    with pytest.raises(CarrierException) as ex:
+        await carrier._get_shipment_tracking_info(RequestPriority.INTERACTIVE)
+
+    assert ex.value.status_code == 504
+    assert carrier.circuit_breaker.stats()['failed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_body_fails_the_call_once_the_timeout_has_elapsed():
+    carrier = _carrier(
+        lambda request: httpx.Response(200, stream=TricklingStream()),
+        circuit_breaker=CircuitBreaker(max_timeout=0.05)
+    )
+
+    with pytest.raises(CarrierException) as ex:
+        await carrier._get_shipment_tracking_info(RequestPriority.INTERACTIVE)
+
+    assert ex.value.status_code == 504
+    assert carrier.circuit_breaker.stats()['failed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_shipment_is_not_a_failure_of_the_api():
+    carrier = _carrier(lambda request: httpx.Response(404, json={'detail': 'No shipment found'}))
+
+    with pytest.raises(CarrierException) as ex:
+        await carrier._get_shipment_tracking_info(RequestPriority.INTERACTIVE)
+
+    assert ex.value.status_code == 404
+    assert carrier.circuit_breaker.stats()['failed'] == 0
+    assert carrier.circuit_breaker.stats()['succeeded'] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('response', [
+    httpx.Response(503, text='<html>Service Unavailable</html>'),
+    httpx.Response(500, json={'title': 'Internal Server Error'}),
+    httpx.Response(500, json=['error'])
+])
+async def test_error_response_without_detail(response: httpx.Response):
+    carrier = _carrier(lambda request: response)
+
+    with pytest.raises(CarrierException) as ex:
+        await carrier._get_shipment_tracking_info(RequestPriority.INTERACTIVE)
+
+    assert ex.value.status_code == response.status_code
+    assert ex.value.message == 'DHL API responded with an error, please try again later!'
@@ -0,0 +1,112 @@
+import json
+import os
+
+from app.services.carrier.event_map import TraceyEventMap, TraceyEventMaps
+
+
+def tracey_status(tracey_event: str, phase: str = 'In transit') -> dict:
+    return {
+        'carrierException': None,
+        'exceptionType': 'success',
+        'isReturned': False,
+        'phase': phase,
+        'subPhase': tracey_event,
+        'traceyEvent': tracey_event
+    }
+
+
+EVENT_MAP = TraceyEventMap(
+    event_map={
+        'Delivered': tracey_status('Delivered', phase='Delivered'),
+        'Processed at': tracey_status('Processed'),
+        'Arrived at*': tracey_status('Arrived'),
+        'Arrived at Delivery Facility*': tracey_status('At delivery facility'),
+        're:^Shipment .+ customs$': tracey_status('Customs'),
+        'Customs clearance': tracey_status('Customs')
+    },
+    prefixes=('Processed at',)
+)
+
+
+def test_exact_match():
+    assert EVENT_MAP.match('Delivered').tracey_event == 'Delivered'
+
+
+def test_prefix_match_prefers_the_longest_prefix():
+    assert EVENT_MAP.match('Processed at LEIPZIG - GERMANY').tracey_event == 'Processed'
+    assert EVENT_MAP.match('Arrived at Sort Facility').tracey_event == 'Arrived'
+    assert EVENT_MAP.match('Arrived at Delivery Facility in BRUSSELS').tracey_event == 'At delivery facility'
+
+
+def test_pattern_match():
+    assert EVENT_MAP.match('Shipment is held by customs').tracey_event == 'Customs'
+
+
+def test_unknown_description_is_not_matched():
+    assert EVENT_MAP.match('Something unexpected happened') is None
+    assert EVENT_MAP.match('delivered') is None
+
+
+def test_tracey_events_are_interned():
+    assert EVENT_MAP.match('Shipment is held by customs') is EVENT_MAP.match('Customs clearance')
+    assert EVENT_MAP.match('Processed at A') is EVENT_MAP.match('Processed at B')
+    assert len(EVENT_MAP.events) == 5
+
+
+def write_events_file(path, dhl_event_map: dict, modified_at: int):
+    path.write_text(json.dumps({'dhl': dhl_event_map}))
+    os.utime(path, (modified_at, modified_at))
+
+
+def test_modified_events_file_is_reloaded(tmp_path):
+    path = tmp_path / 'events.json'
+    write_events_file(path, {'Delivered': tracey_status('Delivered')}, modified_at=1)
+
+    event_maps = TraceyEventMaps(path=str(path), prefixes={'dhl': ('Processed at',)})
+    previous_maps = event_maps.snapshot()
+
+    assert event_maps.reload_if_modified() is False
+
+    write_events_file(
+        path,
+        {'Delivered': tracey_status('Delivered'), 'Processed at': tracey_status('Processed')},
+        modified_at=2
+    )
+
+    assert event_maps.reload_if_modified() is True
+    assert event_maps.version != previous_maps['dhl'].version
+    assert event_maps.snapshot()['dhl'].match('Processed at LEIPZIG').tracey_event == 'Processed'
+
+    # The maps a request started with are left untouched
+    assert previous_maps['dhl'].match('Processed at LEIPZIG') is None
+
+
+def test_only_shipments_transformed_differently_are_invalidated(tmp_path):
+    path = tmp_path / 'events.json'
+    write_events_file(path, {'Delivered': tracey_status('Delivered'), 'Picked up': tracey_status('Picked')}, 1)
+
+    event_maps = TraceyEventMaps(path=str(path))
+    version = event_maps.version
+
+    write_events_file(path, {'Delivered': tracey_status('Delivered'), 'Picked up': tracey_status('Pickup')}, 2)
+    event_maps.reload_if_modified()
+    event_map = event_maps.snapshot()['dhl']
+
+    assert event_map.transforms_differently(version, {'Delivered', 'Unknown'}) is False
+    assert event_map.transforms_differently(version, {'Delivered', 'Picked up'}) is True
+    assert event_map.transforms_differently('unknown-version', {'Delivered'}) is True
+
+
+def test_invalid_events_file_keeps_the_current_maps(tmp_path):
+    path = tmp_path / 'events.json'
+    write_events_file(path, {'Delivered': tracey_status('Delivered')}, modified_at=1)
+
+    event_maps = TraceyEventMaps(path=str(path))
+    version = event_maps.version
+
+    path.write_text('{"dhl": {"Delivered": {}}}')
+    os.utime(path, (2, 2))
+
+    assert event_maps.reload_if_modified() is False
+    assert event_maps.version == version
+    assert event_maps.stats()['reload_failures'] == 1
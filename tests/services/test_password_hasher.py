@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from app.auth.exceptions import PasswordHasherBusyError
+from app.auth.hashing import PasswordHasher
+
+
+@pytest.mark.asyncio
+async def test_password_is_hashed_and_verified_off_the_event_loop():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+
+    hashed_password = await hasher.hash('somesecret123')
+
+    assert await hasher.verify('somesecret123', hashed_password)
+    assert not await hasher.verify('wrongsecret', hashed_password)
+
+    stats = hasher.stats()
+    assert stats['hashes'] == 3
+    assert stats['running'] == stats['queued'] == 0
+    assert stats['average_latency'] > 0
+
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_passwords_beyond_the_queue_are_rejected():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+
+    results = await asyncio.gather(*(hasher.hash('somesecret123') for _ in range(3)), return_exceptions=True)
+
+    assert [isinstance(result, PasswordHasherBusyError) for result in results] == [False, False, True]
+    assert hasher.stats()['rejected'] == 1
+
+    hasher.shutdown()
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.services.carrier.exceptions import RateLimitExceededError
+from app.services.carrier.rate_limit import RateLimitScheduler, RequestPriority
+
+
+@pytest.mark.asyncio
+async def test_calls_are_queued_instead_of_failing():
+    scheduler = RateLimitScheduler(rate=100, burst=1)
+
+    started = asyncio.get_running_loop().time()
+    await asyncio.gather(*(scheduler.acquire() for _ in range(5)))
+    elapsed = asyncio.get_running_loop().time() - started
+
+    # The first call is served from the burst, the other four wait for a token each
+    assert elapsed >= 0.035
+    assert scheduler.stats()['acquired'] == 5
+
+
+@pytest.mark.asyncio
+async def test_interactive_calls_are_served_first():
+    scheduler = RateLimitScheduler(rate=100, burst=1)
+    await scheduler.acquire()
+
+    served = []
+
+    async def call(priority: RequestPriority):
+        await scheduler.acquire(priority)
+        served.append(priority)
+
+    await asyncio.gather(
+        call(RequestPriority.BACKGROUND),
+        call(RequestPriority.BATCH),
+        call(RequestPriority.INTERACTIVE)
+    )
+
+    assert served == [RequestPriority.INTERACTIVE, RequestPriority.BATCH, RequestPriority.BACKGROUND]
+
+
+@pytest.mark.asyncio
+async def test_exhausted_quota_pauses_calls():
+    scheduler = RateLimitScheduler(rate=1000, burst=10)
+    scheduler.update_from_headers(200, {'ratelimit-remaining': '0', 'ratelimit-reset': '0.05'})
+
+    started = asyncio.get_running_loop().time()
+    await scheduler.acquire()
+
+    assert asyncio.get_running_loop().time() - started >= 0.04
+    assert scheduler.stats()['pauses'] == 1
+
+
+@pytest.mark.asyncio
+async def test_calls_waiting_too_long_are_rejected():
+    scheduler = RateLimitScheduler(rate=10, burst=1, max_wait=0.05)
+    await scheduler.acquire()
+
+    # The next token is 0.1 seconds away, beyond the maximum wait
+    with pytest.raises(RateLimitExceededError):
+        await scheduler.acquire()
+
+    # Neither is a call made while the carrier's quota is exhausted for longer
+    scheduler.update_from_headers(429, {'retry-after': '60'})
+    with pytest.raises(RateLimitExceededError):
+        await scheduler.acquire()
+
+    assert scheduler.stats()['rejected'] == 2
+    assert scheduler.stats()['queue_depth']['interactive'] == 0
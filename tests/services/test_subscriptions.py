@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+
+from app.config.base import Settings
+from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.exceptions import CarrierException
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.subscriptions import KEEP_ALIVE_MESSAGE, ShipmentSubscription, ShipmentSubscriptions
+from tests.services.test_cached_shipment import SHIPMENT
+
+SETTINGS = Settings(
+    TRACKING_SUBSCRIPTION_MIN_POLL_INTERVAL=0.01,
+    TRACKING_SUBSCRIPTION_MAX_POLL_INTERVAL=0.01,
+    TRACKING_SUBSCRIPTION_MAX_PENDING=10
+)
+
+
+class FakeCarrier(Carrier):
+    """
+    A carrier whose shipment gets a new event on every poll, once it has been polled twice.
+    """
+
+    polls = 0
+
+    def __init__(self):
+        super().__init__(tracking_number='JVGL06252498000966068673', trace_event_map=TraceyEventMap({}))
+
+    async def get_cached_shipment(self) -> CachedShipment:
+        FakeCarrier.polls += 1
+        events = SHIPMENT.events[-min(FakeCarrier.polls, len(SHIPMENT.events)):]
+        shipment = SHIPMENT.model_copy(update={'events': events})
+
+        return CachedShipment.from_shipment(shipment, fetched_at=0, phase='in transit', ttl=0)
+
+    async def get_shipment_and_transform_into_tracey(self) -> ShipmentStatus:
+        raise NotImplementedError
+
+
+class FailingCarrier(FakeCarrier):
+    async def get_cached_shipment(self) -> CachedShipment:
+        raise CarrierException(status_code=404, message='Shipment with given tracking number not found!')
+
+
+async def receive(subscription: ShipmentSubscription, count: int) -> list[bytes]:
+    messages = []
+
+    async for message in subscription.stream(keep_alive_interval=1):
+        messages.append(message)
+
+        if len(messages) == count:
+            break
+
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_a_poller_and_receive_only_new_events():
+    FakeCarrier.polls = 0
+    subscriptions = ShipmentSubscriptions()
+    shipment = ('dhl', 'JVGL06252498000966068673')
+
+    first = subscriptions.subscribe({shipment: FakeCarrier}, SETTINGS)
+    second = subscriptions.subscribe({shipment: FakeCarrier}, SETTINGS)
+
+    assert subscriptions.stats()['pollers'] == 1
+
+    first_messages, second_messages = await asyncio.gather(receive(first, 2), receive(second, 2))
+
+    assert first_messages == second_messages
+    assert first_messages[0].startswith(b'event: shipment\ndata: ')
+
+    data = json.loads(first_messages[0].split(b'data: ')[1])
+    assert data['tracking_number'] == shipment[1]
+    assert [event['event']['tracey_event'] for event in data['events']] == ['Event 1']
+
+    subscriptions.unsubscribe(first)
+    assert subscriptions.stats()['pollers'] == 1
+
+    subscriptions.unsubscribe(second)
+    assert subscriptions.stats()['pollers'] == 0
+    assert subscriptions.stats()['subscriptions'] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_pushed_once():
+    subscriptions = ShipmentSubscriptions()
+    subscription = subscriptions.subscribe({('dhl', 'SomeInvalidShipmentID'): FailingCarrier}, SETTINGS)
+
+    await asyncio.sleep(0.05)
+    messages = subscription.stream(keep_alive_interval=0.01)
+
+    assert (await anext(messages)).startswith(b'event: error\ndata: {"carrier_type":"dhl"')
+    assert await anext(messages) == KEEP_ALIVE_MESSAGE
+    assert subscriptions.stats()['errors'] > 1
+
+    await subscriptions.close()
+    assert subscription.closed is True
+
+
+@pytest.mark.asyncio
+async def test_idle_subscription_keeps_alive_and_slow_one_is_closed():
+    subscription = ShipmentSubscription(shipments=[], max_pending=2)
+
+    assert await anext(subscription.stream(keep_alive_interval=0.01)) == KEEP_ALIVE_MESSAGE
+
+    assert subscription.push(b'event: shipment\ndata: {}\n\n') is True
+    assert subscription.push(b'event: shipment\ndata: {}\n\n') is True
+    assert subscription.push(b'event: shipment\ndata: {}\n\n') is False
+    assert subscription.closed is True
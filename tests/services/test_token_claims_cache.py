@@ -0,0 +1,84 @@
+import time
+
+from app.auth.tokens import TokenClaimsCache
+
+
+def test_claims_are_cached_until_the_token_expires(monkeypatch):
+    claims_cache = TokenClaimsCache(max_ttl=300)
+    now = time.time()
+    claims = {'sub': 'johndoe', 'exp': now + 60}
+
+    assert claims_cache.get('token') is None
+    claims_cache.set('token', claims)
+    assert claims_cache.get('token') == claims
+
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert claims_cache.get('token') is None
+    assert claims_cache.stats()['expirations'] == 1
+
+
+def test_claims_are_cached_for_max_ttl_at_most(monkeypatch):
+    claims_cache = TokenClaimsCache(max_ttl=10)
+    now = time.time()
+
+    claims_cache.set('token', {'sub': 'johndoe', 'exp': now + 3600})
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+
+    assert claims_cache.get('token') is None
+
+
+def test_tokens_without_expiration_are_not_cached():
+    claims_cache = TokenClaimsCache()
+
+    claims_cache.set('token', {'sub': 'johndoe'})
+
+    assert claims_cache.get('token') is None
+
+
+def test_least_recently_used_tokens_are_evicted():
+    claims_cache = TokenClaimsCache(max_entries=2)
+    exp = time.time() + 60
+
+    claims_cache.set('first', {'sub': 'first', 'exp': exp})
+    claims_cache.set('second', {'sub': 'second', 'exp': exp})
+    claims_cache.get('first')
+    claims_cache.set('third', {'sub': 'third', 'exp': exp})
+
+    assert claims_cache.get('second') is None
+    assert claims_cache.get('first') is not None
+    assert claims_cache.get('third') is not None
+    assert claims_cache.stats()['evictions'] == 1
+
+
+
+def test_revoked_subjects_tokens_are_rejected(monkeypatch):
+    claims_cache = TokenClaimsCache()
+    now = time.time()
+
+    for token, subject in (('first', 'johndoe'), ('second', 'johndoe'), ('third', 'janedoe')):
+        claims_cache.set(token, {'sub': subject, 'exp': now + 60, 'iat': now - 1})
+
+    assert claims_cache.revoke_subject('johndoe') == 2
+    assert claims_cache.get('first') is None
+    assert claims_cache.get('third') is not None
+
+    # The tokens issued before the revocation are rejected on their next verification as well
+    assert claims_cache.is_revoked({'sub': 'johndoe', 'exp': now + 60, 'iat': now - 1})
+    assert claims_cache.is_revoked({'sub': 'johndoe', 'exp': now + 60})
+    claims_cache.set('first', {'sub': 'johndoe', 'exp': now + 60, 'iat': now - 1})
+    assert claims_cache.get('first') is None
+
+    # While the ones issued afterwards, e.g. after logging in again, are accepted
+    monkeypatch.setattr(time, 'time', lambda: now + 2)
+    assert not claims_cache.is_revoked({'sub': 'johndoe', 'exp': now + 60, 'iat': int(now + 2)})
+    assert claims_cache.stats()['revocations'] == 1
+
+
+def test_revocations_are_kept_while_the_revoked_tokens_are_valid(monkeypatch):
+    claims_cache = TokenClaimsCache(revocation_ttl=60)
+    now = time.time()
+
+    claims_cache.revoke_subject('johndoe')
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+
+    assert not claims_cache.is_revoked({'sub': 'johndoe', 'exp': now + 120})
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config.base import Settings
+from app.db.models import BaseSQL, WatchlistModel
+from app.schemas.schema_tracey import ShipmentStatus
+from app.services.carrier.base import CachedShipment, Carrier
+from app.services.carrier.event_map import TraceyEventMap
+from app.services.carrier.watchlist import WatchlistRefresher, WatchlistServices
+from tests.services.test_cached_shipment import SHIPMENT
+
+SETTINGS = Settings(
+    WATCHLIST_REFRESH_RATE=1000,
+    WATCHLIST_REFRESH_LEAD=0.5,
+    WATCHLIST_MIN_REFRESH_INTERVAL=0.01,
+    WATCHLIST_STARTUP_SPREAD=0
+)
+
+
+class FakeCarrier(Carrier):
+    """
+    A carrier whose shipments are always about to expire, and in the phase of `FakeCarrier.phase`.
+    """
+
+    phase = 'in transit'
+    refreshes = 0
+
+    def __init__(self, carrier_type: str, tracking_number: str):
+        super().__init__(tracking_number=tracking_number, trace_event_map=TraceyEventMap({}))
+
+    async def get_cached_shipment(self) -> CachedShipment:
+        return CachedShipment.from_shipment(SHIPMENT, fetched_at=time.time(), phase=FakeCarrier.phase, ttl=1)
+
+    async def refresh_cached_shipment(self) -> CachedShipment:
+        FakeCarrier.refreshes += 1
+        return await self.get_cached_shipment()
+
+    async def get_shipment_and_transform_into_tracey(self) -> ShipmentStatus:
+        raise NotImplementedError
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "watchlist.db"}')
+    BaseSQL.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_watched_shipments_are_refreshed_until_delivered(session_factory):
+    shipment = ('dhl', 'JVGL06252498000966068673')
+
+    with session_factory() as db:
+        db.add(WatchlistModel(
+            carrier_type=shipment[0],
+            tracking_number=shipment[1],
+            added_at=datetime.now(timezone.utc),
+            is_active=True
+        ))
+        db.commit()
+
+    refresher = WatchlistRefresher()
+    await refresher.start(carrier_handler_factory=FakeCarrier, session_factory=session_factory, settings=SETTINGS)
+
+    assert refresher.stats()['watched'] == 1
+
+    await asyncio.sleep(0.1)
+    assert FakeCarrier.refreshes > 1
+
+    FakeCarrier.phase = 'delivered'
+    await asyncio.sleep(0.1)
+
+    assert refresher.stats()['watched'] == 0
+    assert refresher.stats()['completed'] == 1
+
+    with session_factory() as db:
+        assert db.query(WatchlistModel).one().is_active is False
+        assert WatchlistServices.get_active_shipments(db=db, added_since=WatchlistServices.retention_start(14)) == []
+
+    await refresher.stop()
+
+
+@pytest.mark.asyncio
+async def test_unwatched_shipments_are_not_refreshed(session_factory):
+    FakeCarrier.phase = 'in transit'
+    refresher = WatchlistRefresher()
+    await refresher.start(carrier_handler_factory=FakeCarrier, session_factory=session_factory, settings=SETTINGS)
+
+    refresher.watch([('dhl', 'JVGL06252498000966068673', time.time())])
+    refresher.unwatch(('dhl', 'JVGL06252498000966068673'))
+    await asyncio.sleep(0.05)
+
+    assert refresher.stats()['refreshed'] == 0
+    await refresher.stop()
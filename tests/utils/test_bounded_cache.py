@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.utils.bounded_cache import BoundedMemoryCache
+from app.utils.cache import CacheEntry
+from tests.services.test_cached_shipment import CACHED_SHIPMENT
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used_entry():
+    cache = BoundedMemoryCache(max_entries=2)
+
+    await cache.set('DHL_1', 'first')
+    await cache.set('DHL_2', 'second')
+    await cache.get('DHL_1')
+    await cache.set('DHL_3', 'third')
+
+    assert await cache.get('DHL_1') == 'first'
+    assert await cache.get('DHL_2') is None
+    assert await cache.get('DHL_3') == 'third'
+    assert cache.stats()['evictions'] == 1
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_is_respected():
+    cache = BoundedMemoryCache(max_bytes=10_000)
+
+    for index in range(10):
+        await cache.set(f'DHL_{index}', b'x' * 2_000)
+
+    stats = cache.stats()
+    assert stats['bytes'] <= 10_000
+    assert stats['entries'] < 10
+
+    # An entry larger than the whole budget is never stored
+    assert await cache.set('DHL_large', b'x' * 20_000) is False
+
+
+@pytest.mark.asyncio
+async def test_size_of_a_shipment_includes_its_content():
+    cache = BoundedMemoryCache()
+    await cache.set('DHL_1', CacheEntry(value=CACHED_SHIPMENT, stale_at=0))
+
+    assert cache.stats()['bytes'] > len(CACHED_SHIPMENT.content)
+
+
+@pytest.mark.asyncio
+async def test_update_larger_than_the_budget_removes_the_previous_value():
+    cache = BoundedMemoryCache(max_bytes=10_000)
+    await cache.set('DHL_1', b'in transit')
+
+    # The previous value is outdated, so it's not served instead of the one which couldn't be stored
+    assert await cache.set('DHL_1', b'x' * 20_000) is False
+    assert await cache.get('DHL_1') is None
+    assert cache.stats()['bytes'] == 0
+
+
+@pytest.mark.asyncio
+async def test_tinylfu_keeps_popular_entries():
+    cache = BoundedMemoryCache(max_entries=2, eviction_policy=BoundedMemoryCache.TINY_LFU)
+
+    for key in ('DHL_popular', 'DHL_other'):
+        await cache.get(key)
+        await cache.set(key, key)
+
+    for _ in range(5):
+        await cache.get('DHL_popular')
+        await cache.get('DHL_other')
+
+    # A one-off key is not admitted at the cost of popular ones
+    await cache.get('DHL_one_off')
+    assert await cache.set('DHL_one_off', 'one-off') is False
+    assert await cache.get('DHL_popular') == 'DHL_popular'
+    assert await cache.get('DHL_other') == 'DHL_other'
+    assert cache.stats()['rejections'] == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_not_returned():
+    cache = BoundedMemoryCache()
+
+    await cache.set('DHL_1', 'first', ttl=0.01)
+    await asyncio.sleep(0.02)
+
+    assert await cache.get('DHL_1') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_invalid_eviction_policy():
+    with pytest.raises(ValueError):
+        BoundedMemoryCache(eviction_policy='fifo')
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.utils.cache import AppInMemoryCache
+
+
+@pytest.mark.asyncio
+async def test_set_get_delete():
+    cache = AppInMemoryCache()
+
+    await cache.set(key='test_set_get_delete', value={'status': 'ok'})
+    assert await cache.get('test_set_get_delete') == {'status': 'ok'}
+
+    await cache.delete('test_set_get_delete')
+    assert await cache.get('test_set_get_delete') is None
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_while_refreshed():
+    cache = AppInMemoryCache()
+    refreshes = 0
+
+    async def refresh():
+        nonlocal refreshes
+        refreshes += 1
+        await asyncio.sleep(0.01)
+        await cache.set(key='test_stale', value='fresh', ttl=60)
+
+    await cache.set(key='test_stale', value='stale', ttl=0.01, stale_ttl=60)
+    await asyncio.sleep(0.02)
+
+    # The stale value is served right away, and only one refresh is started
+    assert await cache.get('test_stale', refresh=refresh) == 'stale'
+    assert await cache.get('test_stale', refresh=refresh) == 'stale'
+
+    await asyncio.sleep(0.05)
+    assert await cache.get('test_stale', refresh=refresh) == 'fresh'
+    assert refreshes == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_kept_if_refresh_fails():
+    cache = AppInMemoryCache()
+
+    async def refresh():
+        raise ConnectionError
+
+    await cache.set(key='test_stale_failure', value='stale', ttl=0.01, stale_ttl=60)
+    await asyncio.sleep(0.02)
+
+    assert await cache.get('test_stale_failure', refresh=refresh) == 'stale'
+    await asyncio.sleep(0.01)
+    assert await cache.get('test_stale_failure', refresh=refresh) == 'stale'
+
+
+@pytest.mark.asyncio
+async def test_entry_is_evicted_after_stale_ttl():
+    cache = AppInMemoryCache()
+
+    await cache.set(key='test_evicted', value='stale', ttl=0.01, stale_ttl=0.01)
+    await asyncio.sleep(0.05)
+
+    assert await cache.get('test_evicted', refresh=asyncio.sleep) is None
@@ -0,0 +1,92 @@
+import asyncio
+import pickle
+from array import array
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.services.carrier.base import CachedShipment
+from app.utils.bounded_cache import BoundedMemoryCache
+from app.utils.cache import CacheEntry
+from app.utils.cache_backends import RedisCacheBackend, TieredCacheBackend
+
+
+@pytest.fixture
+def redis_backend() -> RedisCacheBackend:
+    return RedisCacheBackend(redis=FakeAsyncRedis())
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_round_trip(redis_backend: RedisCacheBackend):
+    cached_shipment = CachedShipment(
+        content=b'{"shipment_id": "123"}',
+        fetched_at=0,
+        phase='delivered',
+        ttl=60,
+        event_descriptions=frozenset({'Delivered', 'In transit'}),
+        field_spans={'shipment_id': (15, 20)},
+        event_offsets=array('I', [0, 5]),
+        event_times=array('d', [1.5, 2.5]),
+        event_order=array('I', [1, 0]),
+        content_hash='abc'
+    )
+    entry = CacheEntry(value=cached_shipment, stale_at=123.5)
+
+    assert await redis_backend.set('DHL_123', entry, ttl=60)
+    assert await redis_backend.get('DHL_123') == entry
+    assert 0 < await redis_backend.redis.pttl('tracey:DHL_123') <= 60_000
+
+    assert await redis_backend.delete('DHL_123') is True
+    assert await redis_backend.get('DHL_123') is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('raw_value', [
+    b'garbage',
+    b'\x02' + b'\x91\x01',
+    pickle.dumps('in transit'),
+    # A cached shipment of another shape, i.e. missing fields
+    b'\x01' + b'\xd5\x01\x91\x01'
+])
+async def test_redis_backend_treats_unreadable_entries_as_misses(redis_backend: RedisCacheBackend, raw_value: bytes):
+    await redis_backend.redis.set('tracey:DHL_123', raw_value)
+
+    assert await redis_backend.get('DHL_123') is None
+    assert await redis_backend.redis.exists('tracey:DHL_123') == 0
+    assert redis_backend.stats()['decode_errors'] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_rejects_unregistered_types(redis_backend: RedisCacheBackend):
+    with pytest.raises(TypeError):
+        await redis_backend.set('DHL_123', object(), ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_tiered_backend_shares_entries_between_processes(redis_backend: RedisCacheBackend):
+    worker_1 = TieredCacheBackend(l1=BoundedMemoryCache(), l2=redis_backend, l1_ttl=0.05)
+    worker_2 = TieredCacheBackend(l1=BoundedMemoryCache(), l2=redis_backend, l1_ttl=0.05)
+
+    await worker_1.set('DHL_123', 'in transit', ttl=60)
+
+    # The second worker gets it from the shared cache, then from its own memory
+    assert await worker_2.get('DHL_123') == 'in transit'
+    assert await worker_2.l1.get('DHL_123') == 'in transit'
+
+    # Changes made by another worker are seen once the entry has expired from L1
+    await worker_1.set('DHL_123', 'delivered', ttl=60)
+    await asyncio.sleep(0.1)
+    assert await worker_2.get('DHL_123') == 'delivered'
+
+
+@pytest.mark.asyncio
+async def test_tiered_backend_keeps_entries_in_l1_no_longer_than_in_l2(redis_backend: RedisCacheBackend):
+    tiered_backend = TieredCacheBackend(l1=BoundedMemoryCache(), l2=redis_backend, l1_ttl=60)
+    await redis_backend.set('DHL_123', 'in transit', ttl=0.05)
+
+    assert await tiered_backend.get('DHL_123') == 'in transit'
+    assert await redis_backend.get_with_ttl('DHL_123') == ('in transit', pytest.approx(0.05, abs=0.02))
+
+    # The entry expires from L1 along with L2, instead of being served for another minute
+    await asyncio.sleep(0.1)
+    assert await tiered_backend.get('DHL_123') is None
@@ -0,0 +1,59 @@
+import json
+
+import ijson
+import pytest
+
+from app.utils.json_stream import stream_json_objects
+
+DOCUMENT = json.dumps({
+    'shipments': [
+        {
+            'id': 'first',
+            'status': {'description': 'Delivered', 'location': {'address': {'description': 'nested'}}},
+            'events': [
+                {'description': 'Picked up', 'timestamp': '2024-01-01T10:00:00Z', 'location': {'city': 'Leipzig'}},
+                {'description': 'Delivered', 'timestamp': '2024-01-02T10:00:00Z'}
+            ]
+        },
+        {
+            'id': 'second',
+            'events': [{'description': 'Ignored'}]
+        }
+    ]
+}).encode()
+
+
+async def chunks(document: bytes, size: int = 7):
+    for start in range(0, len(document), size):
+        yield document[start:start + size]
+
+
+@pytest.mark.asyncio
+async def test_only_the_given_fields_of_the_first_object_are_yielded():
+    objects = [
+        parsed async for parsed in stream_json_objects(
+            chunks(DOCUMENT),
+            prefixes=('shipments.item', 'shipments.item.status', 'shipments.item.events.item'),
+            fields=('id', 'description', 'timestamp'),
+            within='shipments.item'
+        )
+    ]
+
+    assert objects == [
+        ('shipments.item.status', {'description': 'Delivered'}),
+        ('shipments.item.events.item', {'description': 'Picked up', 'timestamp': '2024-01-01T10:00:00Z'}),
+        ('shipments.item.events.item', {'description': 'Delivered', 'timestamp': '2024-01-02T10:00:00Z'}),
+        ('shipments.item', {'id': 'first'})
+    ]
+
+
+@pytest.mark.asyncio
+async def test_invalid_document_raises_json_error():
+    with pytest.raises(ijson.JSONError):
+        async for _ in stream_json_objects(
+                chunks(b'{"shipments": [{"id": '),
+                prefixes=('shipments.item',),
+                fields=('id',),
+                within='shipments.item'
+        ):
+            pass
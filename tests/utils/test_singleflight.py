@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(single_flight.do('DHL_123', fetch) for _ in range(10)))
+
+    assert results == [1] * 10
+    assert single_flight.stats() == {'in_flight': 0, 'executed': 1, 'coalesced': 9}
+
+    # Once the call is finished, the next one is executed again
+    assert await single_flight.do('DHL_123', fetch) == 2
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_by_all_callers():
+    single_flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError('upstream failed')
+
+    results = await asyncio.gather(
+        *(single_flight.do('DHL_123', fetch) for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.stats()['executed'] == 1